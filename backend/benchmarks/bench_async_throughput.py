@@ -0,0 +1,47 @@
+"""
+Throughput of the blocking threadpool path versus the async path with many
+concurrent slow upstream calls.
+
+    cd backend && python -m benchmarks.bench_async_throughput --concurrency 500
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.stub_server import point_env_at, start_stub_server
+
+
+async def run(label, calls):
+    start = time.perf_counter()
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    errors = sum(isinstance(r, Exception) or r is None for r in results)
+    print(f"{label:<28} {len(results):>5} calls  {elapsed:7.2f}s  "
+          f"{len(results) / elapsed:8.1f} req/s  errors={errors}")
+
+
+async def main(concurrency: int):
+    from starlette.concurrency import run_in_threadpool
+    from utils.get_book_links import asuggest_books
+    from utils.get_mcq import aget_mcq, get_mcq
+    from utils.get_ytlinks import aget_yt_links
+
+    # Distinct topics so the generation cache and coalescing do not kick in
+    await run("sync get_mcq (threadpool)",
+              [run_in_threadpool(get_mcq, f"sync topic {i}", 1) for i in range(concurrency)])
+    await run("async aget_mcq",
+              [aget_mcq(f"async topic {i}", 1) for i in range(concurrency)])
+    await run("async aget_yt_links",
+              [aget_yt_links(f"query {i}") for i in range(concurrency)])
+    await run("async asuggest_books",
+              [asuggest_books(f"query {i}") for i in range(concurrency)])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    point_env_at(start_stub_server(args.port))
+    asyncio.run(main(args.concurrency))
@@ -0,0 +1,64 @@
+"""
+Cold import time and resident memory of each router and of the whole app, each
+measured in a fresh interpreter. --max-seconds / --max-rss-mib turn it into a
+regression check that exits non-zero when a budget is exceeded.
+
+    cd backend && python -m benchmarks.bench_import_time --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = ["routers.questions", "routers.theory", "routers.ref", "main"]
+
+# Heavy packages that should only be imported on first use
+LAZY = ("langchain", "langchain_core", "langchain_community", "langchain_groq", "groq",
+        "googleapiclient", "markdown")
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+with open('/proc/self/statm') as f:
+    rss = int(f.read().split()[1]) * resource.getpagesize()
+print(json.dumps({{"seconds": elapsed, "rss": rss,
+                  "eager": sorted(m for m in {lazy!r} if m in sys.modules)}}))
+"""
+
+
+def probe(module, env):
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", PROBE.format(module=module, lazy=LAZY)],
+        capture_output=True, text=True, env=env, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, help='fail when any median import time exceeds this')
+    parser.add_argument('--max-rss-mib', type=float, help='fail when any median RSS exceeds this')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    for name, value in (('MODEL', 'stub-model'), ('GROQ_API_KEY', 'stub-key'), ('PORT', '8000')):
+        env.setdefault(name, value)
+
+    failed = False
+    print(f"{'module':<20} {'import p50':>11} {'RSS p50':>9}  eagerly imported")
+    for module in MODULES:
+        samples = [probe(module, env) for _ in range(args.runs)]
+        seconds = statistics.median(s["seconds"] for s in samples)
+        rss = statistics.median(s["rss"] for s in samples) / 2**20
+        eager = ", ".join(samples[-1]["eager"]) or "-"
+        print(f"{module:<20} {seconds * 1e3:8.0f} ms {rss:6.1f} MiB  {eager}")
+        if (args.max_seconds and seconds > args.max_seconds) or (args.max_rss_mib and rss > args.max_rss_mib):
+            failed = True
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,124 @@
+"""
+Fuzz and scaling suite for the streaming question scanner against pathological
+LLM outputs. Checks that random chunking never changes the result, that mutated
+input only ever raises JSONStreamError, and that scan time grows linearly.
+
+    cd backend && python -m benchmarks.bench_json_stream
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from utils.json_stream import JSONStreamError, QuestionStreamScanner
+
+
+QUESTION = {
+    "question": "Compare {TCP} and [UDP] \"framing\" \\ semantics",
+    "question_type": "Comparison",
+    "difficulty": "Hard",
+    "topic_tags": ["Computer networks"],
+    "bloom_level": "Analyze",
+    "estimated_time": 15,
+    "key_concepts": ["Reliability", "Ordering"],
+    "sample_answer_outline": ["Define both", "Contrast guarantees"],
+    "evaluation_criteria": ["Accuracy"],
+    "prerequisite_knowledge": ["OSI model"],
+    "marks_allocation": 15,
+}
+
+
+def valid_document(num_questions: int) -> str:
+    return json.dumps({"questions": [QUESTION] * num_questions, "total_marks": 15 * num_questions, "exam_duration": 45})
+
+
+def pathological_cases(size: int):
+    """Each case is roughly `size` characters"""
+    body = valid_document(3)
+    return {
+        "huge think block": "<think>" + "{ [ ( " * (size // 6) + "</think>" + body,
+        "many code fences": "```\nnot json {\n```\n" * (size // 18) + "```json\n" + body + "\n```",
+        "unbalanced braces": '{"questions": [' + '{"a": ' * (size // 7),
+        "brace soup prose": "{" * (size // 2) + body,
+        "many questions": valid_document(max(1, size // len(json.dumps(QUESTION)))),
+    }
+
+
+def scan(text: str, chunk: int = 64):
+    scanner = QuestionStreamScanner()
+    items = []
+    try:
+        for i in range(0, len(text), chunk):
+            items += scanner.feed(text[i:i + chunk])
+        return items, scanner.close()
+    except JSONStreamError:
+        return items, None
+
+
+def legacy_extract(text: str):
+    """The regex extractor this scanner replaced, kept for comparison"""
+    cleaned = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL | re.IGNORECASE)
+    if '```' in cleaned:
+        matches = re.findall(r'```(?:json)?\s*(.*?)\s*```', cleaned, re.DOTALL)
+        if matches:
+            cleaned = matches[0]
+    for pattern in (r'\{.*\}', r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'):
+        for match in re.findall(pattern, cleaned, re.DOTALL):
+            try:
+                parsed = json.loads(match.strip())
+                if isinstance(parsed, dict) and 'questions' in parsed:
+                    return parsed
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+def fuzz(iterations: int, seed: int):
+    rng = random.Random(seed)
+    base = "<think>hmm</think>Here you go:\n```json\n" + valid_document(4) + "\n```"
+    expected = scan(base, chunk=len(base))
+    for _ in range(iterations):
+        chunk = rng.randint(1, 40)
+        assert scan(base, chunk) == expected, f"chunk size {chunk} changed the result"
+
+        mutated = list(base)
+        for _ in range(rng.randint(1, 5)):
+            pos = rng.randrange(len(mutated))
+            mutated[pos] = rng.choice('{}[]"\\,:x')
+        scan("".join(mutated), chunk)  # must return or raise JSONStreamError, never hang
+    print(f"fuzz: {iterations} chunkings and mutations ok")
+
+
+def timed(fn, text, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scaling(sizes, legacy_limit):
+    print(f"{'case':<20}{'size':>10}{'scanner ms':>12}{'ns/char':>10}{'legacy ms':>12}")
+    for name in pathological_cases(1):
+        per_char = []
+        for size in sizes:
+            text = pathological_cases(size)[name]
+            elapsed = timed(scan, text)
+            per_char.append(elapsed / len(text))
+            legacy = f"{timed(legacy_extract, text, 1) * 1e3:12.1f}" if size <= legacy_limit else f"{'skipped':>12}"
+            print(f"{name:<20}{len(text):>10}{elapsed * 1e3:12.1f}{per_char[-1] * 1e9:10.0f}{legacy}")
+        assert per_char[-1] < 4 * per_char[0], f"{name}: scan time is not linear"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--legacy-limit', type=int, default=20_000,
+                        help="largest input to run the old regex extractor on")
+    args = parser.parse_args()
+
+    fuzz(args.iterations, args.seed)
+    scaling([10_000, 100_000, 1_000_000], args.legacy_limit)
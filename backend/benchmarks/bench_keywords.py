@@ -0,0 +1,83 @@
+"""
+Local keyword extraction vs the Groq keyword chain used by suggest_books.
+
+Record the chain's keywords once against the real API (needs GROQ_API_KEY), then
+compare offline as often as needed:
+
+    cd backend && python -m benchmarks.bench_keywords --record
+    cd backend && python -m benchmarks.bench_keywords
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from utils.keywords import KEYWORD_CONFIDENCE_THRESHOLD, _term, extract_keyword
+
+HERE = os.path.dirname(__file__)
+QUERIES = os.path.join(HERE, 'keyword_queries.txt')
+RECORDING = os.path.join(HERE, 'keyword_corpus.jsonl')
+
+
+def terms(keyword):
+    return {_term(word) for word in keyword.split()}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def record(path):
+    from utils.get_book_links import llm_keyword
+
+    with open(QUERIES) as f:
+        queries = [line.strip() for line in f if line.strip()]
+    with open(path, 'w') as out:
+        for query in queries:
+            start = time.perf_counter()
+            keyword = llm_keyword(query).strip()
+            latency = time.perf_counter() - start
+            out.write(json.dumps({"query": query, "llm_keyword": keyword, "llm_latency": latency}) + "\n")
+            print(f"{latency * 1e3:7.0f} ms  {query!r} -> {keyword!r}")
+
+
+def compare(path):
+    with open(path) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    local_ms, agreement, exact, fallbacks = [], [], 0, 0
+    for entry in corpus:
+        start = time.perf_counter()
+        keyword, confidence = extract_keyword(entry["query"])
+        local_ms.append((time.perf_counter() - start) * 1e3)
+        if confidence < KEYWORD_CONFIDENCE_THRESHOLD:
+            fallbacks += 1
+        score = jaccard(terms(keyword), terms(entry["llm_keyword"]))
+        agreement.append(score)
+        exact += terms(keyword) == terms(entry["llm_keyword"])
+        print(f"{score:4.2f} {confidence:5.2f}  {entry['query']!r}: {keyword!r} vs {entry['llm_keyword']!r}")
+
+    llm_ms = [entry["llm_latency"] * 1e3 for entry in corpus if "llm_latency" in entry]
+    print()
+    print(f"queries            {len(corpus)}")
+    print(f"local p50          {statistics.median(local_ms):.3f} ms")
+    if llm_ms:
+        print(f"llm p50            {statistics.median(llm_ms):.0f} ms")
+    print(f"term agreement     {statistics.mean(agreement):.2f} (mean Jaccard)")
+    print(f"exact agreement    {exact / len(corpus):.0%}")
+    print(f"llm fallback rate  {fallbacks / len(corpus):.0%} (threshold {KEYWORD_CONFIDENCE_THRESHOLD})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', action='store_true', help='query the live keyword chain and save its answers')
+    parser.add_argument('--corpus', default=RECORDING)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.corpus)
+    elif not os.path.exists(args.corpus):
+        parser.error(f"{args.corpus} not found; run with --record first")
+    else:
+        compare(args.corpus)
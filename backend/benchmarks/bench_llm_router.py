@@ -0,0 +1,107 @@
+"""
+Multi-backend LLM routing under injected faults. Starts one stub LLM server per
+backend and serve.py routed across them, then drives /theory/ through four
+phases: all healthy, the first backend slowed down, the second backend failing,
+and both healthy again after the breaker cooldown. Reports request latency and
+client-visible errors per phase, and how many calls each backend served.
+With --single the same phases run against the first backend alone, for comparison.
+
+    cd backend && python -m benchmarks.bench_llm_router
+    cd backend && python -m benchmarks.bench_llm_router --slow-latency 2 --requests 100 --single
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+from benchmarks.bench_load import percentile
+from benchmarks.harness import app_server, stub_server
+
+BACKENDS = ("a", "b")
+
+
+async def drive(base: str, phase: str, requests: int, concurrency: int):
+    import httpx
+
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker(client):
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.get(base + "/theory/", params={"topic": f"{phase} {i}", "subject": "Math"})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return sorted(latencies), errors
+
+
+def served(base: str):
+    import httpx
+
+    backends = httpx.get(base + "/cache/stats").json()["message"]["llm_backends"]
+    return {name: (stats.get("ok", 0), stats["state"]) for name, stats in backends.items()}
+
+
+def tune(stub: str, **settings):
+    import httpx
+
+    httpx.post(stub + "/stub/settings", json=settings).raise_for_status()
+
+
+def main(args):
+    phases = [
+        ("healthy", {}, {}),
+        ("a slow", {"STUB_LATENCY": args.slow_latency}, {}),
+        ("b failing", {"STUB_LATENCY": args.latency}, {"STUB_FAILURE_RATE": 1}),
+        ("recovered", {}, {"STUB_FAILURE_RATE": 0}),
+    ]
+    stub_settings = {"STUB_LATENCY": str(args.latency)}
+    with contextlib.ExitStack() as stack:
+        stubs = dict(zip(BACKENDS, (stack.enter_context(stub_server(stub_settings)) for _ in BACKENDS)))
+        names = BACKENDS[:1] if args.single else BACKENDS
+        app_settings = {
+            "CACHE_MAX_ENTRIES": "0",
+            "SEMANTIC_CACHE_THRESHOLD": "",  # numbered topics would otherwise share answers
+            "LLM_BACKENDS": ",".join(f"{name}=groq:stub-model@{stubs[name]}" for name in names),
+            "ROUTER_BREAKER_COOLDOWN": str(args.cooldown),
+            "RETRY_MAX_ATTEMPTS": "1",
+        }
+        log = stack.enter_context(open(args.server_log, "w"))
+        server = stack.enter_context(app_server(stubs["a"], 1, app_settings, log))
+
+        print(f"{'phase':<10} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6}  calls served (breaker)")
+        before = served(server.base_url)
+        for phase, a_settings, b_settings in phases:
+            if a_settings:
+                tune(stubs["a"], **a_settings)
+            if b_settings:
+                tune(stubs["b"], **b_settings)
+            if phase == "recovered":
+                time.sleep(args.cooldown)  # let the tripped breaker reach half-open
+            latencies, errors = asyncio.run(drive(server.base_url, phase, args.requests, args.concurrency))
+            after = served(server.base_url)
+            split = "  ".join(f"{name} {after[name][0] - before[name][0]:>4} ({after[name][1]})" for name in after)
+            ms = lambda p: f"{percentile(latencies, p) * 1e3:8.0f}" if latencies else f"{'-':>8}"
+            print(f"{phase:<10} {ms(0.5)} {ms(0.95)} {errors:>6}  {split}")
+            before = after
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=60, help='requests per phase')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.05, help='healthy stub latency (seconds)')
+    parser.add_argument('--slow-latency', type=float, default=1.0, help="backend a's latency while slowed")
+    parser.add_argument('--cooldown', type=float, default=2.0, help='ROUTER_BREAKER_COOLDOWN for the run')
+    parser.add_argument('--single', action='store_true', help='route to backend a only')
+    parser.add_argument('--server-log', default=os.devnull)
+    main(parser.parse_args())
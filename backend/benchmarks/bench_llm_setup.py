@@ -0,0 +1,53 @@
+"""
+Per-request setup cost: building ChatGroq, PydanticOutputParser and PromptTemplate
+on every call versus the shared client registry and precompiled templates.
+No network calls are made.
+
+    cd backend && python -m benchmarks.bench_llm_setup --iterations 500
+"""
+import argparse
+import os
+import time
+
+
+def old_setup(model, api_key):
+    from langchain.output_parsers import PydanticOutputParser
+    from langchain.prompts import PromptTemplate
+    from langchain_groq import ChatGroq
+    from models.mcq_question import MCQResponse
+    from utils.get_mcq import MCQ_TEMPLATE
+
+    llm = ChatGroq(temperature=0.3, groq_api_key=api_key, model_name=model)
+    parser = PydanticOutputParser(pydantic_object=MCQResponse)
+    prompt = PromptTemplate(
+        template=MCQ_TEMPLATE,
+        input_variables=["topic", "num_questions", "difficulty"],
+        partial_variables={"format_instructions": parser.get_format_instructions()}
+    )
+    return prompt | llm | parser
+
+
+def timed(label, fn, iterations):
+    fn()  # warm imports
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - start) / iterations
+    print(f"{label:<32} {per_call * 1e6:10.1f} us/request")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ.setdefault('MODEL', 'stub-model')
+    os.environ.setdefault('GROQ_API_KEY', 'stub-key')
+    from utils.get_mcq import _get_prompt
+    from utils.llm_pool import get_llm
+
+    def _build_chain():
+        return _get_prompt(), get_llm(temperature=0.3)
+
+    timed("per-call construction", lambda: old_setup(os.environ['MODEL'], os.environ['GROQ_API_KEY']), args.iterations)
+    timed("registry + precompiled", _build_chain, args.iterations)
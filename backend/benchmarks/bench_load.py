@@ -0,0 +1,211 @@
+"""
+Offline load test of every router against the stub LLM, YouTube and Books
+servers. Reports throughput, p50/p95/p99 latency, time to first byte and peak
+server RSS per endpoint, and writes them to benchmarks/results/ as JSON so runs
+can be compared across commits.
+
+    cd backend && python -m benchmarks.bench_load --concurrency 32 --requests 200
+    cd backend && python -m benchmarks.bench_load --tokens-per-second 300 --failure-rate 0.05 --malformed-rate 0.1
+    cd backend && python -m benchmarks.bench_load --compare results/load-a.json results/load-b.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+from benchmarks.harness import BACKEND, app_server, process_tree_rss, stub_server
+
+RESULTS_DIR = os.path.join(BACKEND, 'benchmarks', 'results')
+
+THEORY_PARAMS = {"topic": "Parabola", "subject": "Math", "level": "advanced", "max_length": 300}
+
+# name -> (method, path, request kwargs for the i-th request)
+SCENARIOS = {
+    "mcq": ("GET", "/questions/multi_choice_question",
+            lambda i: {"params": {"topic": "AI", "session_id": f"load-{i}"}}),
+    "theory_question": ("GET", "/questions/theory_question",
+                        lambda i: {"params": {"topic": "Computer networks", "session_id": f"load-{i}"}}),
+    "theory_question_stream": ("GET", "/questions/theory_question/stream",
+                               lambda i: {"params": {"topic": "Computer networks"}}),
+    "batch": ("POST", "/questions/batch", lambda i: {"json": {"jobs": [
+        {"topic": f"Load topic {i % 20}", "type": "mcq", "difficulty": "Medium", "count": 10},
+        {"topic": f"Load topic {i % 20}", "type": "theory", "difficulty": "Hard", "count": 5},
+    ]}}),
+    "theory": ("GET", "/theory/", lambda i: {"params": THEORY_PARAMS}),
+    "theory_stream": ("GET", "/theory/stream", lambda i: {"params": THEORY_PARAMS}),
+    "lesson": ("GET", "/lesson/", lambda i: {"params": THEORY_PARAMS}),
+    "lesson_stream": ("GET", "/lesson/stream", lambda i: {"params": THEORY_PARAMS}),
+    "youtube": ("GET", "/refs/youtube", lambda i: {"params": {"query": "Parabola Math"}}),
+    "books": ("GET", "/refs/books", lambda i: {"params": {"query": "Full Parabola Math"}}),
+}
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else None
+
+
+class RSSSampler:
+    """Peak resident memory of the server process tree, sampled in the background"""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = process_tree_rss(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def run_scenario(base: str, name: str, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    method, path, kwargs = SCENARIOS[name]
+    latencies, first_bytes, errors = [], [], 0
+    counter = iter(range(requests))
+
+    async def worker(client):
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                async with client.stream(method, base + path, **kwargs(i)) as response:
+                    first = None
+                    async for _ in response.aiter_raw():
+                        if first is None:
+                            first = time.perf_counter() - start
+                    if response.status_code >= 400:
+                        errors += 1
+                        continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            first_bytes.append(first if first is not None else latencies[-1])
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ordered, ttfb = sorted(latencies), sorted(first_bytes)
+    ms = lambda value: round(value * 1e3, 2) if value is not None else None
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50_ms": ms(percentile(ordered, 0.5)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "ttfb_p50_ms": ms(percentile(ttfb, 0.5)),
+    }
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=BACKEND, capture_output=True, text=True).stdout.strip()
+    return git("rev-parse", "--short", "HEAD") or "unknown", bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+def print_row(name, result):
+    print(f"{name:<24} {result['throughput']:9.1f} req/s  p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  "
+          f"p99 {result['p99_ms']} ms  ttfb {result['ttfb_p50_ms']} ms  errors {result['errors']}  "
+          f"rss {result['peak_rss_mib']} MiB")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['commit']} -> {new['commit']}")
+    for name in new["results"]:
+        if name not in old["results"]:
+            continue
+        a, b = old["results"][name], new["results"][name]
+        change = lambda key: f"{(b[key] - a[key]) / a[key]:+.0%}" if a.get(key) and b.get(key) is not None else "n/a"
+        print(f"{name:<24} throughput {change('throughput'):>6}  p50 {change('p50_ms'):>6}  "
+              f"p95 {change('p95_ms'):>6}  p99 {change('p99_ms'):>6}  rss {change('peak_rss_mib'):>6}")
+
+
+def main(args):
+    stub_settings = {
+        "STUB_LATENCY": str(args.latency),
+        "STUB_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "STUB_FAILURE_RATE": str(args.failure_rate),
+        "STUB_MALFORMED_RATE": str(args.malformed_rate),
+        "STUB_SEED": str(args.seed),
+    }
+    app_settings = {"CACHE_MAX_ENTRIES": "0"} if args.no_cache else {}
+    app_settings.update(setting.split("=", 1) for setting in args.set)
+    names = args.endpoints or list(SCENARIOS)
+
+    results = {}
+    with stub_server(stub_settings) as stub_base, open(args.server_log, "w") as log:
+        with app_server(stub_base, args.workers, app_settings, log) as server:
+            idle_rss = process_tree_rss(server.pid)
+            for name in names:
+                with RSSSampler(server.pid) as sampler:
+                    result = asyncio.run(run_scenario(server.base_url, name, args.requests, args.concurrency))
+                result["peak_rss_mib"] = round(sampler.peak / 2**20, 1)
+                results[name] = result
+                print_row(name, result)
+
+    commit, dirty = git_revision()
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit + ("-dirty" if dirty else ""),
+        "config": {**vars(args), "stub": stub_settings, "app": app_settings},
+        "idle_rss_mib": round(idle_rss / 2**20, 1),
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = args.output or os.path.join(
+        RESULTS_DIR, f"load-{report['commit']}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    )
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--endpoints', nargs='+', choices=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=1, help='serve.py worker processes')
+    parser.add_argument('--latency', type=float, default=0.3, help='stub time to first byte (seconds)')
+    parser.add_argument('--tokens-per-second', type=float, default=0, help='stub LLM generation speed; 0 is instant')
+    parser.add_argument('--failure-rate', type=float, default=0)
+    parser.add_argument('--malformed-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-cache', action='store_true', help='disable the in-memory generation cache')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='extra app environment, e.g. --set BATCH_REQUESTS_PER_MINUTE=6000')
+    parser.add_argument('--server-log', default=os.devnull, help='where the app server writes its output')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/load-<commit>-<time>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        main(args)
@@ -0,0 +1,134 @@
+"""
+Interactive latency while batch generation saturates the upstream LLM
+(utils/scheduler.py). The stub serves --slots LLM calls at once and queues
+the rest in arrival order, as a provider at its concurrency limit does.
+Floods /questions/batch with theory-question jobs (background priority) and
+meanwhile measures interactive requests on unique topics: /theory/, or with
+--endpoint mcq cold /questions/multi_choice_question requests, which generate
+through the same chunk path as batches.
+
+Runs twice: "priority" caps the scheduler at the stub's capacity with the
+default class weights, so calls queue in the app where interactive ones go
+first; "upstream" lifts every cap, so all calls go straight out and queue
+FIFO at the provider. Reports interactive p50/p95, batch throughput, calls
+shed per class and mean scheduler wait.
+
+    cd backend && python -m benchmarks.bench_priority
+    cd backend && python -m benchmarks.bench_priority --slots 8 --batches 6 --requests 60 --latency 0.2
+    cd backend && python -m benchmarks.bench_priority --endpoint mcq --batch-rpm 600
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+from benchmarks.bench_load import percentile
+from benchmarks.harness import app_server, stub_server
+
+UNCAPPED = "1000"
+MODES = {
+    "priority": lambda slots: {"SCHEDULER_MAX_CONCURRENCY": str(slots)},
+    "upstream": lambda slots: {"SCHEDULER_MAX_CONCURRENCY": UNCAPPED,
+                               "SCHEDULER_CONCURRENCY": f"interactive={UNCAPPED},background={UNCAPPED},prefetch={UNCAPPED}"},
+}
+
+
+async def flood(client, base: str, batches: int, jobs: int, count: int, stop: asyncio.Event):
+    """Keep `batches` batch requests in flight until stopped; returns the questions generated"""
+    generated = 0
+    serial = iter(range(1 << 30))
+
+    async def batch():
+        nonlocal generated
+        while not stop.is_set():
+            n = next(serial)
+            body = {"jobs": [{"topic": f"batch {n} topic {j}", "type": "theory", "count": count} for j in range(jobs)]}
+            async with client.stream("POST", base + "/questions/batch", json=body) as response:
+                async for line in response.aiter_lines():
+                    if line:
+                        generated += len(json.loads(line)["questions"])
+
+    await asyncio.gather(*(batch() for _ in range(batches)))
+    return generated
+
+
+INTERACTIVE = {
+    "theory": ("/theory/", {"subject": "Math"}),
+    "mcq": ("/questions/multi_choice_question", {"num_questions": 3}),
+}
+
+
+async def interactive(client, base: str, mode: str, endpoint: str, requests: int, concurrency: int):
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+    path, params = INTERACTIVE[endpoint]
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await client.get(base + path, params={"topic": f"{mode} {i}", **params})
+            if response.status_code != 200 or response.json()["message"] is None:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return sorted(latencies), errors
+
+
+async def drive(base: str, mode: str, args):
+    import httpx
+
+    async with httpx.AsyncClient(timeout=300) as client:
+        stop = asyncio.Event()
+        background = asyncio.ensure_future(flood(client, base, args.batches, args.jobs, args.count, stop))
+        await asyncio.sleep(args.warmup)  # let the batches fill the queue first
+        start = time.perf_counter()
+        latencies, errors = await interactive(client, base, mode, args.endpoint, args.requests, args.concurrency)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        generated = await background
+        scheduler = (await client.get(base + "/cache/stats")).json()["message"]["scheduler"]
+    return latencies, errors, generated / (elapsed + args.warmup), scheduler
+
+
+def main(args):
+    print(f"{'mode':<9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6} {'batch q/s':>10} "
+          f"{'shed i/b/p':>11} {'wait ms i/b':>12}")
+    for mode in args.modes:
+        settings = {
+            "CACHE_MAX_ENTRIES": "0",
+            "SEMANTIC_CACHE_THRESHOLD": "",  # numbered topics would otherwise share answers
+            "BATCH_REQUESTS_PER_MINUTE": str(args.batch_rpm),
+            "RETRY_MAX_ATTEMPTS": "1",
+            **MODES[mode](args.slots),
+        }
+        with contextlib.ExitStack() as stack:
+            stub = stack.enter_context(stub_server({"STUB_LATENCY": str(args.latency), "STUB_CONCURRENCY": str(args.slots)}))
+            log = stack.enter_context(open(args.server_log, "w"))
+            server = stack.enter_context(app_server(stub, 1, settings, log))
+            latencies, errors, throughput, classes = asyncio.run(drive(server.base_url, mode, args))
+        ms = lambda p: f"{percentile(latencies, p) * 1e3:8.0f}" if latencies else f"{'-':>8}"
+        shed = "/".join(str(classes[name]["shed"]) for name in ("interactive", "background", "prefetch"))
+        wait = "/".join(f"{classes[name]['mean_wait_ms'] or 0:.0f}" for name in ("interactive", "background"))
+        print(f"{mode:<9} {ms(0.5)} {ms(0.95)} {errors:>6} {throughput:>10.1f} {shed:>11} {wait:>12}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--slots', type=int, default=4, help='LLM calls the stub serves at once')
+    parser.add_argument('--batches', type=int, default=4, help='batch requests kept in flight')
+    parser.add_argument('--jobs', type=int, default=4, help='jobs per batch request')
+    parser.add_argument('--count', type=int, default=10, help='theory questions per job')
+    parser.add_argument('--endpoint', choices=list(INTERACTIVE), default="theory", help='interactive requests to time')
+    parser.add_argument('--requests', type=int, default=40, help='interactive requests')
+    parser.add_argument('--concurrency', type=int, default=2, help='interactive requests in flight')
+    parser.add_argument('--latency', type=float, default=0.1, help='stub latency per upstream call (seconds)')
+    parser.add_argument('--batch-rpm', type=float, default=100000, help='BATCH_REQUESTS_PER_MINUTE for the run')
+    parser.add_argument('--warmup', type=float, default=1.0, help='seconds of batch load before measuring')
+    parser.add_argument('--server-log', default=os.devnull)
+    main(parser.parse_args())
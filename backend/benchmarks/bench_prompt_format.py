@@ -0,0 +1,199 @@
+"""
+Prompt size, latency and validation failure rate of the question generators'
+format instructions: the JSON Schema dump (MCQ) and example JSON (theory
+questions) they used to embed, against the compact interfaces from
+utils/schema_prompt.py.
+
+Record both prompt variants once against the real API (needs GROQ_API_KEY),
+then re-validate the recorded outputs offline as often as needed:
+
+    cd backend && python -m benchmarks.bench_prompt_format --record
+    cd backend && python -m benchmarks.bench_prompt_format
+
+--stub records against benchmarks/stub_server.py instead and compares straight
+away, with no key or network. The stub reads topic and count from either
+prompt but answers in a fixed format, so this checks the recording, parsing
+and validation path end to end, not how well a real model follows each
+variant; failure rates there reflect STUB_MALFORMED_RATE only.
+
+    cd backend && python -m benchmarks.bench_prompt_format --stub
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+HERE = os.path.dirname(__file__)
+RECORDING = os.path.join(HERE, 'prompt_format_corpus.jsonl')
+
+CHARS_PER_TOKEN = 4
+TOPICS = ("Binary search trees", "Photosynthesis", "TCP congestion control", "The French Revolution",
+          "Eigenvalues", "Supply and demand", "Operating system scheduling", "Organic chemistry reactions")
+GENERATORS = ("mcq", "theory_questions")
+VARIANTS = ("schema", "compact")
+
+# THEORY_QUESTIONS_TEMPLATE before the compact format instructions
+LEGACY_THEORY_TEMPLATE = """Create {num_questions} theory questions about {topic}.
+
+Return ONLY this JSON format (no other text):
+
+{{
+  "questions": [
+    {{
+      "question": "Your question text here",
+      "question_type": "Definition",
+      "difficulty": "{difficulty}",
+      "topic_tags": ["{topic}"],
+      "bloom_level": "Understand",
+      "estimated_time": 15,
+      "key_concepts": ["concept1", "concept2"],
+      "sample_answer_outline": ["point1", "point2", "point3"],
+      "evaluation_criteria": ["criteria1", "criteria2"],
+      "prerequisite_knowledge": ["prereq1"],
+      "marks_allocation": 15
+    }}
+  ],
+  "total_marks": 45,
+  "exam_duration": 45
+}}
+
+Topic: {topic}
+Questions: {num_questions}
+Difficulty: {difficulty}
+{focus}"""
+
+
+def prompt(generator: str, variant: str, topic: str, num_questions: int, difficulty: str) -> str:
+    if generator == "mcq":
+        from utils import get_mcq
+
+        if variant == "compact":
+            return get_mcq._format_prompt(topic, num_questions, difficulty, "")
+        from langchain_core.output_parsers import PydanticOutputParser
+        from models.mcq_question import MCQResponse
+
+        instructions = PydanticOutputParser(pydantic_object=MCQResponse).get_format_instructions()
+        return get_mcq.MCQ_TEMPLATE.format(topic=topic, num_questions=num_questions, difficulty=difficulty,
+                                           focus="", format_instructions=instructions)
+    from utils import get_theory_question
+
+    if variant == "compact":
+        return get_theory_question._format_prompt(topic, num_questions, difficulty)
+    return LEGACY_THEORY_TEMPLATE.format(topic=topic, num_questions=num_questions, difficulty=difficulty, focus="")
+
+
+def validate(generator: str, text: str, num_questions: int) -> bool:
+    """Whether the production parser gets all requested questions out of text"""
+    if generator == "mcq":
+        from utils.get_mcq import _parse
+
+        try:
+            return len(_parse(text).questions) >= num_questions
+        except Exception:
+            return False
+    from utils.get_theory_question import _salvage
+    from utils.json_stream import JSONStreamError, QuestionStreamScanner
+
+    scanner = QuestionStreamScanner()
+    try:
+        questions, root = _salvage(scanner, scanner.feed(text))
+    except (JSONStreamError, ValueError):
+        return False
+    return len(questions) >= num_questions and root is not None
+
+
+def record(path, num_questions: int, difficulty: str):
+    from utils import llm_calls
+    from utils.get_theory_question import approaches
+    from utils.llm_pool import get_llm
+    from utils.token_budget import token_planner
+
+    with open(path, 'w') as out:
+        for topic in TOPICS:
+            for generator in GENERATORS:
+                for variant in VARIANTS:
+                    text = prompt(generator, variant, topic, num_questions, difficulty)
+                    plan = token_planner.plan(generator, num_questions, text)
+                    params = {"temperature": 0.3} if generator == "mcq" else approaches[0]
+                    start = time.perf_counter()
+                    message = llm_calls.invoke(get_llm(max_tokens=plan.max_tokens, **params), text, generator)
+                    latency = time.perf_counter() - start
+                    usage = message.usage_metadata or {}
+                    out.write(json.dumps({
+                        "generator": generator, "variant": variant, "topic": topic,
+                        "num_questions": num_questions, "difficulty": difficulty,
+                        "prompt_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens"),
+                        "latency": latency, "output": message.content,
+                    }) + "\n")
+                    print(f"{latency * 1e3:7.0f} ms  {generator:<16} {variant:<8} {topic!r}")
+
+
+def prompt_sizes(num_questions: int, difficulty: str):
+    print(f"{'generator':<16} {'variant':<8} {'prompt chars':>12} {'~tokens':>8}")
+    for generator in GENERATORS:
+        for variant in VARIANTS:
+            text = prompt(generator, variant, TOPICS[0], num_questions, difficulty)
+            print(f"{generator:<16} {variant:<8} {len(text):>12} {len(text) // CHARS_PER_TOKEN:>8}")
+
+
+def compare(path):
+    with open(path) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    groups = defaultdict(list)
+    for entry in corpus:
+        groups[entry["generator"], entry["variant"]].append(entry)
+
+    print(f"{'generator':<16} {'variant':<8} {'calls':>5} {'prompt tokens':>13} {'latency p50':>11} "
+          f"{'failures':>8} {'validate':>9}")
+    for generator in GENERATORS:
+        for variant in VARIANTS:
+            entries = groups.get((generator, variant))
+            if not entries:
+                continue
+            failures = 0
+            start = time.perf_counter()
+            for entry in entries:
+                failures += not validate(generator, entry["output"], entry["num_questions"])
+            validate_ms = (time.perf_counter() - start) / len(entries) * 1e3
+            tokens = [entry["prompt_tokens"] for entry in entries if entry.get("prompt_tokens")]
+            print(f"{generator:<16} {variant:<8} {len(entries):>5} "
+                  f"{statistics.mean(tokens) if tokens else float('nan'):>13.0f} "
+                  f"{statistics.median(entry['latency'] for entry in entries) * 1e3:>8.0f} ms "
+                  f"{failures / len(entries):>8.0%} {validate_ms:>6.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', action='store_true', help='run both prompt variants against the live API and save the outputs')
+    parser.add_argument('--stub', action='store_true', help='record against a local stub server, then compare')
+    parser.add_argument('--port', type=int, default=8765, help='stub server port with --stub')
+    parser.add_argument('--corpus', default=RECORDING)
+    parser.add_argument('--num-questions', type=int, default=3)
+    parser.add_argument('--difficulty', default="Medium")
+    args = parser.parse_args()
+
+    if args.stub:
+        # Before utils is imported, so every client is built against the stub
+        from benchmarks.stub_server import point_env_at, start_stub_server
+
+        point_env_at(start_stub_server(args.port))
+    os.environ.setdefault('MODEL', 'stub-model')
+    os.environ.setdefault('GROQ_API_KEY', 'stub-key')
+    prompt_sizes(args.num_questions, args.difficulty)
+    print()
+    if args.stub:
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = os.path.join(tmp, 'stub_corpus.jsonl')
+            record(corpus, args.num_questions, args.difficulty)
+            print()
+            compare(corpus)
+    elif args.record:
+        record(args.corpus, args.num_questions, args.difficulty)
+    elif not os.path.exists(args.corpus):
+        print(f"no recording at {args.corpus}; run with --record first to compare latency and failure rates")
+    else:
+        compare(args.corpus)
@@ -0,0 +1,125 @@
+"""
+Bytes on the wire, CPU per response and cache memory of JSON response bodies
+(utils/http_cache.py), for theory pages from 10 KB to 1 MB. The pages are
+numbered copies of the stub's theory sections: repetitive, as real theory
+HTML is, so expect ratios near the top of what production sees.
+
+CPU per response compares serializing and hashing every time (uncached, with
+and without on-the-fly gzip) against a body cache hit, which only negotiates
+the encoding and hands over the stored variant. Memory is the heap and mapped
+bytes of --entries cached pages, with and without memory-mapped large bodies.
+
+    cd backend && python -m benchmarks.bench_response_bodies
+    cd backend && python -m benchmarks.bench_response_bodies --sizes 50000 1000000 --entries 50
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+
+def theory_page(size: int):
+    from benchmarks.stub_server import THEORY_MARKDOWN
+    from models.theory import TheoryRequest
+    from utils.get_theory import _build_response
+    from utils.theory_render import render
+
+    sections, i = [], 0
+    while sum(map(len, sections)) < size:
+        sections.append(THEORY_MARKDOWN.replace("## ", f"## {i}. "))
+        i += 1
+    return {"message": _build_response(TheoryRequest(topic="Parabola", subject="Math"), render("\n".join(sections)))}
+
+
+def request(path: str, accept_encoding: str):
+    from starlette.requests import Request
+
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"",
+                    "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+
+def timed(fn, seconds: float) -> float:
+    """Mean microseconds per call over roughly `seconds`"""
+    fn()
+    calls, start = 0, time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return elapsed / calls * 1e6
+
+
+def wire(sizes):
+    from utils.fast_json import dumps
+    from utils.http_cache import available_encodings, compress
+
+    print(f"{'page bytes':>10} {'identity':>9} " + " ".join(
+        f"{encoding + ' ' + level:>14}" for encoding in ("gzip", "br") for level in ("cached", "one-off")))
+    for size in sizes:
+        body = dumps(theory_page(size))
+        cells = []
+        for encoding in ("gzip", "br"):
+            for precompute in (True, False):
+                if encoding in available_encodings(len(body)):
+                    cells.append(f"{len(compress(body, encoding, precompute)):>14}")
+                else:
+                    cells.append(f"{'-':>14}")
+        print(f"{size:>10} {len(body):>9} " + " ".join(cells))
+
+
+def cpu(sizes, seconds: float):
+    from models.theory import TheoryRequest
+    from utils.http_cache import cacheable, cached_response
+
+    print(f"\n{'page bytes':>10} {'uncached µs':>12} {'+gzip µs':>9} {'hit µs':>8} {'hit gzip µs':>12} {'hit speedup':>12}")
+    for size in sizes:
+        content = theory_page(size)
+        params = TheoryRequest(topic=f"Parabola {size}", subject="Math")
+        plain, gzipped = request("/theory/", "identity"), request("/theory/", "gzip")
+        cacheable(plain, content, params=params)
+        uncached = timed(lambda: cacheable(plain, content), seconds)
+        uncached_gzip = timed(lambda: cacheable(gzipped, content), seconds)
+        hit = timed(lambda: cached_response(plain, params), seconds)
+        hit_gzip = timed(lambda: cached_response(gzipped, params), seconds)
+        print(f"{size:>10} {uncached:>12.1f} {uncached_gzip:>9.1f} {hit:>8.1f} {hit_gzip:>12.1f} "
+              f"{uncached_gzip / hit_gzip:>11.0f}x")
+
+
+def memory(sizes, entries: int):
+    import hashlib
+
+    from utils.fast_json import dumps
+    from utils.http_cache import BodyCache
+
+    print(f"\n{'page bytes':>10} {'entries':>7} {'mmap from':>10} {'heap MiB':>9} {'mapped MiB':>11} {'traced MiB':>11}")
+    for size in sizes:
+        body = dumps(theory_page(size))
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        for mmap_bytes in (float("inf"), 256 * 1024):
+            cache = BodyCache(max_bytes=1 << 40, mmap_bytes=mmap_bytes)
+            tracemalloc.start()
+            for i in range(entries):
+                # Distinct objects per entry, as separate responses would be
+                cache.put(f"/theory/?{i}", digest, bytes(bytearray(body)))
+            traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            snapshot = cache.snapshot()
+            label = "never" if mmap_bytes == float("inf") else f"{mmap_bytes // 1024} KiB"
+            print(f"{size:>10} {entries:>7} {label:>10} {snapshot['heap_bytes'] / 2**20:>9.1f} "
+                  f"{snapshot['mapped_bytes'] / 2**20:>11.1f} {traced / 2**20:>11.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000, 250_000, 1_000_000],
+                        help='approximate theory page sizes (bytes of Markdown)')
+    parser.add_argument('--seconds', type=float, default=0.3, help='timing budget per case')
+    parser.add_argument('--entries', type=int, default=100, help='cached pages for the memory table')
+    args = parser.parse_args()
+
+    os.environ.setdefault('MODEL', 'stub-model')
+    os.environ.setdefault('GROQ_API_KEY', 'stub-key')
+    wire(args.sizes)
+    cpu(args.sizes, args.seconds)
+    memory(args.sizes, args.entries)
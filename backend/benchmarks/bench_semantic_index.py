@@ -0,0 +1,68 @@
+"""
+Lookup latency of the semantic topic index with many cached entries. "Broad"
+lookups are single words that a few thousand cached topics contain, the most
+candidates the key-term guard lets through to cosine scoring.
+
+    cd backend && python -m benchmarks.bench_semantic_index --entries 100000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from utils.semantic_index import SemanticIndex, embed
+
+WORDS = ("parabola hyperbola ellipse circle vector matrix graph network protocol routing "
+         "neural learning entropy thermodynamics enzyme cell genetics market inflation "
+         "algorithm sorting search tree heap compiler parser kernel memory cache").split()
+
+
+def random_topic(rng: random.Random) -> str:
+    return " ".join(rng.sample(WORDS, rng.randint(1, 3))) + f" {rng.randint(0, 10**6)}"
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--lookups', type=int, default=1_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = SemanticIndex(max_entries=args.entries)
+
+    start = time.perf_counter()
+    for i in range(args.entries):
+        index.add("bench", random_topic(rng), f"key-{i}")
+    build = time.perf_counter() - start
+
+    queries = [random_topic(rng) for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for query in queries:
+        embed(query)
+    embed_ms = (time.perf_counter() - start) / len(queries) * 1e3
+
+    def timed(queries):
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            index.lookup("bench", query, threshold=0.75)
+            samples.append((time.perf_counter() - start) * 1e3)
+        return samples
+
+    samples = timed(queries)
+    broad = timed(rng.choice(WORDS) for _ in range(args.lookups))
+
+    print(f"entries            {len(index)}")
+    print(f"build              {build:.1f}s ({build / args.entries * 1e6:.0f} us/add)")
+    print(f"embed              {embed_ms:.3f} ms")
+    print(f"lookup p50         {statistics.median(samples):.3f} ms")
+    print(f"lookup p99         {percentile(samples, 0.99):.3f} ms")
+    print(f"broad lookup p50   {statistics.median(broad):.3f} ms")
+    print(f"broad lookup p99   {percentile(broad, 0.99):.3f} ms")
+    print(f"index memory       {args.entries * index.dim * 4 / 2**20:.1f} MiB")
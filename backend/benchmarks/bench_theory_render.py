@@ -0,0 +1,199 @@
+"""
+Theory post-processing on large documents: the single-pass renderer against the
+old regex + markdown.markdown + HTML re-scan pipeline. Checks that both produce
+the same HTML, key concepts and examples, fuzzes the fast path against
+python-markdown, and measures how long concurrent renders stall the event loop
+with and without offloading.
+
+    cd backend && python -m benchmarks.bench_theory_render
+    cd backend && python -m benchmarks.bench_theory_render --tokens 3000 12000 --fuzz 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import time
+
+os.environ.setdefault('MODEL', 'stub-model')
+os.environ.setdefault('GROQ_API_KEY', 'stub-key')
+
+from utils import theory_render  # noqa: E402
+
+
+CHARS_PER_TOKEN = 4
+WORDS = ("the focus of a parabola is the fixed point whose distance to any point on the curve equals that "
+         "point's distance to the directrix so the vertex lies halfway between them and the axis of symmetry "
+         "passes through both").split()
+
+
+def legacy(content: str):
+    """The pipeline before the single-pass renderer"""
+    import markdown
+
+    content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
+    content = content.replace("\\(", "(").replace("\\)", ")")
+    content = re.sub(r"\\\\", r"\\", content)
+    content = markdown.markdown(content)
+    key_concepts, examples, section = [], [], None
+    for line in content.split('\n'):
+        line = line.strip()
+        if line.lower().startswith("<h2>key concepts</h2>"):
+            section = "concepts"
+            continue
+        elif line.lower().startswith("<h2>examples</h2>"):
+            section = "examples"
+            continue
+        elif line.startswith("<h2>"):
+            section = None
+            continue
+        if section == "concepts" and line.startswith("<li><strong>"):
+            key_concepts.append(re.sub(r"<[^>]+>", "", line).strip())
+        elif section == "examples" and line.startswith("<li><strong>"):
+            examples.append(re.sub(r"<[^>]+>", "", line).strip())
+    return content, key_concepts, examples
+
+
+def sentence(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(8, 20)):
+        roll = rng.random()
+        word = rng.choice(WORDS)
+        if roll < 0.06:
+            parts.append(f"**{word}**")
+        elif roll < 0.09:
+            parts.append(f"*{word}*")
+        elif roll < 0.12:
+            parts.append(f"`{word}()`")
+        elif roll < 0.15:
+            parts.append(r"\\(y = ax^2 + bx + c\\)")
+        elif roll < 0.17:
+            parts.append(r"$\frac{1}{4p}$")
+        elif roll < 0.18:
+            parts.append("x > 0 & y < 0")
+        else:
+            parts.append(word)
+    return " ".join(parts).capitalize() + "."
+
+
+def document(tokens: int, rng: random.Random) -> str:
+    """LLM-shaped theory output of roughly `tokens` tokens"""
+    sections = ["<think>Plan the four sections first.</think>"]
+    concepts = examples = 0
+    while sum(map(len, sections)) < tokens * CHARS_PER_TOKEN:
+        sections.append("## Theory Content\n" + "\n\n".join(
+            " ".join(sentence(rng) for _ in range(3)) for _ in range(4)))
+        sections.append("## Key Concepts\n" + "\n".join(
+            f"- **Concept {concepts + i}**: {sentence(rng)}" for i in range(5)))
+        sections.append("## Examples\n" + "\n".join(
+            f"{i + 1}. **Example {examples + i}**: {sentence(rng)}  \n{sentence(rng)}" for i in range(3)))
+        sections.append("## Summary\n" + sentence(rng))
+        concepts, examples = concepts + 5, examples + 3
+    return "\n\n".join(sections)
+
+
+def fuzz_document(rng: random.Random) -> str:
+    atoms = ["word", " ", "  ", "*", "**", "***", "_", "a_b", "`", "\\", "\\*", "\\{", "&", "&amp;", "<", "< ",
+             ">", "[", "](", "#", "$x^2$", ":", "-", "1.", "é", "\t", "="]
+    starts = ["", "", "## ", "# ", "- ", "* ", "+ ", "1. ", " ", "> ", "---", "===", "```", "- **"]
+    lines = []
+    for _ in range(rng.randint(1, 12)):
+        if rng.random() < 0.2:
+            lines.append("")
+        else:
+            lines.append(rng.choice(starts) + "".join(rng.choice(atoms) for _ in range(rng.randint(0, 8))))
+    return "\n".join(lines)
+
+
+def check_parity(docs, fuzz_cases: int, seed: int):
+    import markdown
+
+    for doc in docs:
+        assert tuple(theory_render.render(doc)) == legacy(doc), "render() differs from the old pipeline"
+    rng = random.Random(seed)
+    fast = 0
+    for _ in range(fuzz_cases):
+        doc = fuzz_document(rng)
+        try:
+            rendered = theory_render._render_fast(doc)
+        except theory_render._Unsupported:
+            continue
+        fast += 1
+        expected = markdown.markdown(doc)
+        assert rendered.html == expected, f"fast path differs from python-markdown on {doc!r}"
+        assert (rendered.key_concepts, rendered.examples) == theory_render._extract_from_html(expected)
+    print(f"parity: {len(docs)} documents match the old pipeline; "
+          f"{fast}/{fuzz_cases} fuzz cases took the fast path, all identical to python-markdown")
+
+
+def per_call_ms(fn, doc: str, repeat: int) -> float:
+    fn(doc)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(doc)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def python_markdown_only(doc: str):
+    text = theory_render._CLEANUP.sub(theory_render._cleanup_replacement, doc)
+    html = theory_render._markdown().convert(text)
+    return html, theory_render._extract_from_html(html)
+
+
+async def loop_stall(doc: str, concurrency: int, offload: bool) -> float:
+    """Longest gap between 1 ms ticks while `concurrency` renders run"""
+    stop = False
+    worst = 0.0
+
+    async def ticker():
+        nonlocal worst
+        last = time.perf_counter()
+        while not stop:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst = max(worst, now - last)
+            last = now
+
+    async def one():
+        if offload:
+            await asyncio.to_thread(theory_render.render, doc)
+        else:
+            theory_render.render(doc)
+        await asyncio.sleep(0)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    await asyncio.gather(*(one() for _ in range(concurrency)))
+    stop = True
+    await tick
+    return worst * 1e3
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    docs = {tokens: document(tokens, rng) for tokens in args.tokens}
+    check_parity(list(docs.values()), args.fuzz, args.seed)
+
+    for tokens, doc in docs.items():
+        old = per_call_ms(legacy, doc, args.repeat)
+        new = per_call_ms(theory_render.render, doc, args.repeat)
+        fallback = per_call_ms(python_markdown_only, doc, args.repeat)
+        print(f"{tokens:>6} tokens ({len(doc):>6} chars)  old {old:7.2f} ms  single-pass {new:6.2f} ms "
+              f"({old / new:4.1f}x)  python-markdown fallback {fallback:7.2f} ms")
+
+    doc = docs[max(docs)]
+    inline = asyncio.run(loop_stall(doc, args.concurrency, offload=False))
+    offloaded = asyncio.run(loop_stall(doc, args.concurrency, offload=True))
+    print(f"event loop stall with {args.concurrency} concurrent {max(docs)}-token renders: "
+          f"inline {inline:.1f} ms, offloaded {offloaded:.1f} ms "
+          f"(offload threshold {theory_render.THEORY_RENDER_OFFLOAD_CHARS} chars)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, nargs='+', default=[1000, 3000, 12000], help='document sizes')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--fuzz', type=int, default=5000, help='random documents checked against python-markdown')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    main(parser.parse_args())
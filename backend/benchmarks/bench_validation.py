@@ -0,0 +1,122 @@
+"""
+Parsing, validation and serialization cost of question payloads, from 1 to
+100 questions. Compares the old path (LangChain's parse_json_markdown plus
+model_validate for MCQs, bare and in a ```json fence; json.loads per streamed
+item plus TheoryQuestion(**item) for theory questions; jsonable_encoder plus
+json.dumps for responses) with the compiled TypeAdapter.validate_json and
+pydantic-core serialization in utils/fast_json.py.
+
+    cd backend && python -m benchmarks.bench_validation
+    cd backend && python -m benchmarks.bench_validation --sizes 1 10 100 --seconds 0.5
+"""
+import argparse
+import json
+import os
+import time
+
+
+def payloads(size: int):
+    from benchmarks.stub_server import MCQ_JSON, THEORY_QUESTIONS_JSON
+
+    def numbered(template, i):
+        return {**template, "question": f"Q{i}: {template['question']}"}
+
+    mcq = {"questions": [numbered(MCQ_JSON["questions"][i % len(MCQ_JSON["questions"])], i) for i in range(size)]}
+    theory_items = THEORY_QUESTIONS_JSON["questions"]
+    theory = {**THEORY_QUESTIONS_JSON,
+              "questions": [numbered(theory_items[i % len(theory_items)], i) for i in range(size)]}
+    mcq_text = json.dumps(mcq, indent=2)
+    return mcq_text, "```json\n" + mcq_text + "\n```", json.dumps(theory, indent=2)
+
+
+def legacy_mcq(text: str):
+    from langchain_core.utils.json import parse_json_markdown
+    from models.mcq_question import MCQResponse
+    from utils.metrics import span
+
+    with span("json_extraction", endpoint="mcq"):
+        data = parse_json_markdown(text)
+    with span("validation", endpoint="mcq"):
+        return MCQResponse.model_validate(data)
+
+
+def fast_mcq(text: str):
+    from utils.get_mcq import _parse
+
+    return _parse(text)
+
+
+def legacy_theory(text: str):
+    from models.theory_question import TheoryQuestion
+    from utils.json_stream import QuestionStreamScanner
+
+    from utils.metrics import span
+
+    scanner = QuestionStreamScanner()
+    items = scanner.feed(text)
+    root = scanner.close()
+    with span("validation", endpoint="theory_questions"):
+        return [TheoryQuestion(**item) for item in items], root
+
+
+def fast_theory(text: str):
+    from utils.get_theory_question import _salvage, _scanner
+
+    scanner = _scanner()
+    return _salvage(scanner, scanner.feed(text))
+
+
+def legacy_dump(content):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_dump(content):
+    from utils.fast_json import dumps
+
+    return dumps(content)
+
+
+def timed(fn, arg, seconds: float) -> float:
+    """Mean microseconds per call over roughly `seconds`"""
+    fn(arg)
+    calls, start = 0, time.perf_counter()
+    while True:
+        fn(arg)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return elapsed / calls * 1e6
+
+
+def main(args):
+    print(f"{'payload':<16} {'questions':>9} {'bytes':>8} {'old µs':>10} {'new µs':>10} {'speedup':>8}")
+    for size in args.sizes:
+        mcq_text, fenced_text, theory_text = payloads(size)
+        mcq, (theory, _) = fast_mcq(mcq_text), fast_theory(theory_text)
+        assert legacy_mcq(mcq_text) == mcq and legacy_theory(theory_text)[0] == theory
+        response = {"message": mcq}
+        assert json.loads(legacy_dump(response)) == json.loads(fast_dump(response))
+        cases = [
+            ("mcq parse", mcq_text, legacy_mcq, fast_mcq),
+            ("mcq fenced", fenced_text, legacy_mcq, fast_mcq),
+            ("theory parse", theory_text, legacy_theory, fast_theory),
+            ("mcq serialize", response, legacy_dump, fast_dump),
+        ]
+        for name, arg, old, new in cases:
+            before, after = timed(old, arg, args.seconds), timed(new, arg, args.seconds)
+            size_bytes = len(arg) if isinstance(arg, str) else len(fast_dump(arg))
+            print(f"{name:<16} {size:>9} {size_bytes:>8} {before:>10.1f} {after:>10.1f} {before / after:>7.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 10, 25, 50, 100])
+    parser.add_argument('--seconds', type=float, default=0.3, help='timing budget per case')
+    args = parser.parse_args()
+
+    os.environ.setdefault('MODEL', 'stub-model')
+    os.environ.setdefault('GROQ_API_KEY', 'stub-key')
+    main(args)
@@ -0,0 +1,111 @@
+"""
+Scaling of the CPU-side request work across cores.
+
+`cpu` runs the post-processing pipeline (markdown rendering and concept
+extraction, incremental JSON parsing, pydantic validation) in 1..N processes.
+`http` starts serve.py with 1..N workers against the stub upstreams and drives
+cached endpoints, where each request is validation and serialization only.
+
+    cd backend && python -m benchmarks.bench_workers cpu --workers 1 2 4
+    cd backend && python -m benchmarks.bench_workers http --workers 1 2 4 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.harness import app_server, stub_server
+ENDPOINTS = ["/theory/?topic=Parabola&subject=Math", "/refs/youtube?query=Parabola+Math", "/refs/books?query=Parabola+Math"]
+
+
+def cpu_work(iterations: int) -> int:
+    os.environ.setdefault('MODEL', 'stub-model')
+    os.environ.setdefault('GROQ_API_KEY', 'stub-key')
+    from benchmarks.stub_server import MCQ_JSON, THEORY_MARKDOWN, THEORY_QUESTIONS_JSON
+    from models.mcq_question import MCQResponse
+    from models.theory import TheoryRequest
+    from models.theory_question import TheoryQuestion
+    from utils.get_theory import _build_response
+    from utils.theory_render import render
+    from utils.json_stream import QuestionStreamScanner
+
+    request = TheoryRequest(topic="Parabola", subject="Math")
+    markdown_text = THEORY_MARKDOWN * 10
+    questions_text = json.dumps({**THEORY_QUESTIONS_JSON, "questions": THEORY_QUESTIONS_JSON["questions"] * 20})
+    mcq_text = json.dumps({"questions": MCQ_JSON["questions"] * 20})
+
+    for _ in range(iterations):
+        _build_response(request, render(markdown_text))
+        scanner = QuestionStreamScanner()
+        [TheoryQuestion.model_validate(item) for item in scanner.feed(questions_text)]
+        MCQResponse.model_validate_json(mcq_text)
+    return iterations
+
+
+def bench_cpu(workers_list, iterations):
+    baseline = None
+    for workers in workers_list:
+        with ProcessPoolExecutor(workers) as pool:
+            list(pool.map(cpu_work, [1] * workers))  # import and warm every process
+            start = time.perf_counter()
+            done = sum(pool.map(cpu_work, [iterations] * workers))
+            elapsed = time.perf_counter() - start
+        rate = done / elapsed
+        baseline = baseline or rate
+        print(f"cpu   workers={workers:<3} {rate:9.1f} pipelines/s  speedup {rate / baseline:4.2f}x")
+
+
+async def drive(base: str, seconds: float, concurrency: int):
+    import httpx
+
+    latencies = []
+    expires = time.monotonic() + seconds
+
+    async def client_loop(client, i):
+        n = i
+        while time.monotonic() < expires:
+            start = time.perf_counter()
+            response = await client.get(base + ENDPOINTS[n % len(ENDPOINTS)])
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            n += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        for endpoint in ENDPOINTS:  # fill the shared cache before measuring
+            (await client.get(base + endpoint)).raise_for_status()
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, latencies
+
+
+def bench_http(workers_list, seconds, concurrency):
+    baseline = None
+    with stub_server({"STUB_LATENCY": "0.05"}) as stub_base:
+        for workers in workers_list:
+            with app_server(stub_base, workers) as server:
+                rate, latencies = asyncio.run(drive(server.base_url, seconds, concurrency))
+            baseline = baseline or rate
+            ordered = sorted(latencies)
+            print(f"http  workers={workers:<3} {rate:9.1f} req/s  speedup {rate / baseline:4.2f}x  "
+                  f"p50 {statistics.median(ordered) * 1e3:6.1f} ms  "
+                  f"p95 {ordered[int(len(ordered) * 0.95)] * 1e3:6.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('mode', choices=['cpu', 'http'])
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument('--iterations', type=int, default=200, help='pipelines per process (cpu)')
+    parser.add_argument('--seconds', type=float, default=10, help='load duration per worker count (http)')
+    parser.add_argument('--concurrency', type=int, default=64, help='requests in flight (http)')
+    args = parser.parse_args()
+
+    if args.mode == 'cpu':
+        bench_cpu(args.workers, args.iterations)
+    else:
+        bench_http(args.workers, args.seconds, args.concurrency)
@@ -0,0 +1,109 @@
+"""Process helpers shared by the benchmarks that run the app and the stub as separate processes"""
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import IO, Dict, Iterator, Optional
+
+from benchmarks.stub_server import stub_env
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60):
+    import httpx
+
+    expires = time.monotonic() + timeout
+    while time.monotonic() < expires and process.poll() is None:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def _stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+@contextlib.contextmanager
+def stub_server(settings: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    """Start benchmarks.stub_server in its own process; yields its base URL"""
+    port = free_port()
+    env = dict(os.environ, STUB_PORT=str(port), **(settings or {}))
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.stub_server"], cwd=BACKEND, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(f"{base}/books/v1/volumes?q=warm", process)
+        yield base
+    finally:
+        _stop(process)
+
+
+@contextlib.contextmanager
+def app_server(stub_base: str, workers: int = 1, settings: Optional[Dict[str, str]] = None,
+               log: Optional[IO] = None) -> Iterator[subprocess.Popen]:
+    """
+    Start serve.py against the stub with fresh SQLite files; yields the process,
+    whose `base_url` attribute is set. Server output goes to log, if given
+    """
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            **stub_env(stub_base),
+            MODEL='stub-model', GROQ_API_KEY='stub-key', YOUTUBE_API_KEY='stub-key',
+            CACHE_DB_PATH=os.path.join(tmp, 'cache.db'),
+            QUESTION_BANK_PATH=os.path.join(tmp, 'bank.db'),
+            REFS_DB_PATH=os.path.join(tmp, 'refs.db'),
+            LOG_LEVEL='warning', GRACEFUL_SHUTDOWN_SECONDS='5',
+        )
+        env.update(settings or {})
+        process = subprocess.Popen(
+            [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+            cwd=BACKEND, env=env, stdout=log, stderr=log
+        )
+        process.base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_until_up(process.base_url + "/", process)
+            yield process
+        finally:
+            _stop(process)
+
+
+def _children(pid: int):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def process_tree_rss(pid: int) -> int:
+    """Resident bytes of pid and all of its descendants (Linux only)"""
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            continue
+        stack += _children(current)
+    return total
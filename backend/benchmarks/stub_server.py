@@ -0,0 +1,302 @@
+"""
+Local stand-ins for Groq (OpenAI-compatible chat completions, plain and
+streamed), the YouTube Data API and the Google Books API, so benchmarks never
+spend real quota. Behaviour is configured through the environment:
+
+    STUB_LATENCY          seconds before the first byte of every upstream call
+    STUB_TOKENS_PER_SECOND  generation speed of the fake LLM; 0 returns the whole completion at once
+    STUB_FAILURE_RATE     share of LLM calls answered with STUB_FAILURE_STATUS
+    STUB_MALFORMED_RATE   share of JSON completions that are cut off mid-object
+    STUB_CONCURRENCY      LLM calls served at once, the rest queue in arrival order; 0 is unlimited
+    STUB_SEED             seed for the failure, malformed and question generators
+
+The first four can be changed on a running stub, e.g. to inject slowness:
+
+    curl -X POST localhost:8765/stub/settings -d '{"STUB_LATENCY": 2}'
+
+The LLM is served on Groq's path and on the plain OpenAI one (/v1/chat/completions).
+
+    cd backend && STUB_PORT=8765 python -m benchmarks.stub_server
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+STUB_LATENCY = float(os.getenv('STUB_LATENCY', '0.5'))  # seconds per upstream call
+STUB_TOKENS_PER_SECOND = float(os.getenv('STUB_TOKENS_PER_SECOND', '0'))
+STUB_FAILURE_RATE = float(os.getenv('STUB_FAILURE_RATE', '0'))
+STUB_FAILURE_STATUS = int(os.getenv('STUB_FAILURE_STATUS', '503'))
+STUB_MALFORMED_RATE = float(os.getenv('STUB_MALFORMED_RATE', '0'))
+STUB_CONCURRENCY = int(os.getenv('STUB_CONCURRENCY', '0'))
+
+CHARS_PER_TOKEN = 4
+STREAM_INTERVAL = 0.02  # seconds between streamed chunks at a finite token rate
+
+_random = random.Random(int(os.getenv('STUB_SEED', '0')))
+_serial = itertools.count()
+# Created on first use, inside the server's event loop
+_capacity = None
+
+MCQ_JSON = {
+    "questions": [{
+        "question": "Which search algorithm is guaranteed to find the shortest path in an unweighted graph?",
+        "options": [
+            {"option": "Breadth-first search", "is_correct": True},
+            {"option": "Depth-first search", "is_correct": False},
+            {"option": "Hill climbing", "is_correct": False},
+            {"option": "Greedy best-first search", "is_correct": False},
+        ],
+        "explanation": "BFS explores nodes in order of distance from the start.",
+        "difficulty": "Medium",
+        "topic_tags": ["AI", "Search"],
+    }]
+}
+
+THEORY_QUESTIONS_JSON = {
+    "questions": [{
+        "question": "Explain the role of the transport layer in the OSI model.",
+        "question_type": "Explanation",
+        "difficulty": "Hard",
+        "topic_tags": ["Computer networks"],
+        "bloom_level": "Understand",
+        "estimated_time": 15,
+        "key_concepts": ["Segmentation", "Flow control"],
+        "sample_answer_outline": ["Define the layer", "Describe services", "Compare TCP and UDP"],
+        "evaluation_criteria": ["Accuracy", "Clarity"],
+        "prerequisite_knowledge": ["OSI model"],
+        "marks_allocation": 15,
+    }],
+    "total_marks": 15,
+    "exam_duration": 15,
+}
+
+THEORY_MARKDOWN = """## Theory Content
+A parabola is the set of points equidistant from a focus and a directrix.
+
+## Key Concepts
+- **Focus**: the fixed point used to define the curve
+- **Directrix**: the fixed line used to define the curve
+
+## Examples
+- **Example 1**: find the vertex of y = x^2 - 4x + 3
+
+## Summary
+Parabolas model projectile motion and reflectors.
+"""
+
+ASPECTS = ("history", "definition", "limitations", "applications", "performance", "security", "design",
+           "comparison", "trade-offs", "failure modes", "implementation", "testing", "scaling", "theory")
+BLOOM_LEVELS = ("Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create")
+
+
+def _count(pattern: str, prompt: str, default: int = 1) -> int:
+    match = re.search(pattern, prompt)
+    return max(1, min(int(match.group(1)), 50)) if match else default
+
+
+def _topic(prompt: str) -> str:
+    match = re.search(r"Topic:\s*(.+)", prompt)
+    return match.group(1).strip() if match else "the topic"
+
+
+def _distinct_question(topic: str) -> str:
+    """Question text unique enough that batch and question-bank de-duplication keep it"""
+    first, second = _random.sample(ASPECTS, 2)
+    return f"Q{next(_serial)}: discuss {first} versus {second} for {topic}?"
+
+
+def mcq_json(prompt: str) -> dict:
+    topic = _topic(prompt)
+    questions = []
+    for _ in range(_count(r"Number of questions:\s*(\d+)", prompt)):
+        question = json.loads(json.dumps(MCQ_JSON["questions"][0]))
+        question["question"] = _distinct_question(topic)
+        question["topic_tags"] = [topic]
+        questions.append(question)
+    return {"questions": questions}
+
+
+def theory_questions_json(prompt: str) -> dict:
+    topic = _topic(prompt)
+    questions = []
+    for _ in range(_count(r"Create (\d+) theory questions", prompt)):
+        question = json.loads(json.dumps(THEORY_QUESTIONS_JSON["questions"][0]))
+        question["question"] = _distinct_question(topic)
+        question["topic_tags"] = [topic]
+        question["bloom_level"] = _random.choice(BLOOM_LEVELS)
+        questions.append(question)
+    marks = sum(q["marks_allocation"] for q in questions)
+    return {"questions": questions, "total_marks": marks, "exam_duration": marks}
+
+
+def completion_text(prompt: str) -> str:
+    """Pick a canned completion that the generator behind the prompt can parse"""
+    lowered = prompt.lower()
+    if "multiple choice" in lowered:
+        text = json.dumps(mcq_json(prompt))
+    elif "theory questions" in lowered:
+        text = json.dumps(theory_questions_json(prompt))
+    elif "keyword" in lowered:
+        return "Parabola"
+    else:
+        return THEORY_MARKDOWN
+    if _random.random() < STUB_MALFORMED_RATE:
+        # Cut off inside the last question, the way a truncated or derailed generation ends
+        text = text[:int(len(text) * _random.uniform(0.6, 0.95))] + ' "oops'
+    return text
+
+
+def _usage(prompt: str, text: str) -> dict:
+    prompt_tokens, completion_tokens = len(prompt) // CHARS_PER_TOKEN, len(text) // CHARS_PER_TOKEN
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _limit(text: str, max_tokens) -> tuple:
+    """Cut the completion at max_tokens the way the real API does"""
+    if max_tokens and len(text) > max_tokens * CHARS_PER_TOKEN:
+        return text[:max_tokens * CHARS_PER_TOKEN], "length"
+    return text, "stop"
+
+
+app = FastAPI()
+
+
+async def _upstream_latency():
+    """STUB_LATENCY, after waiting for one of STUB_CONCURRENCY slots like a provider at capacity"""
+    global _capacity
+    if not STUB_CONCURRENCY:
+        await asyncio.sleep(STUB_LATENCY)
+        return
+    if _capacity is None:
+        _capacity = asyncio.Semaphore(STUB_CONCURRENCY)
+    async with _capacity:
+        await asyncio.sleep(STUB_LATENCY)
+
+
+@app.post('/openai/v1/chat/completions')
+@app.post('/v1/chat/completions')
+async def chat_completions(request: Request):
+    body = await request.json()
+    await _upstream_latency()
+    if _random.random() < STUB_FAILURE_RATE:
+        return JSONResponse({"error": {"message": "stub failure", "type": "stub"}}, status_code=STUB_FAILURE_STATUS)
+
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    text, finish_reason = _limit(completion_text(prompt), body.get("max_tokens"))
+    if body.get("stream"):
+        return StreamingResponse(_stream(body, prompt, text, finish_reason), media_type="text/event-stream")
+
+    if STUB_TOKENS_PER_SECOND:
+        await asyncio.sleep(len(text) / CHARS_PER_TOKEN / STUB_TOKENS_PER_SECOND)
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": finish_reason,
+        }],
+        "usage": _usage(prompt, text),
+    }
+
+
+async def _stream(body: dict, prompt: str, text: str, finish_reason: str):
+    """OpenAI-style SSE chunks paced at STUB_TOKENS_PER_SECOND, usage in the last one like Groq's x_groq"""
+    base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": body.get("model", "stub")}
+    step = len(text) if not STUB_TOKENS_PER_SECOND else max(1, int(STUB_TOKENS_PER_SECOND * STREAM_INTERVAL * CHARS_PER_TOKEN))
+    for i in range(0, len(text), step):
+        if STUB_TOKENS_PER_SECOND:
+            await asyncio.sleep(step / CHARS_PER_TOKEN / STUB_TOKENS_PER_SECOND)
+        delta = {"content": text[i:i + step]}
+        if i == 0:
+            delta["role"] = "assistant"
+        yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})}\n\n"
+    final = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+             "x_groq": {"usage": _usage(prompt, text)}}
+    yield f"data: {json.dumps(final)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+_TUNABLE = ("STUB_LATENCY", "STUB_TOKENS_PER_SECOND", "STUB_FAILURE_RATE", "STUB_MALFORMED_RATE")
+
+
+@app.post('/stub/settings')
+async def update_settings(request: Request):
+    """Change the running stub's behaviour; returns the settings now in effect"""
+    settings = await request.json()
+    unknown = set(settings) - set(_TUNABLE)
+    if unknown:
+        return JSONResponse({"error": f"not tunable: {sorted(unknown)}"}, status_code=400)
+    for name, value in settings.items():
+        globals()[name] = float(value)
+    return {name: globals()[name] for name in _TUNABLE}
+
+
+@app.get('/youtube/v3/search')
+async def youtube_search(q: str, maxResults: int = 5):
+    await asyncio.sleep(STUB_LATENCY)
+    return {"items": [
+        {"id": {"videoId": f"stub{i}"}, "snippet": {"title": f"{q} lecture {i}"}}
+        for i in range(maxResults)
+    ]}
+
+
+@app.get('/books/v1/volumes')
+async def books_volumes(q: str, maxResults: int = 5):
+    await asyncio.sleep(STUB_LATENCY)
+    return {"items": [
+        {"volumeInfo": {
+            "title": f"{q} volume {i}",
+            "authors": ["A. Author"],
+            "description": "Stub description",
+            "infoLink": f"https://books.example/{i}",
+        }}
+        for i in range(maxResults)
+    ]}
+
+
+def start_stub_server(port: int = 8765) -> str:
+    """Run the stub app in a daemon thread and return its base URL"""
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def point_env_at(base_url: str):
+    """Route every upstream client at the stub server; call before importing utils"""
+    os.environ.update(stub_env(base_url))
+    os.environ.setdefault('MODEL', 'stub-model')
+    os.environ.setdefault('GROQ_API_KEY', 'stub-key')
+    os.environ.setdefault('YOUTUBE_API_KEY', 'stub-key')
+
+
+def stub_env(base_url: str) -> dict:
+    """Environment that routes a separately started app at the stub server"""
+    return {
+        'GROQ_API_BASE': base_url,
+        'YOUTUBE_API_BASE': f"{base_url}/youtube/v3",
+        'GOOGLE_BOOKS_API_BASE': f"{base_url}/books/v1",
+    }
+
+
+if __name__ == '__main__':
+    uvicorn.run(app, host='127.0.0.1', port=int(os.getenv('STUB_PORT', '8765')), log_level='warning')
@@ -1,18 +1,58 @@
-from fastapi import FastAPI
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn 
 import os 
 from  dotenv import load_dotenv
-from routers import questions , theory , ref
+from routers import questions , theory , ref , lesson
+from utils.http_client import close_async_client
+from utils.llm_pool import close_llm_clients
+from utils.warmup import WARMUP_ON_STARTUP, warm_up
+from utils import metrics
+from utils.log import configure_logging
+from utils.scheduler import SchedulerShed
+from utils.token_budget import TokenBudgetExceeded
 
 
 
 load_dotenv()  # Load environment variables from .env file
+configure_logging()
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from utils.question_bank import cancel_refills, pregenerate, question_bank
+    question_bank.open()
+    if WARMUP_ON_STARTUP:
+        await asyncio.to_thread(warm_up)
+    prefill = asyncio.ensure_future(pregenerate())
+    yield
+    prefill.cancel()
+    cancel_refills()
+    await close_async_client()
+    await close_llm_clients()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
 app.include_router(questions.router)
 app.include_router(theory.router)
 app.include_router(ref.router)
+app.include_router(lesson.router)
+
+
+@app.exception_handler(TokenBudgetExceeded)
+async def token_budget_exceeded(request: Request, exc: TokenBudgetExceeded):
+    return JSONResponse({'detail': str(exc)}, status_code=429,
+                        headers={'Retry-After': str(math.ceil(exc.retry_after))})
+
+
+@app.exception_handler(SchedulerShed)
+async def scheduler_shed(request: Request, exc: SchedulerShed):
+    return JSONResponse({'detail': str(exc)}, status_code=503,
+                        headers={'Retry-After': str(math.ceil(exc.retry_after))})
 
 
 
@@ -24,6 +64,79 @@ def main():
     return {'message': 'Hello, World!'}
 
 
+def _stats_samples():
+    """Counters kept by the cache, coalescing, retry and reference layers, in Prometheus form"""
+    from utils.cache import generation_cache
+    from utils.singleflight import single_flight
+    from utils.retry import engines
+    from utils.references import provider_stats
+    from utils.token_budget import token_budget
+    from utils.llm_router import router
+    from utils.http_cache import body_cache, wire_stats
+    from utils.scheduler import scheduler
+    yield ("coursify_cache_events_total", "counter", "Generation cache lookups by outcome",
+           [({"endpoint": endpoint, "event": event}, n)
+            for endpoint, counts in generation_cache.snapshot().items() for event, n in counts.items()])
+    yield ("coursify_coalescing_total", "counter", "Generations executed and deduplicated by single-flight",
+           [({"endpoint": endpoint, "event": event}, n)
+            for endpoint, counts in single_flight.snapshot().items() for event, n in counts.items()])
+    yield ("coursify_retry_events_total", "counter", "Retry engine events",
+           [({"engine": name, "event": event}, n)
+            for name, engine in engines.items() for event, n in engine.snapshot().items()
+            if event != "attempts_per_success"])
+    yield ("coursify_provider_events_total", "counter", "External API calls, quota units and cache hits",
+           [({"provider": provider, "event": event}, n)
+            for provider, counts in provider_stats.snapshot().items() for event, n in counts.items()
+            if not event.startswith("latency_")])
+    yield ("coursify_token_budget_total", "counter", "LLM calls admitted, delayed or rejected by the token budget",
+           [({"event": event}, n) for event, n in token_budget.snapshot().items()
+            if event in ("admitted", "waited", "rejected")])
+    yield ("coursify_llm_backend_up", "gauge", "1 while the backend's circuit breaker is closed",
+           [({"backend": name, "state": backend["state"]}, int(backend["state"] == "closed"))
+            for name, backend in router.snapshot().items()])
+    bodies = body_cache.snapshot()
+    yield ("coursify_body_cache_bytes", "gauge", "Serialized response bodies held by the body cache",
+           [({"storage": "heap"}, bodies["heap_bytes"]), ({"storage": "mapped"}, bodies["mapped_bytes"])])
+    yield ("coursify_response_bytes_total", "counter",
+           "JSON response bytes sent per Content-Encoding; `uncompressed` is their size before compression",
+           [({"encoding": encoding}, n) for encoding, n in wire_stats.items()])
+    depths = scheduler.depths()
+    yield ("coursify_scheduler_queue_depth", "gauge", "LLM calls waiting for an upstream slot, per priority class",
+           [({"priority": name}, depth["queued"]) for name, depth in depths.items()])
+    yield ("coursify_scheduler_running", "gauge", "LLM calls holding an upstream slot, per priority class",
+           [({"priority": name}, depth["running"]) for name, depth in depths.items()])
+
+
+metrics.collectors.append(_stats_samples)
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get('/cache/stats')
+def cache_stats():
+    from utils.cache import generation_cache
+    from utils.singleflight import single_flight
+    from utils.retry import engines
+    from utils.references import provider_stats
+    from utils.token_budget import token_budget, token_planner
+    from utils.llm_router import router
+    from utils.http_cache import body_cache, wire_stats
+    from utils.scheduler import scheduler
+    return {'message': {
+        'cache': generation_cache.snapshot(),
+        'coalescing': single_flight.snapshot(),
+        'retries': {name: engine.snapshot() for name, engine in engines.items()},
+        'references': provider_stats.snapshot(),
+        'token_budget': {'planner': token_planner.snapshot(), 'admission': token_budget.snapshot()},
+        'llm_backends': router.snapshot(),
+        'bodies': {**body_cache.snapshot(), 'wire_bytes': dict(wire_stats)},
+        'scheduler': scheduler.snapshot(),
+    }}
+
+
 
 
 
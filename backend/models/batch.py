@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from models.fields import Difficulty, Topic
+
+class BatchJob(BaseModel):
+    topic: Topic = Field(description="Topic to generate questions about")
+    type: Literal["mcq", "theory"] = Field(default="mcq", description="mcq or theory questions")
+    difficulty: Difficulty = Field(default="Medium", description="Easy, Medium, Hard or Expert")
+    count: int = Field(default=5, ge=1, le=200, description="Number of questions for this topic")
+
+class BatchRequest(BaseModel):
+    jobs: List[BatchJob] = Field(min_length=1, max_length=100, description="Question sets to generate")
+    concurrency: Optional[int] = Field(default=None, ge=1, le=64, description="Upstream calls in flight for this batch")
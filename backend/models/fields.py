@@ -0,0 +1,23 @@
+from pydantic import BeforeValidator, Field
+from typing import Annotated, Any, Literal
+
+# Request fields canonicalize before validation, so every spelling of the same
+# request validates to the same model and shares one cache key
+
+
+def _collapse(value: Any) -> Any:
+    return " ".join(value.split()) if isinstance(value, str) else value
+
+
+def _lower(value: Any) -> Any:
+    return _collapse(value).lower() if isinstance(value, str) else value
+
+
+def _capitalize(value: Any) -> Any:
+    return _collapse(value).capitalize() if isinstance(value, str) else value
+
+
+Topic = Annotated[str, BeforeValidator(_collapse), Field(min_length=1, max_length=200)]
+Difficulty = Annotated[Literal["Easy", "Medium", "Hard", "Expert"], BeforeValidator(_capitalize)]
+Level = Annotated[Literal["beginner", "intermediate", "advanced"], BeforeValidator(_lower)]
+LearningStyle = Annotated[Literal["visual", "auditory", "reading", "kinesthetic"], BeforeValidator(_lower)]
@@ -0,0 +1,8 @@
+from pydantic import Field
+from models.fields import Difficulty
+from models.theory import TheoryRequest
+
+class LessonRequest(TheoryRequest):
+    difficulty: Difficulty = Field(default="Medium", description="Easy, Medium, Hard or Expert, for both question sets")
+    num_questions: int = Field(default=3, ge=1, le=10, description="Questions in each question set")
+    max_results: int = Field(default=5, ge=1, le=10, description="Videos and books to suggest")
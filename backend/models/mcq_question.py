@@ -1,5 +1,6 @@
 from pydantic import BaseModel , Field 
-from typing import List
+from typing import List, Optional
+from models.fields import Difficulty, Topic
 
 class MCQOption(BaseModel):
     option: str = Field(description="The option text")
@@ -10,11 +11,13 @@ class MCQuestion(BaseModel):
     options: List[MCQOption] = Field(description="List of 4 options")
     explanation: str = Field(description="Explanation of the correct answer")
     difficulty: str = Field(description="Easy, Medium, or Hard")
-    topic_tags: List[str] = Field(description="Relevant topic tags")
+    topic_tags: List[str] = Field(default_factory=list, description="Relevant topic tags")
 
 class MCQResponse(BaseModel):
     questions: List[MCQuestion] = Field(description="List of generated MCQs")
 
-
-
-    
\ No newline at end of file
+class MCQRequest(BaseModel):
+    topic: Topic = Field(description="Topic to ask about")
+    difficulty: Difficulty = Field(default="Medium", description="Easy, Medium, Hard or Expert")
+    num_questions: int = Field(default=3, ge=1, le=20, description="Number of questions")
+    session_id: Optional[str] = Field(default=None, max_length=100, description="Never repeat a question within this session")
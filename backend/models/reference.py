@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+from models.fields import Topic
+
+class ReferenceRequest(BaseModel):
+    query: Topic = Field(description="What to search for")
+    max_results: int = Field(default=5, ge=1, le=10, description="Number of results")
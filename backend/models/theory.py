@@ -1,17 +1,14 @@
-from pydantic import BaseModel
-from langchain_groq import ChatGroq
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema.output_parser import StrOutputParser
-from typing import Optional, List
-import os
+from pydantic import BaseModel, Field
+from typing import List
+from models.fields import LearningStyle, Level, Topic
 
 # Pydantic models
 class TheoryRequest(BaseModel):
-    topic: str
-    subject: str
-    level: Optional[str] = "beginner"
-    learning_style: Optional[str] = "visual"
-    max_length: Optional[int] = 1000
+    topic: Topic = Field(description="Topic to explain")
+    subject: Topic = Field(description="Subject the topic belongs to")
+    level: Level = Field(default="beginner", description="beginner, intermediate or advanced")
+    learning_style: LearningStyle = Field(default="visual", description="visual, auditory, reading or kinesthetic")
+    max_length: int = Field(default=1000, ge=100, le=3000, description="Approximate length in words")
 
 class TheoryResponse(BaseModel):
     topic: str
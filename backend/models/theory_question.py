@@ -1,23 +1,27 @@
-from langchain_groq import ChatGroq
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from models.fields import Difficulty, Topic
 
 class TheoryQuestion(BaseModel):
     question: str = Field(description="The theoretical question")
     question_type: str = Field(description="Type: Definition, Explanation, Comparison, Analysis, Application, Evaluation")
     difficulty: str = Field(description="Easy, Medium, Hard, Expert")
-    topic_tags: List[str] = Field(description="Relevant topic tags")
-    bloom_level: str = Field(description="Bloom's taxonomy level")
-    estimated_time: int = Field(description="Estimated time to answer in minutes")
+    topic_tags: List[str] = Field(default_factory=list, description="Relevant topic tags")
+    bloom_level: str = Field(default="Understand", description="Bloom's level: Remember, Understand, Apply, Analyze, Evaluate, Create")
+    estimated_time: int = Field(default=15, description="Estimated time to answer in minutes")
     key_concepts: List[str] = Field(description="Key concepts student should address")
     sample_answer_outline: List[str] = Field(description="Main points for a good answer")
     evaluation_criteria: List[str] = Field(description="What to look for when grading")
-    prerequisite_knowledge: List[str] = Field(description="Required background knowledge")
-    marks_allocation: int = Field(description="Suggested marks for this question")
+    prerequisite_knowledge: List[str] = Field(default_factory=list, description="Required background knowledge")
+    marks_allocation: int = Field(default=15, description="Suggested marks for this question, e.g. 15")
 
 class TheoryQuestionsResponse(BaseModel):
     questions: List[TheoryQuestion] = Field(description="List of generated theory questions")
-    total_marks: int = Field(description="Total marks for all questions")
-    exam_duration: int = Field(description="Suggested exam duration in minutes")
\ No newline at end of file
+    total_marks: int = Field(description="Sum of the questions' marks_allocation")
+    exam_duration: int = Field(description="Suggested exam duration in minutes, the sum of estimated_time")
+
+class TheoryQuestionRequest(BaseModel):
+    topic: Topic = Field(description="Topic to ask about")
+    difficulty: Difficulty = Field(default="Hard", description="Easy, Medium, Hard or Expert")
+    num_questions: int = Field(default=3, ge=1, le=10, description="Number of questions")
+    session_id: Optional[str] = Field(default=None, max_length=100, description="Never repeat a question within this session")
@@ -0,0 +1,47 @@
+import logging
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Annotated
+from models.lesson import LessonRequest
+from utils.http_cache import cacheable, cached_response
+from utils.lesson import get_lesson, iter_lesson
+from utils.sse import SSE_HEADERS, format_sse
+
+
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix = '/lesson' , tags= ['lesson'])
+
+
+
+@router.get('/')
+async def get_lesson_bundle(request: Request, params: Annotated[LessonRequest, Query()]):
+    """Theory, both question sets and references in one response; failed or late parts are reported, not fatal"""
+    hit = cached_response(request, params)
+    if hit is not None:
+        return hit
+    lesson = await get_lesson(params)
+    # A partial bundle must not be cached, or the missing parts would stay missing
+    return cacheable(request, {'message': lesson}, private=not lesson['complete'], params=params)
+
+
+@router.get('/stream')
+async def stream_lesson(params: Annotated[LessonRequest, Query()]):
+    """Server-sent events: one `part` event per part as soon as it completes or times out, then `done`"""
+
+    async def events():
+        yield format_sse("start", {"topic": params.topic})
+        complete = True
+        try:
+            async for part, outcome in iter_lesson(params):
+                complete = complete and outcome["status"] == "ok"
+                yield format_sse("part", {"part": part, **outcome})
+        except Exception:
+            logger.exception("Lesson stream failed", extra={"topic": params.topic})
+            yield format_sse("error", {"detail": "lesson generation failed"})
+            return
+        yield format_sse("done", {"complete": complete})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,21 +1,76 @@
-from fastapi import APIRouter
-from utils.get_mcq import get_mcq
-from utils.get_theory_question import get_theory_questions
+import logging
 
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Annotated
+from utils.get_theory_question import astream_theory_questions, theory_questions_response
+from utils.question_bank import sample_or_generate
+from models.mcq_question import MCQRequest, MCQResponse
+from models.theory_question import TheoryQuestionRequest
+from utils.fast_json import dumps
+from utils.http_cache import cacheable, cached_response
+from utils.json_stream import JSONStreamError
+from utils.scheduler import SchedulerShed
+from utils.token_budget import TokenBudgetExceeded
+from utils.sse import SSE_HEADERS, format_sse
+from utils.batch import run_batch
+from models.batch import BatchRequest
 
 
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix = '/questions' , tags= ['questions'])
 
 
 
 @router.get('/multi_choice_question')  #/users/
-def get_multi_choice_question():
-    return {'message': get_mcq("AI" , 3 , "Medium") }
+async def get_multi_choice_question(request: Request, params: Annotated[MCQRequest, Query()]):
+    hit = cached_response(request, params)
+    if hit is not None:
+        return hit
+    questions = await sample_or_generate("mcq", params.topic , params.difficulty , params.num_questions , params.session_id)
+    # An empty bank is transient: no shared cache may keep it
+    return cacheable(request, {'message': MCQResponse(questions=questions) if questions else None },
+                     private=params.session_id is not None or not questions, params=params)
 
 
 @router.get('/theory_question' )  #/users/
-def get_theory_question():
-    return {'message': get_theory_questions("Computer networks" , 3 , "hard") }
+async def get_theory_question(request: Request, params: Annotated[TheoryQuestionRequest, Query()]):
+    hit = cached_response(request, params)
+    if hit is not None:
+        return hit
+    questions = await sample_or_generate("theory", params.topic , params.difficulty , params.num_questions , params.session_id)
+    message = theory_questions_response(params.topic , params.num_questions , questions)
+    # The fallback exam stands in for a transient failure: no shared cache may keep it
+    return cacheable(request, {'message': message }, private=params.session_id is not None or not questions,
+                     params=params)
+
+
+@router.get('/theory_question/stream')
+async def stream_theory_question(params: Annotated[TheoryQuestionRequest, Query()]):
+    """Server-sent events: one `question` event per question as soon as it is parsed"""
+
+    async def events():
+        try:
+            async for question in astream_theory_questions(params.topic , params.num_questions , params.difficulty):
+                yield format_sse("question", question)
+            yield format_sse("done", {})
+        except (JSONStreamError, TokenBudgetExceeded, SchedulerShed) as e:
+            yield format_sse("error", {"detail": str(e)})
+        except Exception:
+            logger.exception("Theory question stream failed", extra={"topic": params.topic})
+            yield format_sse("error", {"detail": "theory question generation failed"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 
+@router.post('/batch')
+async def generate_batch(batch: BatchRequest):
+    """Newline-delimited JSON: one line per job, in completion order"""
 
+    async def lines():
+        async for result in run_batch(batch.jobs, batch.concurrency):
+            yield dumps(result) + b"\n"
 
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
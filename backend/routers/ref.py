@@ -1,8 +1,9 @@
-from fastapi import APIRouter
-from utils.get_theory import get_theory
-from models.theory import TheoryRequest
-from utils.get_ytlinks import get_yt_links 
-from utils.get_book_links import suggest_books
+from fastapi import APIRouter, Query, Request
+from typing import Annotated
+from models.reference import ReferenceRequest
+from utils.get_ytlinks import aget_yt_links 
+from utils.get_book_links import asuggest_books
+from utils.http_cache import cacheable, cached_response
 
 
 
@@ -11,11 +12,16 @@ router = APIRouter(prefix = '/refs' , tags= ['refs'])
 
 
 @router.get('/youtube')
-def fn():
-    return {'message': get_yt_links()}
+async def fn(request: Request, params: Annotated[ReferenceRequest, Query()]):
+    hit = cached_response(request, params)
+    if hit is not None:
+        return hit
+    return cacheable(request, {'message': await aget_yt_links(params.query, params.max_results)}, params=params)
 
 
 @router.get('/books')
-def fn():
-    query = "Full Parabola Math"
-    return {'message': suggest_books(query)}
\ No newline at end of file
+async def fn(request: Request, params: Annotated[ReferenceRequest, Query()]):
+    hit = cached_response(request, params)
+    if hit is not None:
+        return hit
+    return cacheable(request, {'message': await asuggest_books(params.query, params.max_results)}, params=params)
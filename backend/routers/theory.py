@@ -1,23 +1,47 @@
-from fastapi import APIRouter
-from utils.get_theory import get_theory
+import logging
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Annotated
+from utils.get_theory import get_theory, astream_theory
 from models.theory import TheoryRequest
+from utils.http_cache import cacheable, cached_response
+from utils.sse import SSE_HEADERS, format_sse
+from utils.scheduler import SchedulerShed
+from utils.token_budget import TokenBudgetExceeded
 
 
 
-router = APIRouter(prefix = '/theory' , tags= ['theory'])
+logger = logging.getLogger(__name__)
 
+router = APIRouter(prefix = '/theory' , tags= ['theory'])
 
-request = TheoryRequest(
-    topic="Parabola",
-    subject="Math",
-    level="Advanced",
-    learning_style="Visual",
-    max_length=300
-)
 
 
 @router.get('/')
-async def get_theory_ok():
-    
-    response = await get_theory(request)
-    return {"message":response}
\ No newline at end of file
+async def get_theory_ok(request: Request, params: Annotated[TheoryRequest, Query()]):
+    hit = cached_response(request, params)
+    if hit is not None:
+        return hit
+    response = await get_theory(params)
+    return cacheable(request, {"message":response}, params=params)
+
+
+@router.get('/stream')
+async def stream_theory(params: Annotated[TheoryRequest, Query()]):
+    """Server-sent events: one `section` event per rendered section, then `done`"""
+
+    async def events():
+        # Opening event goes out before the first token so clients see a byte immediately
+        yield format_sse("start", {"topic": params.topic})
+        try:
+            async for event, data in astream_theory(params):
+                yield format_sse(event, data)
+        except (TokenBudgetExceeded, SchedulerShed) as e:
+            yield format_sse("error", {"detail": str(e)})
+        except Exception:
+            # Headers are already sent: a terminal event is the only way to tell the client
+            logger.exception("Theory stream failed", extra={"topic": params.topic})
+            yield format_sse("error", {"detail": "theory generation failed"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
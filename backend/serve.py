@@ -0,0 +1,49 @@
+"""
+Production entry point: several uvicorn worker processes behind one socket,
+sharing the on-disk generation cache, question bank and reference index.
+
+    cd backend && python serve.py --workers 4
+"""
+import argparse
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+load_dotenv() # Load environment variables from .env file
+
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', '8000'))
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', str(os.cpu_count() or 1)))
+# Seconds in-flight requests get to finish after SIGTERM before workers exit
+GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv('GRACEFUL_SHUTDOWN_SECONDS', '30'))
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'info')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=WEB_CONCURRENCY)
+    args = parser.parse_args()
+
+    # Inherited by every worker: build clients before accepting traffic, and
+    # share generations through one SQLite file instead of per-process memory
+    os.environ['PORT'] = str(args.port)
+    os.environ.setdefault('WARMUP_ON_STARTUP', 'true')
+    os.environ.setdefault('CACHE_DB_PATH', 'generation_cache.db')
+
+    uvicorn.run(
+        'main:app',
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS,
+        proxy_headers=True,
+        log_level=LOG_LEVEL,
+    )
+
+
+if __name__ == '__main__':
+    main()
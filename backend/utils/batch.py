@@ -0,0 +1,142 @@
+import asyncio
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+from dotenv import load_dotenv
+from models.batch import BatchJob
+from utils.get_mcq import aget_mcq
+from utils.get_theory_question import aget_theory_questions_robust
+from utils.scheduler import SchedulerShed, current_priority, priority
+from utils.token_budget import TokenBudgetExceeded
+
+
+load_dotenv() # Load environment variables from .env file
+
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '5'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+BATCH_REQUESTS_PER_MINUTE = float(os.getenv('BATCH_REQUESTS_PER_MINUTE', '60'))
+DUPLICATE_SIMILARITY = float(os.getenv('DUPLICATE_SIMILARITY', '0.8'))
+
+
+class RateBudget:
+    """
+    Token bucket shared by batches and question bank refills: at most
+    `per_minute` of their upstream generations per minute
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+rate_budget = RateBudget(BATCH_REQUESTS_PER_MINUTE)
+
+
+def chunk_sizes(count: int, chunk_size: int = BATCH_CHUNK_SIZE) -> List[int]:
+    """Split a question count into bounded chunks, e.g. 12 -> [5, 5, 2]"""
+    full, rest = divmod(count, chunk_size)
+    return [chunk_size] * full + ([rest] if rest else [])
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def dedupe_questions(questions: List[Any], existing: Iterable[str] = (), threshold: float = DUPLICATE_SIMILARITY) -> List[Any]:
+    """
+    Drop questions whose word-set Jaccard similarity to an earlier one, or to one
+    of the `existing` question texts, reaches the threshold
+    """
+    kept, seen = [], [_words(text) for text in existing]
+    for question in questions:
+        words = _words(question.question)
+        if any(len(words & other) / max(1, len(words | other)) >= threshold for other in seen):
+            continue
+        kept.append(question)
+        seen.append(words)
+    return kept
+
+
+async def _run_chunk(job: BatchJob, part: int, parts: int, size: int, semaphore: asyncio.Semaphore) -> List[Any]:
+    # A distinct focus per part gives each chunk its own prompt and cache key
+    focus = "" if parts == 1 else (
+        f"This is part {part + 1} of {parts} of a larger question set: "
+        f"cover aspects of the topic the other parts are unlikely to cover."
+    )
+    async with semaphore:
+        # Interactive requests generate through here too; only bulk work is paced,
+        # so a student's cold request goes straight to the scheduler
+        if current_priority() != "interactive":
+            await rate_budget.acquire()
+        if job.type == "mcq":
+            result = await aget_mcq(job.topic, size, job.difficulty, focus=focus)
+        else:
+            result = await aget_theory_questions_robust(job.topic, size, job.difficulty, use_fallback=False, focus=focus)
+    return result.questions if result else []
+
+
+async def generate_job(job: BatchJob, semaphore: asyncio.Semaphore, existing: Iterable[str] = ()) -> Tuple[List[Any], int]:
+    """
+    Generate one job's chunks concurrently; returns the de-duplicated questions
+    and the failed chunk count. An interactive caller left with nothing because
+    its calls were shed or over budget gets that exception instead, so the
+    request is answered 503/429 with Retry-After; bulk jobs count such chunks
+    as failed.
+    """
+    sizes = chunk_sizes(job.count)
+    results = await asyncio.gather(
+        *[_run_chunk(job, part, len(sizes), size, semaphore) for part, size in enumerate(sizes)],
+        return_exceptions=True
+    )
+    questions = dedupe_questions([q for r in results if not isinstance(r, BaseException) for q in r], existing)
+    rejected = [r for r in results if isinstance(r, (SchedulerShed, TokenBudgetExceeded))]
+    if rejected and not questions and current_priority() == "interactive":
+        raise rejected[0]
+    failed = sum(isinstance(r, BaseException) or not r for r in results)
+    return questions[:job.count], failed
+
+
+async def _run_job(index: int, job: BatchJob, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    # Batch exams yield upstream capacity to interactive requests
+    with priority("background"):
+        questions, failed = await generate_job(job, semaphore)
+    return {
+        "job": index,
+        "topic": job.topic,
+        "type": job.type,
+        "difficulty": job.difficulty,
+        "requested": job.count,
+        "generated": len(questions),
+        "failed_chunks": failed,
+        "questions": questions,
+    }
+
+
+async def run_batch(jobs: List[BatchJob], concurrency: int = None) -> AsyncIterator[Dict[str, Any]]:
+    """Fan every job's chunks out under one concurrency limit; yield each job as soon as it finishes"""
+    semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+    tasks = [asyncio.ensure_future(_run_job(i, job, semaphore)) for i, job in enumerate(jobs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,367 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from utils.metrics import span
+from utils.semantic_index import semantic_index
+from utils.singleflight import single_flight
+
+
+load_dotenv() # Load environment variables from .env file
+
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', '86400'))
+CACHE_DB_PATH = os.getenv('CACHE_DB_PATH')  # unset -> memory tier only
+# How long a worker may hold a generation before other workers stop waiting for it
+CACHE_LEASE_SECONDS = float(os.getenv('CACHE_LEASE_SECONDS', '90'))
+CACHE_LEASE_POLL_SECONDS = float(os.getenv('CACHE_LEASE_POLL_SECONDS', '0.25'))
+
+
+def normalize(value: Any) -> Any:
+    """Normalize request fields so equivalent requests share a cache key"""
+    if hasattr(value, 'model_dump'):
+        value = value.model_dump()
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+def make_key(endpoint: str, params: Dict[str, Any], template: str = "", model_name: str = "") -> str:
+    """Hash the normalized request fields together with the prompt template and model"""
+    payload = json.dumps({
+        "endpoint": endpoint,
+        "params": normalize(params),
+        "template": hashlib.sha256(template.encode()).hexdigest(),
+        "model": model_name,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MemoryTier:
+    """In-process LRU with per-entry TTL"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.time() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteTier:
+    """On-disk tier that survives restarts and is shared by every worker process on the host"""
+
+    def __init__(self, path: str, ttl: float = CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Opened on first use, under the lock, so building a cache at import creates no file"""
+        if self._db is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                "key TEXT PRIMARY KEY, endpoint TEXT, value TEXT, expires_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation_leases (key TEXT PRIMARY KEY, expires_at REAL, token TEXT)"
+            )
+            # Files created before leases carried their holder's token
+            if "token" not in {row[1] for row in conn.execute("PRAGMA table_info(generation_leases)")}:
+                conn.execute("ALTER TABLE generation_leases ADD COLUMN token TEXT")
+            self._db = conn
+        return self._db
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM generation_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                return None
+            return row[0]
+
+    def set(self, key: str, value: str, endpoint: str = "", ttl: Optional[float] = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generation_cache VALUES (?, ?, ?, ?)",
+                (key, endpoint, value, time.time() + (ttl or self.ttl))
+            )
+
+    def claim(self, key: str, ttl: float = CACHE_LEASE_SECONDS) -> Optional[str]:
+        """
+        Take the cross-process lease on generating key; returns the token that
+        releases it, or None while another process holds it
+        """
+        now, token = time.time(), uuid.uuid4().hex
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO generation_leases (key, expires_at, token) VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE "
+                "SET expires_at = excluded.expires_at, token = excluded.token WHERE generation_leases.expires_at < ?",
+                (key, now + ttl, token, now)
+            )
+            return token if cursor.rowcount == 1 else None
+
+    def leased(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at FROM generation_leases WHERE key = ?", (key,)
+            ).fetchone()
+            return row is not None and row[0] >= time.time()
+
+    def release(self, key: str, token: str):
+        """Drop the lease if token still holds it; an expired lease may since belong to another worker"""
+        with self._lock:
+            self._conn.execute("DELETE FROM generation_leases WHERE key = ? AND token = ?", (key, token))
+
+
+# Lease token when there is no disk tier to coordinate with
+LOCAL_LEASE = "local"
+
+
+class GenerationCache:
+    """Two-tier cache for generated content with per-endpoint counters"""
+
+    def __init__(self, memory: MemoryTier, disk: Optional[SQLiteTier] = None):
+        self.memory = memory
+        self.disk = disk
+        self.stats = defaultdict(lambda: {"hits": 0, "disk_hits": 0, "semantic_hits": 0, "peer_hits": 0, "misses": 0})
+
+    def get(self, endpoint: str, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats[endpoint]["hits"] += 1
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self.stats[endpoint]["hits"] += 1
+                self.stats[endpoint]["disk_hits"] += 1
+                return value
+        self.stats[endpoint]["misses"] += 1
+        return None
+
+    def peek(self, key: str) -> Optional[str]:
+        """Read without touching the hit/miss counters"""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+        return value
+
+    def set(self, endpoint: str, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value, endpoint=endpoint)
+
+    def claim(self, key: str) -> Optional[str]:
+        """
+        A lease token if this process should generate key, None while another
+        worker holds it; always a token without a shared disk tier
+        """
+        return self.disk.claim(key) if self.disk is not None else LOCAL_LEASE
+
+    def release(self, key: str, token: str):
+        if self.disk is not None:
+            self.disk.release(key, token)
+
+    def _peer_result(self, key: str) -> Tuple[bool, Optional[str]]:
+        """(still waiting, value) for a key another worker is generating"""
+        value = self.disk.get(key)
+        if value is not None:
+            self.memory.set(key, value)
+            return False, value
+        return self.disk.leased(key), None
+
+    def wait_for_peer(self, key: str) -> Optional[str]:
+        """Block until the worker holding key's lease stores it; None if it gave up"""
+        while True:
+            waiting, value = self._peer_result(key)
+            if not waiting:
+                return value
+            time.sleep(CACHE_LEASE_POLL_SECONDS)
+
+    async def await_peer(self, key: str) -> Optional[str]:
+        while True:
+            waiting, value = self._peer_result(key)
+            if not waiting:
+                return value
+            await asyncio.sleep(CACHE_LEASE_POLL_SECONDS)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {endpoint: dict(counts) for endpoint, counts in self.stats.items()}
+
+
+generation_cache = GenerationCache(
+    MemoryTier(),
+    SQLiteTier(CACHE_DB_PATH) if CACHE_DB_PATH else None
+)
+
+
+def cached(endpoint: str, response_model, template: str = "", semantic_field: Optional[str] = None) -> Callable:
+    """
+    Cache the pydantic result of a generator keyed on its normalized arguments.
+    Concurrent misses for the same key share one generation, and None results
+    (failed generations) are never stored.
+
+    With a shared disk tier the same holds across worker processes: the first
+    worker to miss takes a lease on the key and the others wait for its result.
+
+    With semantic_field (an argument name, or "arg.attr" for a field of a model
+    argument) an exact miss falls back to the most similar previously cached
+    value of that field, provided every other argument matches.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        def _arguments(args, kwargs) -> Dict[str, Any]:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return dict(bound.arguments)
+
+        def cache_key(args, kwargs) -> str:
+            return make_key(endpoint, _arguments(args, kwargs), template, os.getenv('MODEL', ''))
+
+        def _semantic(args, kwargs):
+            """(namespace of the other arguments, text of the semantic field)"""
+            params = normalize(_arguments(args, kwargs))
+            arg, _, attr = semantic_field.partition('.')
+            if attr:
+                text = params[arg].pop(attr)
+            else:
+                text = params.pop(arg)
+            return make_key(endpoint, params, template, os.getenv('MODEL', '')), str(text)
+
+        def _requested(args, kwargs) -> Any:
+            """The semantic field as the caller wrote it"""
+            arg, _, attr = semantic_field.partition('.')
+            value = _arguments(args, kwargs)[arg]
+            return getattr(value, attr) if attr else value
+
+        def lookup(args, kwargs) -> Optional[Any]:
+            semantic = False
+            with span("cache_lookup", endpoint=endpoint):
+                hit = generation_cache.get(endpoint, cache_key(args, kwargs))
+                if hit is None and semantic_field:
+                    match = semantic_index.lookup(*_semantic(args, kwargs))
+                    if match is not None:
+                        hit = generation_cache.peek(match[0])
+                        if hit is not None:
+                            semantic = True
+                            generation_cache.stats[endpoint]["semantic_hits"] += 1
+            if hit is None:
+                return None
+            with span("validation", endpoint=endpoint):
+                result = response_model.model_validate_json(hit)
+            if semantic and "topic" in response_model.model_fields:
+                # A rephrased topic shares the content, never the other request's topic
+                result = result.model_copy(update={"topic": _requested(args, kwargs)})
+            return result
+
+        def store(args, kwargs, result):
+            if result is None:
+                return
+            key = cache_key(args, kwargs)
+            generation_cache.set(endpoint, key, result.model_dump_json())
+            if semantic_field:
+                namespace, text = _semantic(args, kwargs)
+                semantic_index.add(namespace, text, key)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                hit = lookup(args, kwargs)
+                if hit is not None:
+                    return hit
+
+                key = cache_key(args, kwargs)
+
+                async def generate():
+                    # A peer that fails or lets its lease lapse stores nothing: take the lease over
+                    while (token := generation_cache.claim(key)) is None:
+                        hit = await generation_cache.await_peer(key)
+                        if hit is not None:
+                            generation_cache.stats[endpoint]["peer_hits"] += 1
+                            return response_model.model_validate_json(hit)
+                    try:
+                        result = await fn(*args, **kwargs)
+                        store(args, kwargs, result)
+                        return result
+                    finally:
+                        generation_cache.release(key, token)
+
+                return await single_flight.ado(endpoint, key, generate)
+            wrapper = async_wrapper
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                hit = lookup(args, kwargs)
+                if hit is not None:
+                    return hit
+
+                key = cache_key(args, kwargs)
+
+                def generate():
+                    # A peer that fails or lets its lease lapse stores nothing: take the lease over
+                    while (token := generation_cache.claim(key)) is None:
+                        hit = generation_cache.wait_for_peer(key)
+                        if hit is not None:
+                            generation_cache.stats[endpoint]["peer_hits"] += 1
+                            return response_model.model_validate_json(hit)
+                    try:
+                        result = fn(*args, **kwargs)
+                        store(args, kwargs, result)
+                        return result
+                    finally:
+                        generation_cache.release(key, token)
+
+                return single_flight.do(endpoint, key, generate)
+
+        wrapper.cache_key = cache_key
+        wrapper.lookup = lookup
+        wrapper.store = store
+        return wrapper
+
+    return decorator
@@ -0,0 +1,44 @@
+from typing import Any, List
+
+from models.mcq_question import MCQResponse, MCQuestion
+from models.theory_question import TheoryQuestion
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import to_json
+from typing_extensions import TypedDict
+
+
+# Validators compiled once at import. validate_json parses and validates raw LLM
+# output in one pass inside pydantic-core, without building intermediate dicts.
+mcq_response = TypeAdapter(MCQResponse)
+theory_question = TypeAdapter(TheoryQuestion)
+question_lists = {
+    "mcq": TypeAdapter(List[MCQuestion]),
+    "theory": TypeAdapter(List[TheoryQuestion]),
+}
+
+
+class ExamSummary(TypedDict, total=False):
+    """The exam metadata around the questions; the questions themselves are skipped"""
+    exam_duration: Any
+
+
+exam_summary = TypeAdapter(ExamSummary)
+
+
+def is_malformed(error: ValidationError) -> bool:
+    """Whether validate_json failed on the JSON syntax rather than on the schema"""
+    return any(e["type"] == "json_invalid" for e in error.errors(include_url=False))
+
+
+def json_object(text: str) -> str:
+    """The outermost {...} of an LLM response, after any <think> block"""
+    text = text.rpartition("</think>")[2]
+    return text[text.find("{"):text.rfind("}") + 1]
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Compact JSON of dicts, lists and pydantic models, serialized by
+    pydantic-core straight from the objects with no encoding or validation pass
+    """
+    return to_json(content)
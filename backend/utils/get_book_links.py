@@ -1,11 +1,12 @@
 
 import os
-from langchain_community.tools.google_books import GoogleBooksQueryRun
-from langchain_community.utilities.google_books import GoogleBooksAPIWrapper
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import PromptTemplate
-from langchain_groq import ChatGroq
+from utils.llm_pool import get_llm
+from utils import llm_calls
 from dotenv import load_dotenv
+from utils.http_client import GOOGLE_BOOKS_API_BASE, get_async_client
+from utils.keywords import KEYWORD_CONFIDENCE_THRESHOLD, extract_keyword
+from utils.references import lookup_reference, provider_stats, reference_index, remember_reference
+from utils.scheduler import SchedulerShed
 
 
 
@@ -18,27 +19,120 @@ model = os.getenv('MODEL')
 api_key = os.getenv('GROQ_API_KEY')
 books_api_key = os.getenv('GOOGLE_BOOKS_API_KEY')
 
-llm = ChatGroq(
-    groq_api_key=api_key,
-    model=model,
-    temperature=0.2,
-    max_tokens=300
-)
+MAX_BOOKS = 5
 
+_tool = None
+_prompt = None
 
-tool = GoogleBooksQueryRun(api_wrapper=GoogleBooksAPIWrapper())
 
-prompt = PromptTemplate.from_template(
-    "Return the keyword,or appropriate context that the user is looking for from this text: {text}"
-)
+def get_tool():
+    """GoogleBooksQueryRun for the blocking path, built on first use"""
+    global _tool
+    if _tool is None:
+        from langchain_community.tools.google_books import GoogleBooksQueryRun
+        from langchain_community.utilities.google_books import GoogleBooksAPIWrapper
 
+        _tool = GoogleBooksQueryRun(api_wrapper=GoogleBooksAPIWrapper())
+    return _tool
+
+
+def _get_prompt():
+    global _prompt
+    if _prompt is None:
+        from langchain_core.prompts import PromptTemplate
+
+        _prompt = PromptTemplate.from_template(
+            "Return the keyword,or appropriate context that the user is looking for from this text: {text}"
+        )
+    return _prompt
 
-def suggest_books(query):
-    chain = prompt | llm | StrOutputParser()
-    keyword = chain.invoke({"text": query})
-    return tool.run(keyword)
 
+def llm_keyword(query):
+    """Ask the LLM for the search keyword"""
+    try:
+        message = llm_calls.invoke(get_llm(temperature=0.2, max_tokens=300), _get_prompt().format(text=query), "books_keyword")
+    except SchedulerShed:
+        return _shed_keyword(query)
+    return message.content
 
 
+async def allm_keyword(query):
+    try:
+        message = await llm_calls.ainvoke(get_llm(temperature=0.2, max_tokens=300), _get_prompt().format(text=query), "books_keyword")
+    except SchedulerShed:
+        return _shed_keyword(query)
+    return message.content
 
 
+def _shed_keyword(query):
+    """The local keyword regardless of confidence, when the LLM call was shed"""
+    provider_stats.record("books", "keyword_shed")
+    return extract_keyword(query)[0] or query
+
+
+def suggest_books(query):
+    # Cached and offline results skip both the keyword LLM hop and the Books call
+    served = lookup_reference("books", query, MAX_BOOKS, lambda books: _format_books(query, books))
+    if served is not None:
+        return served
+
+    keyword = _local_keyword(query) or llm_keyword(query)
+    with provider_stats.call("books"):
+        result = get_tool().run(keyword)
+    remember_reference("books", query, MAX_BOOKS, result)
+    return result
+
+
+async def asuggest_books(query, max_results=MAX_BOOKS):
+    """Async variant of suggest_books using ainvoke and the shared HTTP client"""
+    served = lookup_reference("books", query, max_results, lambda books: _format_books(query, books))
+    if served is not None:
+        return served
+
+    keyword = _local_keyword(query) or await allm_keyword(query)
+    params = {"q": keyword, "maxResults": max_results}
+    if books_api_key:
+        params["key"] = books_api_key
+    with provider_stats.call("books"):
+        response = await get_async_client().get(f"{GOOGLE_BOOKS_API_BASE}/volumes", params=params)
+        response.raise_for_status()
+    books = response.json().get("items", [])
+
+    for book in books:
+        info = book.get("volumeInfo", {})
+        text = " ".join([info.get("title", ""), info.get("subtitle", ""), " ".join(info.get("categories", []))])
+        reference_index.add("books", book.get("id") or info.get("infoLink", ""), text, book)
+    # Labelled with the query, as cached and offline results are, not the derived search keyword
+    result = _format_books(query, books)
+    remember_reference("books", query, max_results, result)
+    return result
+
+
+def _local_keyword(query):
+    """Deterministic keyword extraction; None when confidence is too low and the LLM should decide"""
+    keyword, confidence = extract_keyword(query)
+    if keyword and confidence >= KEYWORD_CONFIDENCE_THRESHOLD:
+        provider_stats.record("books", "keyword_local")
+        return keyword
+    provider_stats.record("books", "keyword_llm")
+    return None
+
+
+def _format_books(query, books):
+    """Same text layout GoogleBooksQueryRun produces"""
+    if not books:
+        return f"Sorry no books could be found for your query: {query}"
+
+    results = [f"Here are {len(books)} suggestions for books related to {query}:"]
+    for i, book in enumerate(books, start=1):
+        info = book.get("volumeInfo", {})
+        authors = info.get("authors", [])
+        if len(authors) > 1:
+            authors = f"{', '.join(authors[:-1])}, and {authors[-1]}"
+        else:
+            authors = authors[0] if authors else "Unknown"
+        desc = f'{i}. "{info.get("title")}" by {authors}: {info.get("description")}\n'
+        desc += f"You can read more at {info.get('infoLink')}"
+        results.append(desc)
+
+    return "\n\n".join(results)
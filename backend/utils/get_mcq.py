@@ -1,33 +1,29 @@
 from dotenv import load_dotenv
 import os 
-from langchain_groq import ChatGroq
 from models.mcq_question import MCQOption, MCQuestion, MCQResponse
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import PydanticOutputParser
+import logging
+from pydantic import ValidationError
+from utils.cache import cached
+from utils.fast_json import is_malformed, json_object, mcq_response
+from utils import llm_calls
+from utils.metrics import span
+from utils.llm_pool import get_llm
+from utils.schema_prompt import format_instructions
+from utils.scheduler import SchedulerShed
+from utils.token_budget import TokenBudgetExceeded, schema_tokens, token_planner
 
 
 load_dotenv() # Load environment variables from .env file
 
+logger = logging.getLogger(__name__)
+
 model = os.getenv('MODEL')
 api_key = os.getenv('GROQ_API_KEY')
 
 if not model or not api_key:
     raise EnvironmentError("MODEL and GROQ_API_KEY must be set in the .env file")
 
-def get_mcq(topic: str, num_questions: int = 5, difficulty: str = "Medium"):
-    # Initialize Groq LLM
-    llm = ChatGroq(
-        temperature=0.3,
-        groq_api_key=api_key,
-        model_name=model # or "llama2-70b-4096"
-    )
-    
-    # Create output parser
-    parser = PydanticOutputParser(pydantic_object=MCQResponse)
-    
-    # Define prompt template
-    prompt = PromptTemplate(
-        template="""
+MCQ_TEMPLATE = """
         Create {num_questions} multiple choice questions about {topic}.
         
         Requirements:
@@ -43,24 +39,84 @@ def get_mcq(topic: str, num_questions: int = 5, difficulty: str = "Medium"):
         Topic: {topic}
         Number of questions: {num_questions}
         Difficulty: {difficulty}
-        """,
-        input_variables=["topic", "num_questions", "difficulty"],
-        partial_variables={"format_instructions": parser.get_format_instructions()}
-    )
-    
-    # Create chain
-    chain = prompt | llm | parser
-    
+        {focus}
+        """
+
+
+# Output is the JSON wrapper plus one object per question
+token_planner.register("mcq", overhead=30, per_unit=schema_tokens(MCQuestion))
+
+# Compiled on first use, then only the client lookup happens per request
+_prompt = None
+
+
+def _get_prompt():
+    global _prompt
+    if _prompt is None:
+        from langchain_core.prompts import PromptTemplate
+
+        _prompt = PromptTemplate(
+            template=MCQ_TEMPLATE,
+            input_variables=["topic", "num_questions", "difficulty", "focus"],
+            partial_variables={"format_instructions": format_instructions(MCQResponse)}
+        )
+    return _prompt
+
+
+def _format_prompt(topic: str, num_questions: int, difficulty: str, focus: str) -> str:
+    prompt = _get_prompt()
+    with span("prompt_format", endpoint="mcq"):
+        return prompt.format(topic=topic, num_questions=num_questions, difficulty=difficulty, focus=focus)
+
+
+def _parse(text: str) -> MCQResponse:
+    """
+    Validate the response's JSON object in one pydantic-core pass; output that
+    is not strict JSON goes through LangChain's lenient Markdown/JSON parser
+    """
+    with span("json_extraction", endpoint="mcq"):
+        raw = json_object(text)
+    with span("validation", endpoint="mcq"):
+        try:
+            return mcq_response.validate_json(raw)
+        except ValidationError as e:
+            if not is_malformed(e):
+                raise
+    from langchain_core.utils.json import parse_json_markdown
+
+    with span("json_extraction", endpoint="mcq"):
+        data = parse_json_markdown(text)
+    with span("validation", endpoint="mcq"):
+        return mcq_response.validate_python(data)
+
+
+@cached("mcq", MCQResponse, template=MCQ_TEMPLATE, semantic_field="topic")
+def get_mcq(topic: str, num_questions: int = 5, difficulty: str = "Medium", focus: str = ""):
     # Execute
     try:
-        result = chain.invoke({
-            "topic": topic,
-            "num_questions": num_questions,
-            "difficulty": difficulty
-        })
-        return result
+        prompt = _format_prompt(topic, num_questions, difficulty, focus)
+        plan = token_planner.plan("mcq", num_questions, prompt)
+        message = llm_calls.invoke(get_llm(temperature=0.3, max_tokens=plan.max_tokens), prompt, "mcq", plan)
+        return _parse(message.content)
+    except (TokenBudgetExceeded, SchedulerShed):
+        raise
+    except Exception as e:
+        logger.warning("MCQ generation failed: %s", e, extra={"topic": topic})
+        return None
+
+
+@cached("mcq", MCQResponse, template=MCQ_TEMPLATE, semantic_field="topic")
+async def aget_mcq(topic: str, num_questions: int = 5, difficulty: str = "Medium", focus: str = ""):
+    """Async variant of get_mcq using ainvoke"""
+    try:
+        prompt = _format_prompt(topic, num_questions, difficulty, focus)
+        plan = token_planner.plan("mcq", num_questions, prompt)
+        message = await llm_calls.ainvoke(get_llm(temperature=0.3, max_tokens=plan.max_tokens), prompt, "mcq", plan)
+        return _parse(message.content)
+    except (TokenBudgetExceeded, SchedulerShed):
+        raise
     except Exception as e:
-        print(f"Error generating MCQs: {e}")
+        logger.warning("MCQ generation failed: %s", e, extra={"topic": topic})
         return None
 
 if __name__ == "__main__":
@@ -1,11 +1,15 @@
 from models.theory import TheoryRequest, TheoryResponse
-from langchain.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_groq import ChatGroq
 import os
 from dotenv import load_dotenv
-import markdown
-import re
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from utils.cache import cached
+from utils import llm_calls
+from utils.metrics import span
+from utils.llm_pool import get_llm
+from utils.streaming import ThinkStripper
+from utils.keywords import domain_vocabulary
+from utils.theory_render import RenderedTheory, arender, render
+from utils.token_budget import Plan, token_planner
 
 load_dotenv()
 
@@ -15,20 +19,7 @@ api_key = os.getenv('GROQ_API_KEY')
 if not model or not api_key:
     raise EnvironmentError("MODEL and GROQ_API_KEY must be set in the .env file")
 
-# Load LLM
-llm = ChatGroq(
-    groq_api_key=api_key,
-    model=model,
-    temperature=0.2,
-    max_tokens=3000
-)
-
-async def get_theory(request: TheoryRequest) -> TheoryResponse:
-    """
-    Generate theory content using ChatGroq
-    """
-    # Create prompt template
-    system_prompt = """
+SYSTEM_PROMPT = """
 You are an expert educational content generator.
 
 Your task is to produce clean, structured, academic content without any reasoning, planning, or internal thoughts. 
@@ -45,7 +36,7 @@ The output must strictly include:
 Do not return anything outside these 4 sections. Do not include greetings, instructions, or commentary.
 """
 
-    human_prompt = """
+HUMAN_PROMPT = """
 Topic: {topic}  
 Subject: {subject}  
 Level: {level}  
@@ -72,73 +63,131 @@ Required Format:
 Only return the above structure. Do not include any planning, internal thoughts, or explanation.
 """
 
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", human_prompt)
-    ])
+# Markdown, LaTeX and list markup cost more than one token per requested word
+token_planner.register("theory", overhead=100, per_unit=1.4)
+
+_prompt_template = None
+
+
+def _get_prompt_template():
+    global _prompt_template
+    if _prompt_template is None:
+        from langchain_core.prompts import ChatPromptTemplate
+
+        _prompt_template = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
+            ("human", HUMAN_PROMPT)
+        ])
+    return _prompt_template
 
-    # Create chain
-    chain = prompt_template | llm | StrOutputParser()
-    
+
+@cached("theory", TheoryResponse, template=SYSTEM_PROMPT + HUMAN_PROMPT, semantic_field="request.topic")
+async def get_theory(request: TheoryRequest) -> TheoryResponse:
+    """
+    Generate theory content using ChatGroq
+    """
     # Generate content
-    content = await chain.ainvoke({
-        "topic": request.topic,
-        "subject": request.subject,
-        "level": request.level,
-        "learning_style": request.learning_style,
-        "max_length": request.max_length
-    })
-    
-    # Clean and format content
-    content = clean_latex_and_format(content)
-    
-    # Extract key concepts and examples
-    key_concepts, examples = _extract_concepts_and_examples(content)
-
-    return TheoryResponse(
-        topic=request.topic,
-        content=content,
-        key_concepts=key_concepts,
-        examples=examples,
-        level=request.level
-    )
-
-def _extract_concepts_and_examples(content: str):
-    """Extract key concepts and examples from generated content"""
-    lines = content.split('\n')
-    key_concepts = []
-    examples = []
-    
-    section = None
-    
-    for line in lines:
-        line = line.strip()
-        if line.lower().startswith("<h2>key concepts</h2>"):
-            section = "concepts"
-            continue
-        elif line.lower().startswith("<h2>examples</h2>"):
-            section = "examples"
-            continue
-        elif line.startswith("<h2>"):
-            section = None
-            continue
-
-        if section == "concepts" and line.startswith("<li><strong>"):
-            concept = re.sub(r"<[^>]+>", "", line).strip()
-            key_concepts.append(concept)
-        elif section == "examples" and line.startswith("<li><strong>"):
-            example = re.sub(r"<[^>]+>", "", line).strip()
-            examples.append(example)
-
-    return key_concepts, examples
+    messages = _format_messages(request)
+    plan = _plan(request, messages)
+    message = await llm_calls.ainvoke(_get_llm(plan), messages, "theory", plan)
+    return _build_response(request, await arender(message.content))
+
+
+async def astream_theory(request: TheoryRequest) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Stream theory content as ("section", {"title", "html"}) events, one per
+    completed Markdown section, followed by a trailing ("done", TheoryResponse).
+    """
+    hit = get_theory.lookup((request,), {})
+    if hit is not None:
+        yield "done", hit
+        return
+
+    stripper = ThinkStripper()
+    splitter = _SectionSplitter()
+    raw = []
+
+    messages = _format_messages(request)
+    plan = _plan(request, messages)
+    async for chunk in llm_calls.astream(_get_llm(plan), messages, "theory", plan):
+        raw.append(chunk.content)
+        for title, section in splitter.feed(stripper.feed(chunk.content)):
+            yield "section", {"title": title, "html": (await arender(section)).html}
+
+    for title, section in splitter.flush(stripper.flush()):
+        yield "section", {"title": title, "html": (await arender(section)).html}
+
+    response = _build_response(request, await arender("".join(raw)))
+    get_theory.store((request,), {}, response)
+    yield "done", response
+
+
+def _plan(request: TheoryRequest, messages) -> Plan:
+    return token_planner.plan("theory", request.max_length, messages)
+
+
+def _get_llm(plan: Plan):
+    return get_llm(temperature=0.2, max_tokens=plan.max_tokens)
+
+
+def _format_messages(request: TheoryRequest):
+    prompt_template = _get_prompt_template()
+    with span("prompt_format", endpoint="theory"):
+        return prompt_template.format_messages(
+            topic=request.topic,
+            subject=request.subject,
+            level=request.level,
+            learning_style=request.learning_style,
+            max_length=request.max_length
+        )
+
+
+def _build_response(request: TheoryRequest, rendered: RenderedTheory) -> TheoryResponse:
+    # Feed the local keyword extractor's domain vocabulary
+    domain_vocabulary.observe_document(rendered.html)
+    domain_vocabulary.observe_terms(concept.split(":")[0] for concept in rendered.key_concepts)
+
+    with span("validation", endpoint="theory"):
+        return TheoryResponse(
+            topic=request.topic,
+            content=rendered.html,
+            key_concepts=rendered.key_concepts,
+            examples=rendered.examples,
+            level=request.level
+        )
+
+
+class _SectionSplitter:
+    """Group streamed Markdown into "## " sections, releasing each once the next heading starts"""
+
+    def __init__(self):
+        self._buffer = ""
+        self._title = None
+        self._lines: List[str] = []
+
+    def feed(self, text: str) -> List[Tuple[Optional[str], str]]:
+        self._buffer += text
+        completed = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            if line.startswith("## "):
+                completed.extend(self._take())
+                self._title = line[3:].strip()
+            self._lines.append(line)
+        return completed
+
+    def flush(self, text: str = "") -> List[Tuple[Optional[str], str]]:
+        completed = self.feed(text + "\n")
+        completed.extend(self._take())
+        return completed
+
+    def _take(self) -> List[Tuple[Optional[str], str]]:
+        section = "\n".join(self._lines)
+        title = self._title
+        self._lines = []
+        self._title = None
+        return [(title, section)] if section.strip() else []
 
 def clean_latex_and_format(content: str) -> str:
     """Clean LaTeX, remove think blocks, and format content"""
-    # Remove <think> blocks and their content
-    content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
-    # Fix escaped LaTeX and newlines
-    content = content.replace("\\(", "(").replace("\\)", ")")
-    content = re.sub(r"\\\\", r"\\", content)
-    # Convert Markdown to HTML
-    content = markdown.markdown(content)
-    return content
\ No newline at end of file
+    return render(content).html
@@ -1,17 +1,26 @@
-from langchain_groq import ChatGroq
-from langchain.output_parsers import PydanticOutputParser
 
 from models.theory_question import TheoryQuestion , TheoryQuestionsResponse
 import os 
 from dotenv import load_dotenv
-from langchain.prompts import PromptTemplate
-import json
-from typing import List, Optional, Dict, Any
-import re
+from typing import List, Optional, Dict, Any, AsyncIterator
+import logging
+import time
+from pydantic import ValidationError
+from utils.cache import cached
+from utils import llm_calls
+from utils.metrics import record, span
+from utils.llm_pool import get_llm
+from utils.json_stream import JSONStreamError, QuestionStreamScanner
+from utils.fast_json import exam_summary, is_malformed, theory_question
+from utils.retry import get_engine
+from utils.schema_prompt import format_instructions
+from utils.token_budget import schema_tokens, token_planner
 
 
 load_dotenv() # Load environment variables from .env file
 
+logger = logging.getLogger(__name__)
+
 
 
 
@@ -24,54 +33,15 @@ if not model or not api_key:
 
 
 def extract_json_from_response(text: str) -> Optional[Dict[Any, Any]]:
-    """Extract JSON from LLM response with multiple fallback methods"""
-    
-    # Method 1: Remove thinking tags and extract JSON
-    cleaned_text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL | re.IGNORECASE)
-    
-    # Method 2: Remove code blocks
-    if '```' in cleaned_text:
-        # Extract content between code blocks
-        code_block_pattern = r'```(?:json)?\s*(.*?)\s*```'
-        matches = re.findall(code_block_pattern, cleaned_text, re.DOTALL)
-        if matches:
-            cleaned_text = matches[0]
-    
-    # Method 3: Find JSON-like structure
-    json_patterns = [
-        r'\{.*\}',  # Basic JSON pattern
-        r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}',  # Nested JSON pattern
-    ]
-    
-    for pattern in json_patterns:
-        matches = re.findall(pattern, cleaned_text, re.DOTALL)
-        for match in matches:
-            try:
-                # Clean the match
-                match = match.strip()
-                parsed = json.loads(match)
-                if isinstance(parsed, dict) and 'questions' in parsed:
-                    return parsed
-            except json.JSONDecodeError:
-                continue
-    
-    # Method 4: Try to find JSON starting with specific structure
-    start_patterns = [
-        r'(\{"questions":\s*\[.*?\]\s*,.*?\})',
-        r'(\{[^}]*"questions"[^}]*\})',
-    ]
-    
-    for pattern in start_patterns:
-        matches = re.findall(pattern, cleaned_text, re.DOTALL)
-        for match in matches:
-            try:
-                parsed = json.loads(match)
-                if isinstance(parsed, dict) and 'questions' in parsed:
-                    return parsed
-            except json.JSONDecodeError:
-                continue
-    
-    return None
+    """Extract the questions JSON from an LLM response in a single linear pass"""
+    scanner = QuestionStreamScanner()
+    try:
+        with span("json_extraction", endpoint="theory_questions"):
+            scanner.feed(text)
+            return scanner.close()
+    except JSONStreamError as e:
+        logger.warning("JSON extraction failed: %s", e)
+        return None
 
 
 def create_fallback_response(topic: str, num_questions: int = 3) -> TheoryQuestionsResponse:
@@ -114,129 +84,269 @@ def create_fallback_response(topic: str, num_questions: int = 3) -> TheoryQuesti
     )
 
 
+def theory_questions_response(topic: str, num_questions: int, questions: List[TheoryQuestion]) -> TheoryQuestionsResponse:
+    """Exam built from served questions, or the fallback exam when there are none"""
+    if not questions:
+        return create_fallback_response(topic, num_questions)
+    return TheoryQuestionsResponse(
+        questions=questions,
+        total_marks=sum(q.marks_allocation for q in questions),
+        exam_duration=sum(q.estimated_time for q in questions)
+    )
+
+
+THEORY_QUESTIONS_TEMPLATE = """Create {num_questions} theory questions about {topic}.
+
+{format_instructions}
+
+Topic: {topic}
+Questions: {num_questions}
+Difficulty: {difficulty}
+{focus}"""
+
+# Scalar fields whose descriptions carry allowed values or units into the compact prompt
+CONSTRAINED_FIELDS = ("question_type", "difficulty", "bloom_level", "estimated_time", "marks_allocation",
+                      "total_marks", "exam_duration")
+
+
 def get_theory_questions_robust(topic: str, 
                               num_questions: int = 3, 
                               difficulty: str = "Medium",
-                              use_fallback: bool = True) -> Optional[TheoryQuestionsResponse]:
+                              use_fallback: bool = True,
+                              focus: str = "") -> Optional[TheoryQuestionsResponse]:
+    """
+    Robust theory questions generator: retries only for the questions still
+    missing, backs off on rate limits and gives up at the generation deadline
+    """
+    result = _generate_theory_questions(topic, num_questions, difficulty, focus)
+    return _result_or_fallback(result, topic, num_questions, use_fallback)
+
+
+async def aget_theory_questions_robust(topic: str, 
+                                     num_questions: int = 3, 
+                                     difficulty: str = "Medium",
+                                     use_fallback: bool = True,
+                                     focus: str = "") -> Optional[TheoryQuestionsResponse]:
     """
-    Robust theory questions generator with multiple retry strategies
+    Async variant of get_theory_questions_robust using the streaming LLM API
     """
+    result = await _agenerate_theory_questions(topic, num_questions, difficulty, focus)
+    return _result_or_fallback(result, topic, num_questions, use_fallback)
+
+
+def _result_or_fallback(result, topic: str, num_questions: int, use_fallback: bool) -> Optional[TheoryQuestionsResponse]:
+    if result:
+        return result
     
-    try:
-        llm = ChatGroq(
-            temperature=0.1,
-            groq_api_key=api_key,  # Replace with your actual key
-            model=model,
-            max_tokens=4000
-        )
-    except Exception as e:
-        print(f"Failed to initialize LLM: {e}")
-        if use_fallback:
-            return create_fallback_response(topic, num_questions)
-        return None
+    logger.warning("All attempts failed", extra={"topic": topic, "fallback": use_fallback})
+    
+    # Return fallback if enabled
+    if use_fallback:
+        return create_fallback_response(topic, num_questions)
     
-    # Ultra-simple prompt focusing only on JSON output
-    prompt_template = """Create {num_questions} theory questions about {topic}.
-
-Return ONLY this JSON format (no other text):
-
-{{
-  "questions": [
-    {{
-      "question": "Your question text here",
-      "question_type": "Definition",
-      "difficulty": "{difficulty}",
-      "topic_tags": ["{topic}"],
-      "bloom_level": "Understand",
-      "estimated_time": 15,
-      "key_concepts": ["concept1", "concept2"],
-      "sample_answer_outline": ["point1", "point2", "point3"],
-      "evaluation_criteria": ["criteria1", "criteria2"],
-      "prerequisite_knowledge": ["prereq1"],
-      "marks_allocation": 15
-    }}
-  ],
-  "total_marks": 45,
-  "exam_duration": 45
-}}
+    return None
 
-Topic: {topic}
-Questions: {num_questions}
-Difficulty: {difficulty}"""
 
-    prompt = PromptTemplate(
-        template=prompt_template,
-        input_variables=["topic", "num_questions", "difficulty"]
-    )
+_prompt = None
+
+
+def _get_prompt():
+    global _prompt
+    if _prompt is None:
+        from langchain_core.prompts import PromptTemplate
+
+        _prompt = PromptTemplate(
+            template=THEORY_QUESTIONS_TEMPLATE,
+            input_variables=["topic", "num_questions", "difficulty", "focus"],
+            # Field names say enough for free text; fields with a fixed vocabulary or unit keep theirs
+            partial_variables={"format_instructions": format_instructions(TheoryQuestionsResponse, descriptions=CONSTRAINED_FIELDS)}
+        )
+    return _prompt
+
+# Output is the exam wrapper (total_marks, exam_duration) plus one object per question
+token_planner.register("theory_questions", overhead=40, per_unit=schema_tokens(TheoryQuestion))
+
+# Try multiple approaches
+approaches = [
+    {"temperature": 0.0},
+    {"temperature": 0.1},
+    {"temperature": 0.0}
+]
+
+
+@cached("theory_questions", TheoryQuestionsResponse, template=THEORY_QUESTIONS_TEMPLATE, semantic_field="topic")
+def _generate_theory_questions(topic: str, num_questions: int, difficulty: str, focus: str = "") -> Optional[TheoryQuestionsResponse]:
+    """Run the retry engine; returns None when no attempt produced a valid question"""
+    batch = _QuestionBatch(num_questions)
     
-    # Try multiple approaches
-    approaches = [
-        {"model":model ,"temperature": 0.0},
-        { "model":model ,"temperature": 0.1},
-        {"model":model, "temperature": 0.0}
-    ]
+    def attempt(i: int):
+        logger.debug("Trying approach %d for %d questions", i + 1, batch.missing())
+        prompt = _format_prompt(topic, batch.missing(), difficulty, focus)
+        plan = token_planner.plan("theory_questions", batch.missing(), prompt)
+        # Shared client for this approach's parameters
+        current_llm = get_llm(max_tokens=plan.max_tokens, **approaches[i % len(approaches)])
+        response = llm_calls.invoke(current_llm, prompt, "theory_questions", plan)
+        response_text = response.content if hasattr(response, 'content') else str(response)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response preview: %s...", response_text[:200], extra={"response_length": len(response_text)})
+        
+        scanner = _scanner()
+        with span("json_extraction", endpoint="theory_questions"):
+            try:
+                items = scanner.feed(response_text)
+            except JSONStreamError as e:
+                items = e.items
+                logger.warning("Malformed JSON, keeping %d parsed questions: %s", len(items), e)
+        return _salvage(scanner, items)
+    
+    get_engine("theory_questions").run_sync(attempt, batch.add)
+    return batch.response()
+
+
+@cached("theory_questions", TheoryQuestionsResponse, template=THEORY_QUESTIONS_TEMPLATE, semantic_field="topic")
+async def _agenerate_theory_questions(topic: str, num_questions: int, difficulty: str, focus: str = "") -> Optional[TheoryQuestionsResponse]:
+    """Async variant of _generate_theory_questions"""
+    batch = _QuestionBatch(num_questions)
     
-    for i, approach_params in enumerate(approaches):
+    async def attempt(i: int):
+        logger.debug("Trying approach %d for %d questions", i + 1, batch.missing())
+        prompt = _format_prompt(topic, batch.missing(), difficulty, focus)
+        plan = token_planner.plan("theory_questions", batch.missing(), prompt)
+        current_llm = get_llm(max_tokens=plan.max_tokens, **approaches[i % len(approaches)])
+        
+        # Stream so malformed output aborts the attempt as soon as it is detected
+        scanner = _scanner()
+        items = []
+        parsing = 0.0
         try:
-            print(f"Trying approach {i+1}...")
-            
-            # Update LLM with new parameters
-            current_llm = ChatGroq(
-                groq_api_key=api_key,  # Replace with your actual key
-                max_tokens=4000,
-                **approach_params
-            )
-            
-            # Generate response
-            formatted_prompt = prompt.format(
-                topic=topic,
-                num_questions=num_questions,
-                difficulty=difficulty
-            )
-            
-            response = current_llm.invoke(formatted_prompt)
-            response_text = response.content if hasattr(response, 'content') else str(response)
-            
-            print(f"Response length: {len(response_text)}")
-            print(f"Response preview: {response_text[:200]}...")
-            
-            # Extract JSON
-            extracted_json = extract_json_from_response(response_text)
-            
-            if extracted_json:
-                print("Successfully extracted JSON")
-                
-                # Validate required fields
-                if 'questions' not in extracted_json:
-                    extracted_json['questions'] = []
-                if 'total_marks' not in extracted_json:
-                    extracted_json['total_marks'] = sum(q.get('marks_allocation', 15) for q in extracted_json['questions'])
-                if 'exam_duration' not in extracted_json:
-                    extracted_json['exam_duration'] = len(extracted_json['questions']) * 15
-                
-                # Try to create Pydantic model
+            async for chunk in llm_calls.astream(current_llm, prompt, "theory_questions", plan):
+                start = time.perf_counter()
                 try:
-                    result = TheoryQuestionsResponse(**extracted_json)
-                    print(f"Successfully created {len(result.questions)} questions")
-                    return result
-                except Exception as validation_error:
-                    print(f"Validation error: {validation_error}")
-                    continue
-            else:
-                print("Could not extract valid JSON")
-                
-        except Exception as e:
-            print(f"Approach {i+1} failed: {e}")
-            continue
-    
-    print("All approaches failed")
+                    items += scanner.feed(chunk.content)
+                except JSONStreamError as e:
+                    items += e.items
+                    raise
+                finally:
+                    parsing += time.perf_counter() - start
+        except JSONStreamError as e:
+            logger.warning("Malformed JSON, keeping %d parsed questions: %s", len(items), e)
+        record("json_extraction", parsing, endpoint="theory_questions")
+        return _salvage(scanner, items)
     
-    # Return fallback if enabled
-    if use_fallback:
-        print("Using fallback response")
-        return create_fallback_response(topic, num_questions)
+    await get_engine("theory_questions").run(attempt, batch.add)
+    return batch.response()
+
+
+def _format_prompt(topic: str, num_questions: int, difficulty: str, focus: str = "") -> str:
+    prompt = _get_prompt()
+    with span("prompt_format", endpoint="theory_questions"):
+        return prompt.format(
+            topic=topic,
+            num_questions=num_questions,
+            difficulty=difficulty,
+            focus=focus
+        )
+
+
+def _load_question(raw: str) -> Optional[TheoryQuestion]:
+    """
+    One streamed question validated straight from its JSON text; None if it
+    does not fit the model. Runs inside the scanner, so its time is part of
+    json_extraction: a span per item would cost more than the validation.
+    """
+    try:
+        return theory_question.validate_json(raw)
+    except ValidationError as e:
+        if is_malformed(e):
+            raise JSONStreamError(f"Invalid JSON in stream: {e}") from e
+        logger.info("Validation error: %s", e)
+        return None
+
+
+def _load_exam(raw: str) -> Dict[str, Any]:
+    """The exam metadata of a response, without materialising its questions a second time"""
+    try:
+        return exam_summary.validate_json(raw)
+    except ValidationError as e:
+        raise JSONStreamError(f"Invalid JSON in stream: {e}") from e
+
+
+def _scanner() -> QuestionStreamScanner:
+    return QuestionStreamScanner(load_item=_load_question, load_root=_load_exam)
+
+
+def _salvage(scanner: QuestionStreamScanner, items: List[Optional[TheoryQuestion]]):
+    """Keep every individually valid question from an attempt, even if the whole payload is broken"""
+    try:
+        root = scanner.close()
+    except JSONStreamError as e:
+        logger.info("Could not extract valid JSON: %s", e)
+        root = None
     
-    return None
+    questions = [question for question in items if question is not None]
+    if not questions:
+        raise ValueError("No valid questions in response")
+    return questions, root
+
+
+class _QuestionBatch:
+    """Valid questions accumulated across attempts until the requested count is reached"""
+    
+    def __init__(self, num_questions: int):
+        self.num_questions = num_questions
+        self.questions: List[TheoryQuestion] = []
+        self.root: Optional[Dict[str, Any]] = None
+    
+    def missing(self) -> int:
+        return self.num_questions - len(self.questions)
+    
+    def add(self, salvaged) -> bool:
+        questions, root = salvaged
+        if not self.questions and len(questions) >= self.num_questions:
+            # One attempt delivered everything: trust its exam metadata
+            self.root = root
+        self.questions.extend(questions[:self.missing()])
+        logger.debug("Collected %d/%d questions", len(self.questions), self.num_questions)
+        return self.missing() <= 0
+    
+    def response(self) -> Optional[TheoryQuestionsResponse]:
+        if not self.questions:
+            return None
+        exam_duration = (self.root or {}).get('exam_duration')
+        if not isinstance(exam_duration, int):
+            exam_duration = sum(q.estimated_time for q in self.questions)
+        return TheoryQuestionsResponse(
+            questions=self.questions,
+            total_marks=sum(q.marks_allocation for q in self.questions),
+            exam_duration=exam_duration
+        )
+
+
+async def astream_theory_questions(topic: str, 
+                                   num_questions: int = 3, 
+                                   difficulty: str = "Medium") -> AsyncIterator[TheoryQuestion]:
+    """
+    Yield each TheoryQuestion as soon as its JSON object closes in the token stream.
+    Raises JSONStreamError as soon as the output can no longer be valid.
+    """
+    formatted_prompt = _format_prompt(topic, num_questions, difficulty)
+    plan = token_planner.plan("theory_questions", num_questions, formatted_prompt)
+    scanner = _scanner()
+    llm = get_llm(max_tokens=plan.max_tokens, **approaches[0])
+    async for chunk in llm_calls.astream(llm, formatted_prompt, "theory_questions", plan):
+        try:
+            questions = scanner.feed(chunk.content)
+        except JSONStreamError as e:
+            # Questions that closed in the same chunk are still good
+            for question in e.items:
+                if question is not None:
+                    yield question
+            raise
+        for question in questions:
+            if question is not None:
+                yield question
+    scanner.close()
 
 
 def get_theory_questions(topic : str , num_questions: int , difficulty: str):
@@ -250,6 +360,18 @@ def get_theory_questions(topic : str , num_questions: int , difficulty: str):
     if result:
         return result
     else:
-        print("Failed to generate questions")
+        logger.warning("Failed to generate questions", extra={"topic": topic})
 
 
+async def aget_theory_questions(topic : str , num_questions: int , difficulty: str):
+    """Async variant of get_theory_questions"""
+    result = await aget_theory_questions_robust(
+        topic=topic,
+        num_questions=num_questions,
+        difficulty=difficulty
+    )
+    
+    if result:
+        return result
+    else:
+        logger.warning("Failed to generate questions", extra={"topic": topic})
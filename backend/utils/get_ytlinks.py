@@ -1,21 +1,61 @@
-from googleapiclient.discovery import build
+from utils.http_client import YOUTUBE_API_BASE, get_async_client
+from utils.references import lookup_reference, provider_stats, reference_index, remember_reference
 import os
 
 
 api_key = os.getenv('YOUTUBE_API_KEY')
 
-def get_yt_links():
-    youtube = build("youtube", "v3", developerKey=api_key)
-    query = "Parabola Math" 
-    max_results= 5
-    response = youtube.search().list(
-        q=query,
-        part="snippet",
-        type="video",
-        videoDuration="long",
-        maxResults=max_results
-    ).execute()
+_youtube = None
 
+
+def _get_youtube():
+    """Build the discovery client once; building it fetches and parses the discovery document"""
+    global _youtube
+    if _youtube is None:
+        from googleapiclient.discovery import build
+
+        _youtube = build("youtube", "v3", developerKey=api_key)
+    return _youtube
+
+
+def get_yt_links(query: str = "Parabola Math", max_results: int = 5):
+    served = lookup_reference("youtube", query, max_results)
+    if served is not None:
+        return served
+
+    with provider_stats.call("youtube"):
+        response = _get_youtube().search().list(
+            q=query,
+            part="snippet",
+            type="video",
+            videoDuration="long",
+            maxResults=max_results
+        ).execute()
+
+    return _remember(query, max_results, _format_results(response))
+
+
+async def aget_yt_links(query: str = "Parabola Math", max_results: int = 5):
+    """Async variant of get_yt_links calling the Data API over the shared HTTP client"""
+    served = lookup_reference("youtube", query, max_results)
+    if served is not None:
+        return served
+
+    with provider_stats.call("youtube"):
+        response = await get_async_client().get(f"{YOUTUBE_API_BASE}/search", params={
+            "q": query,
+            "part": "snippet",
+            "type": "video",
+            "videoDuration": "long",
+            "maxResults": max_results,
+            "key": api_key,
+        })
+        response.raise_for_status()
+
+    return _remember(query, max_results, _format_results(response.json()))
+
+
+def _format_results(response):
     results = []
     
     for item in response["items"]:
@@ -25,3 +65,10 @@ def get_yt_links():
         results.append({"title": title, "url": video_url})
 
     return results
+
+
+def _remember(query, max_results, results):
+    remember_reference("youtube", query, max_results, results)
+    for video in results:
+        reference_index.add("youtube", video["url"], video["title"], video)
+    return results
@@ -0,0 +1,241 @@
+import gzip
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+from utils.fast_json import dumps
+
+
+load_dotenv() # Load environment variables from .env file
+
+# Freshness granted to browsers and CDNs for deterministic responses
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', '3600'))
+# How long a shared cache may keep serving a stale copy while it revalidates
+HTTP_CACHE_STALE_SECONDS = int(os.getenv('HTTP_CACHE_STALE_SECONDS', '86400'))
+# Smaller bodies are sent uncompressed; the gain would not cover the framing
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+# Heap kept for serialized, pre-compressed public responses; 0 disables the body cache
+BODY_CACHE_MAX_BYTES = int(os.getenv('BODY_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Cached variants at least this large live in memory-mapped temporary files instead of the heap
+BODY_CACHE_MMAP_BYTES = int(os.getenv('BODY_CACHE_MMAP_BYTES', str(256 * 1024)))
+
+PUBLIC = f"public, max-age={HTTP_CACHE_MAX_AGE}, stale-while-revalidate={HTTP_CACHE_STALE_SECONDS}"
+PRIVATE = "private, no-store"
+
+# In order of preference when a client accepts several equally
+ENCODINGS = ("br", "gzip")
+
+# Loaded on first use; False once the optional brotli package turned out to be missing
+_brotli = None
+
+
+def _get_brotli():
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli or None
+
+
+def available_encodings(size: int) -> Iterable[str]:
+    if size < COMPRESS_MIN_BYTES:
+        return ()
+    return tuple(encoding for encoding in ENCODINGS if encoding != "br" or _get_brotli())
+
+
+def compress(body: bytes, encoding: str, precompute: bool = False) -> bytes:
+    """Best ratio for bodies compressed once and cached, cheaper settings for one-off responses"""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9 if precompute else 5, mtime=0)
+    return _get_brotli().compress(body, quality=9 if precompute else 4)
+
+
+def negotiate(accept_encoding: str, encodings: Iterable[str]) -> str:
+    """The encoding in `encodings` the Accept-Encoding header ranks highest, else identity"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, param = part.partition(";")
+        param = param.strip()
+        try:
+            weight = float(param[2:]) if param.startswith("q=") else 1.0
+        except ValueError:
+            weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = "identity", 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against our ETag; the tags of
+    a body's compressed variants match each other
+    """
+    if if_none_match.strip() == "*":
+        return True
+    digest = _digest(etag)
+    return any(_digest(tag) == digest for tag in if_none_match.split(","))
+
+
+def _digest(tag: str) -> str:
+    return tag.strip().removeprefix("W/").strip('"').partition("-")[0]
+
+
+def _etag(digest: str, encoding: str) -> str:
+    # Each representation needs its own strong tag
+    return f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+
+
+class Body(NamedTuple):
+    digest: str
+    variants: Dict[str, Any]  # encoding -> bytes, or a memoryview of a mapped file
+    expires_at: float
+    heap_bytes: int
+    mapped_bytes: int
+
+
+def _mapped(data: bytes) -> memoryview:
+    """data in an unlinked temporary file mapped into memory; the file goes away with the last reference"""
+    with tempfile.TemporaryFile() as f:
+        f.write(data)
+        f.flush()
+        return memoryview(mmap.mmap(f.fileno(), len(data), access=mmap.ACCESS_READ))
+
+
+class BodyCache:
+    """
+    LRU of serialized public responses with every compressed variant computed
+    up front, bounded by the heap the bodies take. Variants of at least
+    mmap_bytes are kept in memory-mapped files and do not count against it.
+    """
+
+    def __init__(self, max_bytes: int = BODY_CACHE_MAX_BYTES, mmap_bytes: int = BODY_CACHE_MMAP_BYTES,
+                 ttl: float = HTTP_CACHE_MAX_AGE):
+        self.max_bytes = max_bytes
+        self.mmap_bytes = mmap_bytes
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Body]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.heap_bytes = 0
+        self.mapped_bytes = 0
+        self.stats = defaultdict(int)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Optional[Body]:
+        with self._lock:
+            body = self._data.get(key)
+            if body is not None and body.expires_at < time.time():
+                self._remove(key)
+                body = None
+            if body is None:
+                self.stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return body
+
+    def put(self, key: str, digest: str, identity: bytes) -> Body:
+        variants = {"identity": identity}
+        for encoding in available_encodings(len(identity)):
+            variants[encoding] = compress(identity, encoding, precompute=True)
+        heap = mapped = 0
+        for encoding, data in variants.items():
+            if len(data) >= self.mmap_bytes:
+                variants[encoding] = _mapped(data)
+                mapped += len(data)
+            else:
+                heap += len(data)
+        body = Body(digest, variants, time.time() + self.ttl, heap, mapped)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = body
+            self.heap_bytes += heap
+            self.mapped_bytes += mapped
+            self.stats["stored"] += 1
+            while self.heap_bytes > self.max_bytes and self._data:
+                self._remove(next(iter(self._data)))
+                self.stats["evicted"] += 1
+        return body
+
+    def _remove(self, key: str):
+        body = self._data.pop(key)
+        self.heap_bytes -= body.heap_bytes
+        self.mapped_bytes -= body.mapped_bytes
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "entries": len(self._data),
+                    "heap_bytes": self.heap_bytes, "mapped_bytes": self.mapped_bytes}
+
+
+body_cache = BodyCache()
+
+# Response bytes actually sent, per Content-Encoding, and what they would have been uncompressed
+wire_stats = defaultdict(int)
+
+
+def _key(request: Request, params: BaseModel) -> str:
+    # params are the validated, canonicalized query parameters
+    return request.url.path + "?" + params.model_dump_json()
+
+
+def _send(request: Request, digest: str, variants: Dict[str, Any], cache_control: str) -> Response:
+    """The best variant the client accepts, or 304; variants may lack an encoding until it is chosen"""
+    identity = variants["identity"]
+    encoding = negotiate(request.headers.get("accept-encoding", ""), available_encodings(len(identity)))
+    headers = {"ETag": _etag(digest, encoding), "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    body = variants.get(encoding)
+    if body is None:
+        body = compress(identity, encoding)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    wire_stats[encoding] += len(body)
+    wire_stats["uncompressed"] += len(identity)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def cached_response(request: Request, params: BaseModel) -> Optional[Response]:
+    """The stored response for this route and params, if cacheable() kept one within HTTP_CACHE_MAX_AGE"""
+    if not body_cache.enabled:
+        return None
+    body = body_cache.get(_key(request, params))
+    if body is None:
+        return None
+    return _send(request, body.digest, body.variants, PUBLIC)
+
+
+def cacheable(request: Request, content: Any, private: bool = False, params: Optional[BaseModel] = None) -> Response:
+    """
+    JSON response with a content-hash ETag and Cache-Control, compressed as the
+    client's Accept-Encoding allows; a matching If-None-Match gets an empty 304
+    instead of the body. With params, a public response is also kept
+    serialized and pre-compressed, and cached_response() serves it until
+    HTTP_CACHE_MAX_AGE runs out.
+    """
+    identity = dumps(content)
+    digest = hashlib.sha256(identity).hexdigest()[:32]
+    if private or params is None or not body_cache.enabled:
+        return _send(request, digest, {"identity": identity}, PRIVATE if private else PUBLIC)
+    body = body_cache.put(_key(request, params), digest, identity)
+    return _send(request, digest, body.variants, PUBLIC)
@@ -0,0 +1,30 @@
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+
+load_dotenv() # Load environment variables from .env file
+
+# Overridable so the benchmarks can point at a local stub server
+YOUTUBE_API_BASE = os.getenv('YOUTUBE_API_BASE', 'https://www.googleapis.com/youtube/v3')
+GOOGLE_BOOKS_API_BASE = os.getenv('GOOGLE_BOOKS_API_BASE', 'https://www.googleapis.com/books/v1')
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv('HTTP_TIMEOUT_SECONDS', '10'))
+
+_async_client = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared async client for the external reference APIs"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS)
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,152 @@
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.streaming import ThinkStripper
+
+
+class JSONStreamError(ValueError):
+    """
+    Raised as soon as the streamed JSON can no longer be valid. When raised
+    from feed(), `items` holds the items that chunk completed before the error.
+    """
+
+    def __init__(self, message: str, items: Optional[List[Any]] = None):
+        super().__init__(message)
+        self.items = list(items or [])
+
+
+_CLOSERS = {'}': '{', ']': '['}
+
+
+class QuestionStreamScanner:
+    """
+    Incremental, brace-aware scanner for LLM output of the form
+    {"questions": [{...}, {...}], ...}.
+
+    Feed it text chunks as they stream in. Prose, code fences and <think> blocks
+    around the JSON are skipped; each object inside the top-level `array_key`
+    array is returned from feed() as soon as it closes. Each character is
+    scanned once, so cost is linear in the response length.
+
+    Items and the root are decoded with json.loads unless `load_item` /
+    `load_root` are given; those receive the raw JSON text and may raise
+    json.JSONDecodeError or JSONStreamError for malformed input.
+    """
+
+    def __init__(self, array_key: str = "questions",
+                 load_item: Callable[[str], Any] = json.loads,
+                 load_root: Callable[[str], Any] = json.loads):
+        self.array_key = array_key
+        self._load_item = load_item
+        self._load_root = load_root
+        self._think = ThinkStripper()
+        self._reset_root()
+        self.root: Optional[Dict[str, Any]] = None
+
+    def _reset_root(self):
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._last_string = None
+        self._array_is_target = False
+        self._saw_target = False
+        # Text carried over from earlier chunks for the root, current item and current root-level string
+        self._root_parts: List[str] = []
+        self._item_parts: Optional[List[str]] = None
+        self._key_parts: Optional[List[str]] = None
+
+    def feed(self, text: str) -> List[Any]:
+        """Consume a chunk and return every array item completed by it"""
+        if self.root is not None:
+            return []
+        items = []
+        try:
+            self._scan(self._think.feed(text), items)
+        except JSONStreamError as e:
+            e.items = items
+            raise
+        return items
+
+    def close(self) -> Any:
+        """Finish the stream and return the top-level object"""
+        if self.root is None:
+            self._scan(self._think.flush(), [])
+        if self.root is None:
+            if self._stack:
+                raise JSONStreamError("Unterminated JSON object")
+            raise JSONStreamError(f"No JSON object with '{self.array_key}' found")
+        return self.root
+
+    def _scan(self, text: str, items: List[Any]):
+        """Scan text, appending completed items to `items` as they close"""
+        stack = self._stack
+        # Offsets into text where the parts not yet carried over begin
+        root_from = 0 if stack else None
+        item_from = 0 if self._item_parts is not None else None
+        key_from = 0 if self._key_parts is not None else None
+
+        for i, ch in enumerate(text):
+            if not stack:
+                if ch == '{':
+                    stack.append('{')
+                    root_from = i
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_parts is not None:
+                        # Remember the last string seen directly inside the root object
+                        self._last_string = "".join(self._key_parts) + text[key_from:i]
+                        self._key_parts = None
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if len(stack) == 1:
+                    self._key_parts = []
+                    key_from = i + 1
+            elif ch in '{[':
+                if len(stack) == 1 and ch == '[':
+                    self._array_is_target = self._last_string == self.array_key
+                    self._saw_target = self._saw_target or self._array_is_target
+                elif len(stack) == 2 and ch == '{' and self._array_is_target:
+                    self._item_parts = []
+                    item_from = i
+                stack.append(ch)
+            elif ch in '}]':
+                if stack[-1] != _CLOSERS[ch]:
+                    if self._saw_target:
+                        raise JSONStreamError(f"Mismatched '{ch}' in streamed JSON")
+                    # Braces in the surrounding prose: keep looking for the real object
+                    self._reset_root()
+                    stack = self._stack
+                    continue
+                stack.pop()
+                if len(stack) == 2 and self._item_parts is not None:
+                    items.append(self._load(self._load_item, "".join(self._item_parts) + text[item_from:i + 1]))
+                    self._item_parts = None
+                elif not stack:
+                    raw = "".join(self._root_parts) + text[root_from:i + 1]
+                    if self._saw_target:
+                        self.root = self._load(self._load_root, raw)
+                        return
+                    self._reset_root()
+                    stack = self._stack
+
+        if stack:
+            self._root_parts.append(text[root_from:])
+            if self._item_parts is not None:
+                self._item_parts.append(text[item_from:])
+            if self._key_parts is not None:
+                self._key_parts.append(text[key_from:])
+
+    def _load(self, load: Callable[[str], Any], raw: str) -> Any:
+        try:
+            return load(raw)
+        except json.JSONDecodeError as e:
+            raise JSONStreamError(f"Invalid JSON in stream: {e}") from e
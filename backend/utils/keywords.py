@@ -0,0 +1,100 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+from dotenv import load_dotenv
+
+
+load_dotenv() # Load environment variables from .env file
+
+# Below this confidence suggest_books falls back to the LLM keyword chain
+KEYWORD_CONFIDENCE_THRESHOLD = float(os.getenv('KEYWORD_CONFIDENCE_THRESHOLD', '0.6'))
+KEYWORD_MAX_TERMS = int(os.getenv('KEYWORD_MAX_TERMS', '3'))
+
+STOPWORDS = set("""
+a about above after again all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further get give had has have
+having he her here hers him his how i if in into is it its itself just let like me more most my need
+no nor not now of off on once only or other our out over own please same she should show so some
+such than that the their them then there these they this those through to too under until up very
+want was we were what when where which while who whom why will with would you your
+book books text textbook textbooks read reading recommend recommendation recommendations suggest
+suggestion suggestions find looking look search learn study studying guide explain explains
+explained understand understanding good best great full complete beginner beginners introduction
+intro basic basics topic topics something anything resource resources material materials
+work works working use used using make makes know
+""".split())
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9+#\-']*")
+_TAG = re.compile(r"<[^>]+>")
+
+
+def _term(word: str) -> str:
+    """Lowercase and fold simple plurals, so parabolas weighs like parabola"""
+    word = word.lower()
+    return word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+
+
+class DomainVocabulary:
+    """
+    Document frequencies over our generated theory content, plus counts of
+    topic_tags and key concepts, used to weight query terms
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.document_frequency = Counter()
+        self.domain_terms = Counter()
+
+    def observe_document(self, text: str):
+        terms = {_term(w) for w in _WORD.findall(_TAG.sub(" ", text))}
+        with self._lock:
+            self.documents += 1
+            self.document_frequency.update(terms)
+
+    def observe_terms(self, phrases: Iterable[str]):
+        with self._lock:
+            for phrase in phrases:
+                self.domain_terms.update(_term(w) for w in _WORD.findall(phrase) if w.lower() not in STOPWORDS)
+
+    def weight(self, term: str) -> float:
+        idf = math.log((self.documents + 1) / (self.document_frequency[term] + 1)) + 1
+        return idf * (1 + math.log1p(self.domain_terms[term]))
+
+    def is_domain_term(self, term: str) -> bool:
+        return self.domain_terms[term] > 0
+
+
+domain_vocabulary = DomainVocabulary()
+
+
+def extract_keyword(query: str, vocabulary: DomainVocabulary = domain_vocabulary,
+                    max_terms: int = KEYWORD_MAX_TERMS) -> Tuple[str, float]:
+    """
+    Pick the highest TF-IDF content words of the query, in their original order,
+    as a search keyword. Confidence is the share of the query's content weight
+    the keyword carries, discounted when nothing in it is a known domain term.
+    """
+    words = [w for w in _WORD.findall(query) if w.lower() not in STOPWORDS]
+    if not words:
+        return "", 0.0
+
+    tf = Counter(_term(w) for w in words)
+    scores = {term: count * vocabulary.weight(term) for term, count in tf.items()}
+    chosen = set(sorted(scores, key=scores.get, reverse=True)[:max_terms])
+
+    keyword_words: List[str] = []
+    used = set()
+    for word in words:
+        if _term(word) in chosen and _term(word) not in used:
+            keyword_words.append(word)
+            used.add(_term(word))
+
+    confidence = sum(scores[t] for t in chosen) / sum(scores.values())
+    if vocabulary.documents and not any(vocabulary.is_domain_term(t) for t in chosen):
+        confidence *= 0.7
+    return " ".join(keyword_words), round(confidence, 3)
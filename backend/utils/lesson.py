@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Tuple
+
+from dotenv import load_dotenv
+from models.lesson import LessonRequest
+from models.mcq_question import MCQResponse
+from models.theory import TheoryRequest
+from utils.get_book_links import asuggest_books
+from utils.get_theory import get_theory
+from utils.get_theory_question import theory_questions_response
+from utils.get_ytlinks import aget_yt_links
+from utils.metrics import record
+from utils.question_bank import sample_or_generate
+
+
+load_dotenv() # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+# Longest each part of a lesson may take before the bundle is returned without it
+LESSON_THEORY_TIMEOUT = float(os.getenv('LESSON_THEORY_TIMEOUT', '45'))
+LESSON_QUESTIONS_TIMEOUT = float(os.getenv('LESSON_QUESTIONS_TIMEOUT', '30'))
+LESSON_REFS_TIMEOUT = float(os.getenv('LESSON_REFS_TIMEOUT', '10'))
+
+PARTS = ("theory", "mcq", "theory_questions", "youtube", "books")
+
+
+class PartFallback(Exception):
+    """A part that could only produce stand-in content; reported as "fallback" with that content"""
+
+    def __init__(self, detail: str, data: Any = None):
+        super().__init__(detail)
+        self.data = data
+
+
+async def _theory(request: LessonRequest):
+    # The plain TheoryRequest, so the lesson shares cache entries with /theory/
+    return await get_theory(TheoryRequest(**request.model_dump(include=set(TheoryRequest.model_fields))))
+
+
+async def _mcq(request: LessonRequest):
+    questions = await sample_or_generate("mcq", request.topic, request.difficulty, request.num_questions)
+    if not questions:
+        raise RuntimeError("no multiple choice questions could be generated")
+    return MCQResponse(questions=questions)
+
+
+async def _theory_questions(request: LessonRequest):
+    questions = await sample_or_generate("theory", request.topic, request.difficulty, request.num_questions)
+    response = theory_questions_response(request.topic, request.num_questions, questions)
+    if not questions:
+        raise PartFallback("theory questions could not be generated; generic questions returned", response)
+    return response
+
+
+async def _youtube(request: LessonRequest):
+    return await aget_yt_links(f"{request.topic} {request.subject}", request.max_results)
+
+
+async def _books(request: LessonRequest):
+    return await asuggest_books(f"{request.topic} {request.subject}", request.max_results)
+
+
+_PARTS: Dict[str, Tuple[Callable[[LessonRequest], Awaitable[Any]], float]] = {
+    "theory": (_theory, LESSON_THEORY_TIMEOUT),
+    "mcq": (_mcq, LESSON_QUESTIONS_TIMEOUT),
+    "theory_questions": (_theory_questions, LESSON_QUESTIONS_TIMEOUT),
+    "youtube": (_youtube, LESSON_REFS_TIMEOUT),
+    "books": (_books, LESSON_REFS_TIMEOUT),
+}
+
+
+# The event loop only keeps weak references to tasks; parts left running are held here
+_detached = set()
+
+
+def _detach(task: asyncio.Task):
+    _detached.add(task)
+    task.add_done_callback(_finish_detached)
+
+
+def _finish_detached(task: asyncio.Task):
+    _detached.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.info("Detached lesson part failed: %s", task.exception())
+
+
+def _outcome(name: str, task: asyncio.Task) -> Dict[str, Any]:
+    error = task.exception()
+    if error is None:
+        return {"status": "ok", "data": task.result()}
+    if isinstance(error, PartFallback):
+        return {"status": "fallback", "detail": str(error), "data": error.data}
+    logger.warning("Lesson part %s failed: %s", name, error)
+    return {"status": "error", "detail": str(error)}
+
+
+async def iter_lesson(request: LessonRequest) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Run every part of a lesson concurrently and yield (part, outcome) in
+    completion order. An outcome is {"status": "ok", "data": ...},
+    "fallback" with a detail and stand-in data, or "error"/"timeout" with a
+    detail; each part is yielded exactly once.
+    Parts past their timeout keep running detached, so their results still
+    reach the generation and reference caches for the next request.
+    """
+    start = time.perf_counter()
+    names: Dict[asyncio.Task, str] = {}
+    deadlines: Dict[asyncio.Task, float] = {}
+    for name, (part, timeout) in _PARTS.items():
+        task = asyncio.ensure_future(part(request))
+        names[task] = name
+        deadlines[task] = start + timeout
+    pending = set(names)
+    try:
+        while pending:
+            wait = max(0.0, min(deadlines[task] for task in pending) - time.perf_counter())
+            done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            now = time.perf_counter()
+            for task in done:
+                record("lesson_part", now - start, endpoint="lesson", part=names[task])
+                yield names[task], _outcome(names[task], task)
+            for task in [task for task in pending if deadlines[task] <= now]:
+                pending.discard(task)
+                _detach(task)
+                record("lesson_part", now - start, endpoint="lesson", part=names[task])
+                yield names[task], {"status": "timeout", "detail": f"no result within {deadlines[task] - start:g}s"}
+    finally:
+        # The client went away; let the remaining parts finish into the caches
+        for task in pending:
+            _detach(task)
+
+
+async def get_lesson(request: LessonRequest) -> Dict[str, Any]:
+    """Every part's outcome, in PARTS order, once all have completed or timed out"""
+    outcomes = {name: outcome async for name, outcome in iter_lesson(request)}
+    return {
+        "topic": request.topic,
+        "complete": all(outcome["status"] == "ok" for outcome in outcomes.values()),
+        "parts": {name: outcomes[name] for name in PARTS},
+    }
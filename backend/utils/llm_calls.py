@@ -0,0 +1,101 @@
+import time
+from typing import Any, AsyncIterator, Optional
+
+from utils.metrics import llm_tokens, llm_ttft_seconds, record
+from utils.scheduler import Ticket, scheduler
+from utils.token_budget import Plan, token_budget, token_planner
+
+
+# Every upstream LLM call goes through these three functions, so latency and
+# token accounting live in one place. Each call first takes a slot from the
+# priority scheduler in its caller's priority class; calls made with a Plan
+# then wait for the per-minute token budget and report their actual usage to
+# the planner.
+
+
+def _record_usage(message: Any, endpoint: str, plan: Optional[Plan] = None, ticket: Optional[Ticket] = None):
+    usage = getattr(message, 'usage_metadata', None)
+    if usage:
+        llm_tokens.inc(usage.get('input_tokens', 0), endpoint=endpoint, direction="input")
+        llm_tokens.inc(usage.get('output_tokens', 0), endpoint=endpoint, direction="output")
+    if plan is not None:
+        _settle(plan, usage, _truncated(message), ticket)
+
+
+def _truncated(message: Any) -> bool:
+    return (getattr(message, 'response_metadata', None) or {}).get('finish_reason') == 'length'
+
+
+def _settle(plan: Plan, usage: Optional[dict], truncated: bool, ticket: Optional[Ticket] = None):
+    if usage:
+        token_budget.settle(plan, usage.get('input_tokens', 0), usage.get('output_tokens', 0))
+        if ticket is not None:
+            scheduler.settle(ticket, plan, usage.get('input_tokens', 0), usage.get('output_tokens', 0))
+        token_planner.observe(plan, usage.get('output_tokens', 0), truncated)
+
+
+def invoke(llm, prompt: Any, endpoint: str, plan: Optional[Plan] = None):
+    with scheduler.slot(plan) as ticket:
+        if plan is not None:
+            token_budget.acquire(plan)
+        start = time.perf_counter()
+        try:
+            message = llm.invoke(prompt)
+        finally:
+            record("llm", time.perf_counter() - start, endpoint=endpoint)
+    _record_usage(message, endpoint, plan, ticket)
+    return message
+
+
+async def ainvoke(llm, prompt: Any, endpoint: str, plan: Optional[Plan] = None):
+    async with scheduler.aslot(plan) as ticket:
+        if plan is not None:
+            await token_budget.aacquire(plan)
+        start = time.perf_counter()
+        try:
+            message = await llm.ainvoke(prompt)
+        finally:
+            record("llm", time.perf_counter() - start, endpoint=endpoint)
+    _record_usage(message, endpoint, plan, ticket)
+    return message
+
+
+async def astream(llm, prompt: Any, endpoint: str, plan: Optional[Plan] = None) -> AsyncIterator[Any]:
+    """
+    Stream chunks from llm. Time to first token and upstream time are recorded;
+    the time the caller spends between chunks is not counted as LLM latency.
+    The scheduler slot is held until the stream is exhausted or closed.
+    """
+    async with scheduler.aslot(plan) as ticket:
+        if plan is not None:
+            await token_budget.aacquire(plan)
+        upstream = 0.0
+        first = True
+        usage = None
+        truncated = False
+        stream = llm.astream(prompt).__aiter__()
+        try:
+            while True:
+                waited = time.perf_counter()
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    upstream += time.perf_counter() - waited
+                if first:
+                    first = False
+                    llm_ttft_seconds.observe(upstream, endpoint=endpoint)
+                    record("llm_ttft", upstream, endpoint=endpoint)
+                if getattr(chunk, 'usage_metadata', None):
+                    usage = chunk
+                truncated = truncated or _truncated(chunk)
+                yield chunk
+        finally:
+            # Closing early (e.g. on malformed output) aborts the upstream request
+            await stream.aclose()
+            record("llm", upstream, endpoint=endpoint)
+            if usage is not None:
+                _record_usage(usage, endpoint)
+                if plan is not None:
+                    _settle(plan, usage.usage_metadata, truncated, ticket)
@@ -0,0 +1,96 @@
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from utils.llm_router import Backend, RoutedLLM, router
+
+
+load_dotenv() # Load environment variables from .env file
+
+model = os.getenv('MODEL')
+api_key = os.getenv('GROQ_API_KEY')
+# Key sent to `openai` backends; local OpenAI-compatible servers usually ignore it
+openai_api_key = os.getenv('OPENAI_API_KEY', 'unused')
+
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv('LLM_POOL_MAX_CONNECTIONS', '200'))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv('LLM_POOL_MAX_KEEPALIVE', '50'))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.getenv('LLM_POOL_KEEPALIVE_EXPIRY', '60'))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+
+_limits = httpx.Limits(
+    max_connections=LLM_POOL_MAX_CONNECTIONS,
+    max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+    keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+)
+
+# One connection pool per process, shared by every registered client; opened on first use
+http_client: Optional[httpx.Client] = None
+http_async_client: Optional[httpx.AsyncClient] = None
+
+_registry: Dict[Tuple[str, float, Optional[int]], Any] = {}
+_routed: Dict[Tuple[float, Optional[int]], RoutedLLM] = {}
+_lock = threading.Lock()
+
+
+def get_llm(temperature: float = 0.2, max_tokens: Optional[int] = None) -> RoutedLLM:
+    """Return the shared routed chat model for (temperature, max_tokens)"""
+    key = (temperature, max_tokens)
+    llm = _routed.get(key)
+    if llm is None:
+        with _lock:
+            llm = _routed.setdefault(key, RoutedLLM(router, get_client, temperature, max_tokens))
+    return llm
+
+
+def get_client(backend: Backend, temperature: float, max_tokens: Optional[int]):
+    """Return the shared chat model client of one backend for (temperature, max_tokens)"""
+    global http_client, http_async_client
+    key = (backend.name, temperature, max_tokens)
+    llm = _registry.get(key)
+    if llm is None:
+        with _lock:
+            llm = _registry.get(key)
+            if llm is None:
+                if http_client is None:
+                    http_client = httpx.Client(limits=_limits, timeout=LLM_TIMEOUT_SECONDS)
+                    http_async_client = httpx.AsyncClient(limits=_limits, timeout=LLM_TIMEOUT_SECONDS)
+                llm = _build_client(backend, temperature, max_tokens)
+                _registry[key] = llm
+    return llm
+
+
+def _build_client(backend: Backend, temperature: float, max_tokens: Optional[int]):
+    options = dict(
+        model=backend.model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+    if len(router.backends) > 1:
+        # Failing over to another backend beats retrying a struggling one
+        options["max_retries"] = 0
+    if backend.provider == "openai":
+        # Optional dependency, only needed when an OpenAI-compatible backend is configured
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(api_key=openai_api_key, base_url=backend.base_url, stream_usage=True, **options)
+    # Deferred: langchain_groq pulls in langchain_core, groq and langsmith
+    from langchain_groq import ChatGroq
+
+    if backend.base_url:
+        options["base_url"] = backend.base_url
+    return ChatGroq(groq_api_key=api_key, **options)
+
+
+async def close_llm_clients():
+    global http_client, http_async_client
+    with _lock:
+        clients, http_client, http_async_client = (http_client, http_async_client), None, None
+        _registry.clear()
+        _routed.clear()
+    if clients[0] is not None:
+        clients[0].close()
+        await clients[1].aclose()
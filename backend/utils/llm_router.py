@@ -0,0 +1,299 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+from utils.metrics import Counter, Histogram, metrics
+
+
+load_dotenv() # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated `name=provider:model@base_url` entries, in order of preference.
+# provider is groq or openai (any OpenAI-compatible server); name and @base_url
+# are optional. Unset -> a single Groq backend serving MODEL
+LLM_BACKENDS = os.getenv('LLM_BACKENDS', '')
+# Calls per backend kept for its rolling p95 latency and error rate
+ROUTER_WINDOW = int(os.getenv('ROUTER_WINDOW', '50'))
+# Below this many calls a backend has no p95 yet and is tried ahead of measured ones
+ROUTER_MIN_SAMPLES = int(os.getenv('ROUTER_MIN_SAMPLES', '10'))
+# Share of calls sent to a random other healthy backend to keep its numbers current
+ROUTER_EXPLORE_RATE = float(os.getenv('ROUTER_EXPLORE_RATE', '0.05'))
+# Routing score is p95 * (1 + ROUTER_ERROR_PENALTY * error rate); lowest wins
+ROUTER_ERROR_PENALTY = float(os.getenv('ROUTER_ERROR_PENALTY', '4'))
+ROUTER_BREAKER_FAILURES = int(os.getenv('ROUTER_BREAKER_FAILURES', '5'))
+ROUTER_BREAKER_ERROR_RATE = float(os.getenv('ROUTER_BREAKER_ERROR_RATE', '0.5'))
+ROUTER_BREAKER_COOLDOWN = float(os.getenv('ROUTER_BREAKER_COOLDOWN', '30'))
+
+PROVIDERS = ("groq", "openai")
+
+routes = Counter("coursify_llm_routes_total", "LLM calls per backend by routing reason and outcome")
+backend_seconds = Histogram("coursify_llm_backend_seconds", "Upstream LLM latency per backend")
+metrics += [routes, backend_seconds]
+
+
+class Backend(NamedTuple):
+    name: str
+    provider: str
+    model: str
+    base_url: Optional[str] = None
+
+
+def parse_backends(spec: str, default_model: Optional[str]) -> List[Backend]:
+    backends = []
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, target = entry.rpartition('=')
+        provider, _, target = target.partition(':')
+        model, _, base_url = target.partition('@')
+        if provider not in PROVIDERS or not model:
+            raise ValueError(f"LLM_BACKENDS entry {entry!r} is not name=provider:model@base_url")
+        backends.append(Backend(name or model, provider, model, base_url or None))
+    if len({backend.name for backend in backends}) != len(backends):
+        raise ValueError("LLM_BACKENDS names must be unique")
+    return backends or [Backend("groq", "groq", default_model)]
+
+
+class BackendHealth:
+    """Rolling latency and outcome window of one backend, and its circuit breaker"""
+
+    def __init__(self, backend: Backend, index: int, window: int = ROUTER_WINDOW):
+        self.backend = backend
+        self.index = index
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    def state(self, now: float, cooldown: float) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if now - self.opened_at < cooldown else "half_open"
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < ROUTER_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def score(self, error_penalty: float) -> float:
+        """Lower is better; backends without enough samples score 0 so they get measured"""
+        p95 = self.p95()
+        return 0.0 if p95 is None else p95 * (1 + error_penalty * self.error_rate())
+
+
+class LLMRouter:
+    """
+    Picks the backend for each LLM call: the lowest rolling p95 latency,
+    penalised by error rate, among backends whose circuit breaker is closed.
+    A breaker opens after ROUTER_BREAKER_FAILURES consecutive failures or once
+    the error rate over the window reaches ROUTER_BREAKER_ERROR_RATE; after
+    ROUTER_BREAKER_COOLDOWN a single probe call decides whether it closes again.
+    """
+
+    def __init__(self, backends: List[Backend],
+                 explore_rate: float = ROUTER_EXPLORE_RATE,
+                 error_penalty: float = ROUTER_ERROR_PENALTY,
+                 breaker_failures: int = ROUTER_BREAKER_FAILURES,
+                 breaker_error_rate: float = ROUTER_BREAKER_ERROR_RATE,
+                 breaker_cooldown: float = ROUTER_BREAKER_COOLDOWN):
+        self.backends = backends
+        self.explore_rate = explore_rate
+        self.error_penalty = error_penalty
+        self.breaker_failures = breaker_failures
+        self.breaker_error_rate = breaker_error_rate
+        self.breaker_cooldown = breaker_cooldown
+        self.health = [BackendHealth(backend, i) for i, backend in enumerate(backends)]
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.stats = defaultdict(lambda: defaultdict(int))
+
+    def order(self) -> List[Tuple[BackendHealth, str]]:
+        """Backends to try for one call, best first, each with the reason it is tried"""
+        now = time.monotonic()
+        with self._lock:
+            closed, probe, tripped = [], None, []
+            for health in self.health:
+                state = health.state(now, self.breaker_cooldown)
+                if state == "closed":
+                    closed.append(health)
+                elif state == "half_open" and not health.probing and probe is None:
+                    health.probing = True
+                    probe = health
+                else:
+                    tripped.append(health)
+            closed.sort(key=lambda health: (health.score(self.error_penalty), health.index))
+            reason = "healthiest"
+            if len(closed) > 1 and self._random.random() < self.explore_rate:
+                closed.insert(0, closed.pop(self._random.randrange(1, len(closed))))
+                reason = "explore"
+            if probe is not None:
+                closed.insert(0, probe)
+                reason = "probe"
+            # With every breaker open, calling a tripped backend beats failing outright
+            tripped.sort(key=lambda health: health.opened_at or 0)
+            candidates = closed + tripped
+            if not closed:
+                reason = "all_open"
+        return [(health, reason if i == 0 else "failover") for i, health in enumerate(candidates)]
+
+    def record(self, health: BackendHealth, reason: str, latency: float, ok: bool):
+        name = health.backend.name
+        routes.inc(backend=name, reason=reason, outcome="ok" if ok else "error")
+        backend_seconds.observe(latency, backend=name)
+        with self._lock:
+            self.stats[name][reason] += 1
+            self.stats[name]["ok" if ok else "errors"] += 1
+            # Fast failures must not make a backend look quick; errors count through the error rate
+            if ok:
+                health.latencies.append(latency)
+            health.outcomes.append(ok)
+            was_probe, health.probing = health.probing, False
+            if ok:
+                health.consecutive_failures = 0
+                if health.opened_at is not None:
+                    # Recovered: start the window afresh so old errors do not trip it again
+                    health.opened_at = None
+                    health.outcomes.clear()
+                    self.stats[name]["breaker_closed"] += 1
+                    logger.info("LLM backend %s recovered", name)
+                return
+            health.consecutive_failures += 1
+            tripped = (health.consecutive_failures >= self.breaker_failures
+                       or (len(health.outcomes) >= ROUTER_MIN_SAMPLES
+                           and health.error_rate() >= self.breaker_error_rate))
+            if was_probe or (health.opened_at is None and tripped):
+                health.opened_at = time.monotonic()
+                self.stats[name]["breaker_opened"] += 1
+                logger.warning("LLM backend %s circuit open", name,
+                               extra={"error_rate": round(health.error_rate(), 3)})
+
+    def release(self, health: BackendHealth):
+        """A call ended without a verdict (cancelled, or closed early by the caller)"""
+        with self._lock:
+            health.probing = False
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            snapshot = {}
+            for health in self.health:
+                p95 = health.p95()
+                snapshot[health.backend.name] = {
+                    **self.stats.get(health.backend.name, {}),
+                    "model": health.backend.model,
+                    "state": health.state(now, self.breaker_cooldown),
+                    "p95_ms": round(p95 * 1e3, 1) if p95 is not None else None,
+                    "error_rate": round(health.error_rate(), 3),
+                    "samples": len(health.latencies),
+                }
+            return snapshot
+
+
+class RoutedLLM:
+    """
+    Chat model for one (temperature, max_tokens) that sends each call to the
+    router's best backend and fails over to the next on errors. Streams fail
+    over only until their first chunk has been passed on.
+    """
+
+    def __init__(self, router: LLMRouter, client: Callable[[Backend, float, Optional[int]], Any],
+                 temperature: float, max_tokens: Optional[int]):
+        self.router = router
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self._client = client
+
+    def _llm(self, health: BackendHealth):
+        return self._client(health.backend, self.temperature, self.max_tokens)
+
+    def warm_up(self):
+        """Build this model's client on every backend ahead of the first call"""
+        for health in self.router.health:
+            self._llm(health)
+
+    def _failed(self, health: BackendHealth, error: Exception):
+        logger.warning("LLM backend %s failed: %s", health.backend.name, error)
+
+    def invoke(self, prompt: Any):
+        error = None
+        for health, reason in self.router.order():
+            start = time.perf_counter()
+            try:
+                message = self._llm(health).invoke(prompt)
+            except Exception as e:
+                self.router.record(health, reason, time.perf_counter() - start, False)
+                self._failed(health, e)
+                error = e
+                continue
+            except BaseException:
+                self.router.release(health)
+                raise
+            self.router.record(health, reason, time.perf_counter() - start, True)
+            return message
+        raise error
+
+    async def ainvoke(self, prompt: Any):
+        error = None
+        for health, reason in self.router.order():
+            start = time.perf_counter()
+            try:
+                message = await self._llm(health).ainvoke(prompt)
+            except Exception as e:
+                self.router.record(health, reason, time.perf_counter() - start, False)
+                self._failed(health, e)
+                error = e
+                continue
+            except BaseException:
+                self.router.release(health)
+                raise
+            self.router.record(health, reason, time.perf_counter() - start, True)
+            return message
+        raise error
+
+    async def astream(self, prompt: Any) -> AsyncIterator[Any]:
+        error = None
+        for health, reason in self.router.order():
+            stream = self._llm(health).astream(prompt).__aiter__()
+            upstream = 0.0
+            started = False
+            ok = None
+            try:
+                while True:
+                    waited = time.perf_counter()
+                    try:
+                        chunk = await stream.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        upstream += time.perf_counter() - waited
+                    started = True
+                    yield chunk
+                ok = True
+            except Exception as e:
+                ok = False
+                self._failed(health, e)
+                if started:
+                    raise
+                error = e
+            finally:
+                await stream.aclose()
+                if ok is None:
+                    self.router.release(health)
+                else:
+                    # Only time spent waiting on the backend counts, not the caller's processing
+                    self.router.record(health, reason, upstream, ok)
+            if ok:
+                return
+        raise error
+
+
+router = LLMRouter(parse_backends(LLM_BACKENDS, os.getenv('MODEL')))
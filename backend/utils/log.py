@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+
+load_dotenv() # Load environment variables from .env file
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'info').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text or json
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with the `extra` fields of the call as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RESERVED)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain line followed by key=value pairs for the `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = " ".join(f"{key}={value}" for key, value in vars(record).items() if key not in _RESERVED)
+        return f"{line} {extra}" if extra else line
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Route the app's own loggers (utils.*, routers.*) to stderr at the configured level"""
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JSONFormatter())
+    else:
+        formatter = TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        formatter.converter = time.gmtime
+        handler.setFormatter(formatter)
+    for name in ('utils', 'routers', 'main'):
+        logger = logging.getLogger(name)
+        logger.handlers = [handler]
+        logger.setLevel(level)
+        logger.propagate = False
@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from models.batch import BatchJob
+from utils.batch import generate_job
+from utils.cache import normalize
+from utils.fast_json import question_lists
+from utils.keywords import domain_vocabulary
+from utils.scheduler import priority
+
+
+load_dotenv() # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+QUESTION_BANK_PATH = os.getenv('QUESTION_BANK_PATH', 'question_bank.db')
+QUESTION_BANK_LOW_WATERMARK = int(os.getenv('QUESTION_BANK_LOW_WATERMARK', '10'))
+QUESTION_BANK_HIGH_WATERMARK = int(os.getenv('QUESTION_BANK_HIGH_WATERMARK', '30'))
+QUESTION_BANK_REFILL_CONCURRENCY = int(os.getenv('QUESTION_BANK_REFILL_CONCURRENCY', '2'))
+# Upper bound on one refill; worker processes skip topics another worker is refilling
+QUESTION_BANK_REFILL_LEASE_SECONDS = float(os.getenv('QUESTION_BANK_REFILL_LEASE_SECONDS', '600'))
+# Requests a topic needs before it is refilled in the background; prefill topics always are
+QUESTION_BANK_REFILL_MIN_REQUESTS = int(os.getenv('QUESTION_BANK_REFILL_MIN_REQUESTS', '2'))
+# Comma separated kind:topic:difficulty entries to pre-generate at startup, e.g. "mcq:AI:Medium"
+QUESTION_BANK_PREFILL = os.getenv('QUESTION_BANK_PREFILL', '')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    bloom_level TEXT,
+    question TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_lookup ON questions (kind, topic, difficulty);
+CREATE INDEX IF NOT EXISTS idx_questions_bloom ON questions (kind, topic, bloom_level);
+CREATE TABLE IF NOT EXISTS question_tags (
+    question_id INTEGER NOT NULL REFERENCES questions (id),
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_question_tags_tag ON question_tags (tag, question_id);
+CREATE TABLE IF NOT EXISTS served (
+    session_id TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    PRIMARY KEY (session_id, question_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS refill_leases (
+    kind TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (kind, topic, difficulty)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS topic_requests (
+    kind TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (kind, topic, difficulty)
+) WITHOUT ROWID;
+"""
+
+
+class QuestionBank:
+    """Indexed SQLite store of generated MCQuestion and TheoryQuestion objects"""
+
+    def __init__(self, path: str = QUESTION_BANK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Opened on first use, under the lock, so importing the module creates no file"""
+        if self._db is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            domain_vocabulary.observe_terms(row[0] for row in conn.execute("SELECT tag FROM question_tags"))
+            self._db = conn
+        return self._db
+
+    def open(self):
+        """Open the database now, seeding the keyword vocabulary with the stored tags"""
+        with self._lock:
+            self._conn
+
+    def add(self, kind: str, topic: str, difficulty: str, questions: Iterable[Any]) -> List[int]:
+        ids = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for question in questions:
+                cursor = self._conn.execute(
+                    "INSERT INTO questions (kind, topic, difficulty, bloom_level, question, payload, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, normalize(topic), normalize(difficulty), getattr(question, 'bloom_level', None),
+                     question.question, question.model_dump_json(), time.time())
+                )
+                ids.append(cursor.lastrowid)
+                self._conn.executemany(
+                    "INSERT INTO question_tags (question_id, tag) VALUES (?, ?)",
+                    [(cursor.lastrowid, normalize(tag)) for tag in question.topic_tags]
+                )
+                domain_vocabulary.observe_terms(question.topic_tags)
+            self._conn.execute("COMMIT")
+        return ids
+
+    def sample(self, kind: str, topic: str, difficulty: str, n: int,
+               session_id: Optional[str] = None,
+               bloom_level: Optional[str] = None,
+               tag: Optional[str] = None) -> List[Any]:
+        """Random questions, never repeating one already served to session_id"""
+        query = "SELECT id, payload FROM questions WHERE kind = ? AND topic = ? AND difficulty = ?"
+        params: list = [kind, normalize(topic), normalize(difficulty)]
+        if bloom_level:
+            query += " AND bloom_level = ?"
+            params.append(bloom_level)
+        if tag:
+            query += " AND id IN (SELECT question_id FROM question_tags WHERE tag = ?)"
+            params.append(normalize(tag))
+        if session_id:
+            query += " AND id NOT IN (SELECT question_id FROM served WHERE session_id = ?)"
+            params.append(session_id)
+        query += " ORDER BY RANDOM() LIMIT ?"
+        params.append(n)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        if session_id:
+            self.mark_served(session_id, [row[0] for row in rows])
+        # All stored payloads validated in one pass
+        return question_lists[kind].validate_json("[" + ",".join(row[1] for row in rows) + "]")
+
+    def mark_served(self, session_id: str, ids: Iterable[int]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO served (session_id, question_id) VALUES (?, ?)",
+                [(session_id, question_id) for question_id in ids]
+            )
+
+    def claim_refill(self, kind: str, topic: str, difficulty: str) -> bool:
+        """Cross-process lease so only one worker refills a topic at a time"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO refill_leases VALUES (?, ?, ?, ?) ON CONFLICT (kind, topic, difficulty) DO UPDATE "
+                "SET expires_at = excluded.expires_at WHERE refill_leases.expires_at < ?",
+                (kind, normalize(topic), normalize(difficulty), now + QUESTION_BANK_REFILL_LEASE_SECONDS, now)
+            )
+            return cursor.rowcount == 1
+
+    def record_request(self, kind: str, topic: str, difficulty: str) -> int:
+        """Count one more request for a topic, across worker processes; returns the new count"""
+        with self._lock:
+            return self._conn.execute(
+                "INSERT INTO topic_requests VALUES (?, ?, ?, 1) ON CONFLICT (kind, topic, difficulty) DO UPDATE "
+                "SET count = count + 1 RETURNING count",
+                (kind, normalize(topic), normalize(difficulty))
+            ).fetchone()[0]
+
+    def release_refill(self, kind: str, topic: str, difficulty: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM refill_leases WHERE kind = ? AND topic = ? AND difficulty = ?",
+                (kind, normalize(topic), normalize(difficulty))
+            )
+
+    def inventory(self, kind: str, topic: str, difficulty: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM questions WHERE kind = ? AND topic = ? AND difficulty = ?",
+                (kind, normalize(topic), normalize(difficulty))
+            ).fetchone()[0]
+
+    def question_texts(self, kind: str, topic: str, difficulty: str) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT question FROM questions WHERE kind = ? AND topic = ? AND difficulty = ?",
+                (kind, normalize(topic), normalize(difficulty))
+            )]
+
+
+question_bank = QuestionBank()
+
+_refilling = set()
+_refill_tasks = set()
+
+
+async def refill(kind: str, topic: str, difficulty: str, target: int = QUESTION_BANK_HIGH_WATERMARK) -> int:
+    """Generate questions until the topic's inventory reaches target; returns how many were added"""
+    missing = target - question_bank.inventory(kind, topic, difficulty)
+    if missing <= 0 or not question_bank.claim_refill(kind, topic, difficulty):
+        return 0
+    try:
+        job = BatchJob(topic=topic, type=kind, difficulty=difficulty, count=missing)
+        questions, _ = await generate_job(
+            job,
+            asyncio.Semaphore(QUESTION_BANK_REFILL_CONCURRENCY),
+            existing=question_bank.question_texts(kind, topic, difficulty)
+        )
+        question_bank.add(kind, topic, difficulty, questions)
+    finally:
+        question_bank.release_refill(kind, topic, difficulty)
+    logger.info("Question bank: added %d %s questions for %s (%s)", len(questions), kind, topic, difficulty)
+    return len(questions)
+
+
+def cancel_refills():
+    """Stop background refills on shutdown; their leases are released as they unwind"""
+    for task in list(_refill_tasks):
+        task.cancel()
+
+
+def ensure_stock(kind: str, topic: str, difficulty: str):
+    """
+    Schedule a background refill when a topic's inventory is below the low
+    watermark. Only prefill topics and topics asked for more than once are
+    stocked, so a one-off or mistyped topic costs no upstream calls beyond
+    the request itself.
+    """
+    key = (kind, normalize(topic), normalize(difficulty))
+    if key in _refilling:
+        return
+    requests = question_bank.record_request(kind, topic, difficulty)
+    if requests < QUESTION_BANK_REFILL_MIN_REQUESTS and key not in _prefill_keys():
+        return
+    if question_bank.inventory(kind, topic, difficulty) >= QUESTION_BANK_LOW_WATERMARK:
+        return
+    _refilling.add(key)
+
+    async def run():
+        try:
+            with priority("prefetch"):
+                await refill(kind, topic, difficulty)
+        except Exception:
+            logger.exception("Question bank refill failed for %s", key)
+        finally:
+            _refilling.discard(key)
+
+    task = asyncio.ensure_future(run())
+    _refill_tasks.add(task)
+    task.add_done_callback(_refill_tasks.discard)
+
+
+async def sample_or_generate(kind: str, topic: str, difficulty: str, n: int,
+                             session_id: Optional[str] = None) -> List[Any]:
+    """
+    Serve n questions from the bank; only when it cannot satisfy the request are
+    fresh questions generated live, stored and served. Either way a topic in
+    demand is topped up in the background once it runs low.
+    """
+    questions = question_bank.sample(kind, topic, difficulty, n, session_id)
+    if len(questions) < n:
+        job = BatchJob(topic=topic, type=kind, difficulty=difficulty, count=n - len(questions))
+        fresh, _ = await generate_job(job, asyncio.Semaphore(QUESTION_BANK_REFILL_CONCURRENCY),
+                                      existing=[q.question for q in questions])
+        ids = question_bank.add(kind, topic, difficulty, fresh)
+        if session_id:
+            question_bank.mark_served(session_id, ids)
+        questions += fresh
+    ensure_stock(kind, topic, difficulty)
+    return questions
+
+
+def parse_prefill(spec: str = QUESTION_BANK_PREFILL) -> List[Tuple[str, str, str]]:
+    entries = []
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        kind, topic, difficulty = entry.split(':')
+        entries.append((kind, topic, difficulty))
+    return entries
+
+
+def _prefill_keys() -> set:
+    return {(kind, normalize(topic), normalize(difficulty)) for kind, topic, difficulty in parse_prefill()}
+
+
+async def pregenerate(entries: Iterable[Tuple[str, str, str]] = None):
+    """Background pre-generation pipeline: fill every configured topic up to the high watermark"""
+    for kind, topic, difficulty in entries if entries is not None else parse_prefill():
+        try:
+            with priority("prefetch"):
+                await refill(kind, topic, difficulty)
+        except Exception:
+            logger.exception("Question bank pre-generation failed for %s:%s:%s", kind, topic, difficulty)
@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from utils.cache import GenerationCache, MemoryTier, SQLiteTier, make_key
+from utils.metrics import record
+from utils.semantic_index import tokenize
+
+
+load_dotenv() # Load environment variables from .env file
+
+REFS_DB_PATH = os.getenv('REFS_DB_PATH', 'references.db')
+REFS_CACHE_TTL_SECONDS = float(os.getenv('REFS_CACHE_TTL_SECONDS', str(7 * 86400)))
+# Share of query terms every offline result must contain
+REFS_INDEX_MIN_COVERAGE = float(os.getenv('REFS_INDEX_MIN_COVERAGE', '0.75'))
+
+# YouTube Data API quota units per call; Books has a per-request quota
+QUOTA_UNITS = {"youtube": 100, "books": 1}
+
+reference_cache = GenerationCache(
+    MemoryTier(ttl=REFS_CACHE_TTL_SECONDS),
+    SQLiteTier(REFS_DB_PATH, ttl=REFS_CACHE_TTL_SECONDS)
+)
+
+
+def reference_key(provider: str, query: str, max_results: int) -> str:
+    return make_key(provider, {"query": query, "max_results": max_results})
+
+
+class ProviderStats:
+    """Per-provider call latency, quota spend and how often the network was avoided"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = defaultdict(Counter)
+        self.latencies = defaultdict(lambda: deque(maxlen=500))
+
+    def record(self, provider: str, event: str, amount: int = 1):
+        with self._lock:
+            self.counts[provider][event] += amount
+
+    @contextmanager
+    def call(self, provider: str):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(provider, "errors")
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            record("external_api", elapsed, provider=provider)
+            with self._lock:
+                self.latencies[provider].append(elapsed)
+                self.counts[provider]["calls"] += 1
+                self.counts[provider]["quota_units"] += QUOTA_UNITS.get(provider, 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for provider in set(self.counts) | set(self.latencies):
+                stats = dict(self.counts[provider])
+                samples = sorted(self.latencies[provider])
+                if samples:
+                    stats["latency_ms_p50"] = round(samples[len(samples) // 2] * 1e3, 1)
+                    stats["latency_ms_p95"] = round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e3, 1)
+                result[provider] = stats
+            return result
+
+
+provider_stats = ProviderStats()
+
+
+class ReferenceIndex:
+    """Persistent inverted index of videos and books already returned by a provider"""
+
+    def __init__(self, path: str = REFS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Opened on first use, under the lock, so importing the module creates no file"""
+        if self._db is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS ref_docs (
+                    provider TEXT NOT NULL, doc_id TEXT NOT NULL, terms INTEGER NOT NULL, payload TEXT NOT NULL,
+                    PRIMARY KEY (provider, doc_id)
+                );
+                CREATE TABLE IF NOT EXISTS ref_terms (
+                    provider TEXT NOT NULL, term TEXT NOT NULL, doc_id TEXT NOT NULL,
+                    PRIMARY KEY (provider, term, doc_id)
+                ) WITHOUT ROWID;
+            """)
+            self._db = conn
+        return self._db
+
+    def add(self, provider: str, doc_id: str, text: str, payload: Any):
+        terms = set(tokenize(text))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ref_docs VALUES (?, ?, ?, ?)",
+                (provider, doc_id, len(terms), json.dumps(payload))
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO ref_terms VALUES (?, ?, ?)",
+                [(provider, term, doc_id) for term in terms]
+            )
+            self._conn.execute("COMMIT")
+
+    def search(self, provider: str, query: str, limit: int,
+               min_coverage: float = REFS_INDEX_MIN_COVERAGE) -> Optional[List[Any]]:
+        """
+        Up to `limit` stored payloads covering at least min_coverage of the query
+        terms; None unless a full page of results can be served offline
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return None
+        placeholders = ",".join("?" * len(terms))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT d.payload, COUNT(*) AS matched FROM ref_terms t "
+                f"JOIN ref_docs d ON d.provider = t.provider AND d.doc_id = t.doc_id "
+                f"WHERE t.provider = ? AND t.term IN ({placeholders}) "
+                f"GROUP BY t.doc_id HAVING matched >= ? "
+                f"ORDER BY matched DESC, d.terms ASC LIMIT ?",
+                [provider, *terms, min_coverage * len(terms), limit]
+            ).fetchall()
+        if len(rows) < limit:
+            return None
+        return [json.loads(row[0]) for row in rows]
+
+
+reference_index = ReferenceIndex()
+
+
+def lookup_reference(provider: str, query: str, max_results: int,
+                     format_offline: Callable[[List[Any]], Any] = list) -> Optional[Any]:
+    """Serve a reference search from the TTL cache or the offline index, without the network"""
+    cached = reference_cache.get(provider, reference_key(provider, query, max_results))
+    if cached is not None:
+        provider_stats.record(provider, "cache_hits")
+        return json.loads(cached)
+    offline = reference_index.search(provider, query, max_results)
+    if offline is None:
+        return None
+    provider_stats.record(provider, "offline_hits")
+    return format_offline(offline)
+
+
+def remember_reference(provider: str, query: str, max_results: int, result: Any):
+    reference_cache.set(provider, reference_key(provider, query, max_results), json.dumps(result))
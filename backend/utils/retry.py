@@ -0,0 +1,241 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from utils.scheduler import SchedulerShed
+from utils.token_budget import TokenBudgetExceeded
+
+
+load_dotenv() # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '0.5'))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '8'))
+GENERATION_DEADLINE_SECONDS = float(os.getenv('GENERATION_DEADLINE_SECONDS', '60'))
+# Unset -> hedging disabled. e.g. 0.95 hedges attempts slower than the observed p95
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE')) if os.getenv('HEDGE_PERCENTILE') else None
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+# Threads for blocking attempts while a hedge is armed; unhedged attempts run on the caller's thread
+HEDGE_MAX_WORKERS = int(os.getenv('HEDGE_MAX_WORKERS', '32'))
+
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix='hedge')
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    message = str(error).lower()
+    return 'rate limit' in message or '429' in message
+
+
+class RetryEngine:
+    """
+    Retry loop for one kind of generation: exponential backoff with full jitter on
+    rate limits, an overall deadline, and optional hedging once an attempt runs
+    longer than a percentile of previously observed attempt latencies.
+
+    `attempt(i)` performs attempt number i and returns its result; `on_result`
+    folds that result into the caller's state and returns True once done.
+    """
+
+    def __init__(self, name: str,
+                 max_attempts: int = RETRY_MAX_ATTEMPTS,
+                 base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY,
+                 deadline: float = GENERATION_DEADLINE_SECONDS,
+                 hedge_percentile: Optional[float] = HEDGE_PERCENTILE):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self.stats = defaultdict(int)
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def hedge_after(self) -> Optional[float]:
+        """Seconds after which to fire a hedged duplicate, if hedging is enabled and warmed up"""
+        if self.hedge_percentile is None or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile))]
+
+    def _record(self, key: str, latency: Optional[float] = None):
+        with self._lock:
+            self.stats[key] += 1
+            if latency is not None:
+                self._latencies.append(latency)
+
+    async def run(self, attempt: Callable[[int], Awaitable[Any]], on_result: Callable[[Any], bool]) -> bool:
+        """Async retry loop; returns True when on_result reported completion"""
+        expires = time.monotonic() + self.deadline
+        for i in range(self.max_attempts):
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                self._record("deadline_exceeded")
+                break
+            self._record("attempts")
+            try:
+                result = await asyncio.wait_for(self._hedged(attempt, i), remaining)
+            except asyncio.TimeoutError:
+                self._record("deadline_exceeded")
+                break
+            except TokenBudgetExceeded:
+                # The call already waited as long as the budget allows; another attempt would too
+                self._record("budget_rejected")
+                raise
+            except SchedulerShed:
+                # Queued past its class's limit; a retry would queue behind the same calls
+                self._record("shed")
+                break
+            except Exception as e:
+                logger.warning("%s attempt %d failed: %s", self.name, i + 1, e)
+                self._record("failures")
+                if is_rate_limit(e):
+                    self._record("rate_limited")
+                    await asyncio.sleep(min(self.backoff(i), max(0.0, expires - time.monotonic())))
+                continue
+            if on_result(result):
+                self._record("successes")
+                return True
+        self._record("exhausted")
+        return False
+
+    async def _hedged(self, attempt, i):
+        start = time.monotonic()
+        primary = asyncio.ensure_future(attempt(i))
+        pending = {primary}
+        try:
+            threshold = self.hedge_after()
+            if threshold is None:
+                result = await primary
+                self._record("completed", time.monotonic() - start)
+                return result
+
+            done, _ = await asyncio.wait({primary}, timeout=threshold)
+            if done:
+                result = primary.result()
+                self._record("completed", time.monotonic() - start)
+                return result
+
+            self._record("hedges")
+            hedge = asyncio.ensure_future(attempt(i))
+            pending = {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._record("hedge_wins")
+                        self._record("completed", time.monotonic() - start)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also reached when run()'s deadline cancels this mid-wait: no attempt may outlive it
+            for task in pending:
+                task.cancel()
+
+    def run_sync(self, attempt: Callable[[int], Any], on_result: Callable[[Any], bool]) -> bool:
+        """Blocking variant of run for threadpool callers; hedged attempts run on a thread pool"""
+        expires = time.monotonic() + self.deadline
+        for i in range(self.max_attempts):
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                self._record("deadline_exceeded")
+                break
+            self._record("attempts")
+            try:
+                result = self._hedged_sync(attempt, i, remaining)
+            except TimeoutError:
+                self._record("deadline_exceeded")
+                break
+            except TokenBudgetExceeded:
+                # The call already waited as long as the budget allows; another attempt would too
+                self._record("budget_rejected")
+                raise
+            except SchedulerShed:
+                # Queued past its class's limit; a retry would queue behind the same calls
+                self._record("shed")
+                break
+            except Exception as e:
+                logger.warning("%s attempt %d failed: %s", self.name, i + 1, e)
+                self._record("failures")
+                if is_rate_limit(e):
+                    self._record("rate_limited")
+                    time.sleep(min(self.backoff(i), max(0.0, expires - time.monotonic())))
+                continue
+            if on_result(result):
+                self._record("successes")
+                return True
+        self._record("exhausted")
+        return False
+
+    def _hedged_sync(self, attempt, i, remaining):
+        start = time.monotonic()
+        threshold = self.hedge_after()
+        if threshold is None:
+            # Nothing to race: the caller's thread makes the call, bounded by the client's own timeout
+            result = attempt(i)
+            self._record("completed", time.monotonic() - start)
+            return result
+
+        # Attempts keep the caller's context, and with it its scheduler priority class
+        futures = [_hedge_executor.submit(contextvars.copy_context().run, attempt, i)]
+        pending = set(futures)
+        try:
+            done, _ = wait(futures, timeout=min(threshold, remaining))
+            if not done:
+                self._record("hedges")
+                futures.append(_hedge_executor.submit(contextvars.copy_context().run, attempt, i))
+                pending = set(futures)
+
+            error = None
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, start + remaining - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError(f"{self.name} exceeded its deadline")
+                for future in done:
+                    if future.exception() is None:
+                        if len(futures) > 1 and future is futures[1]:
+                            self._record("hedge_wins")
+                        self._record("completed", time.monotonic() - start)
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            # Attempts still queued for a worker are dropped; running ones end with their client timeout
+            for future in pending:
+                future.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        successes = stats.get("successes", 0)
+        stats["attempts_per_success"] = round(stats.get("attempts", 0) / successes, 3) if successes else None
+        return stats
+
+
+engines: Dict[str, RetryEngine] = {}
+
+
+def get_engine(name: str) -> RetryEngine:
+    if name not in engines:
+        engines[name] = RetryEngine(name)
+    return engines[name]
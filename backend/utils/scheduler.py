@@ -0,0 +1,277 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from dotenv import load_dotenv
+from utils.metrics import Counter, Histogram, metrics
+from utils.token_budget import Plan, TokenBudget, TokenBudgetExceeded
+
+
+load_dotenv() # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+# Students waiting on a page, teachers' batch exams, and bank refills nobody waits on
+PRIORITIES = ("interactive", "background", "prefetch")
+
+
+def parse_classes(spec: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    """Per-class values from a `interactive=8,background=2` spec, over the defaults"""
+    values = dict(defaults)
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = entry.partition('=')
+        if name.strip() not in PRIORITIES:
+            raise ValueError(f"unknown priority class {name.strip()!r}; expected one of {', '.join(PRIORITIES)}")
+        values[name.strip()] = float(value)
+    return values
+
+
+# Share of upstream capacity each class gets while several have calls queued
+SCHEDULER_WEIGHTS = parse_classes(os.getenv('SCHEDULER_WEIGHTS', ''),
+                                  {"interactive": 8, "background": 2, "prefetch": 1})
+# Upstream LLM calls in flight per process, in total and per class
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv('SCHEDULER_MAX_CONCURRENCY', '64'))
+SCHEDULER_CONCURRENCY = parse_classes(os.getenv('SCHEDULER_CONCURRENCY', ''),
+                                      {"interactive": 64, "background": 16, "prefetch": 8})
+# Tokens per minute (prompt plus planned output) per class; 0 leaves a class to TOKEN_BUDGET_PER_MINUTE alone
+SCHEDULER_TOKENS_PER_MINUTE = parse_classes(os.getenv('SCHEDULER_TOKENS_PER_MINUTE', ''),
+                                            {"interactive": 0, "background": 0, "prefetch": 0})
+# Longest a call may wait for its class budget and a slot before it is shed
+SCHEDULER_MAX_QUEUE_SECONDS = parse_classes(os.getenv('SCHEDULER_MAX_QUEUE_SECONDS', ''),
+                                            {"interactive": 15, "background": 120, "prefetch": 30})
+
+queue_seconds = Histogram("coursify_scheduler_wait_seconds", "Time LLM calls queued for an upstream slot, per priority class")
+scheduled = Counter("coursify_scheduler_calls_total", "LLM calls per priority class by outcome (admitted, shed)")
+metrics += [queue_seconds, scheduled]
+
+_priority = contextvars.ContextVar("llm_priority", default="interactive")
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """Run LLM calls made inside the block, and by tasks started in it, in priority class `name`"""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority class {name!r}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class SchedulerShed(Exception):
+    """An LLM call waited longer than its priority class may queue and was dropped"""
+
+    def __init__(self, priority: str, waited: float):
+        super().__init__(f"{priority} LLM call shed after queueing {waited:.1f}s")
+        self.priority = priority
+        self.retry_after = max(1.0, waited)
+
+
+class Ticket:
+    """One call's place in the scheduler: queued until granted, then holding a slot until released"""
+
+    __slots__ = ("priority", "start", "finish", "granted", "wake")
+
+    def __init__(self, priority: str, wake: Callable[[], Any]):
+        self.priority = priority
+        self.start = self.finish = 0.0
+        self.granted = False
+        self.wake = wake
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class PriorityScheduler:
+    """
+    Weighted fair queueing of upstream LLM calls across priority classes.
+
+    A queued call gets the virtual finish time start + cost / weight, where
+    start is the later of the scheduler's virtual clock and the finish time
+    of its class's previous call, and cost is its planned tokens. A free slot
+    goes to the earliest finish time among classes under their concurrency
+    cap, so under contention each class gets upstream capacity in proportion
+    to its weight, and an idle class cannot save up credit. A class's token
+    budget paces its calls before they queue. A call still waiting after its
+    class's max queue time is shed with SchedulerShed, so callers can return
+    their fallback instead of timing out.
+    """
+
+    def __init__(self,
+                 weights: Dict[str, float] = SCHEDULER_WEIGHTS,
+                 concurrency: Dict[str, float] = SCHEDULER_CONCURRENCY,
+                 max_concurrency: int = SCHEDULER_MAX_CONCURRENCY,
+                 tokens_per_minute: Dict[str, float] = SCHEDULER_TOKENS_PER_MINUTE,
+                 max_queue: Dict[str, float] = SCHEDULER_MAX_QUEUE_SECONDS):
+        self.weights = weights
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.budgets = {name: TokenBudget(tokens_per_minute[name], max_wait=max_queue[name]) for name in PRIORITIES}
+        self._queues = {name: deque() for name in PRIORITIES}
+        self._running = dict.fromkeys(PRIORITIES, 0)
+        self._in_flight = 0
+        self._last_finish = dict.fromkeys(PRIORITIES, 0.0)
+        self._clock = 0.0
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: defaultdict(float))
+
+    def _enqueue(self, ticket: Ticket, cost: float):
+        with self._lock:
+            ticket.start = max(self._clock, self._last_finish[ticket.priority])
+            ticket.finish = ticket.start + cost / self.weights[ticket.priority]
+            self._last_finish[ticket.priority] = ticket.finish
+            self._queues[ticket.priority].append(ticket)
+            self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots in finish-time order; the lock is held"""
+        while self._in_flight < self.max_concurrency:
+            best = None
+            for name, queue in self._queues.items():
+                if queue and self._running[name] < self.concurrency[name]:
+                    if best is None or queue[0].finish < self._queues[best][0].finish:
+                        best = name
+            if best is None:
+                return
+            ticket = self._queues[best].popleft()
+            self._running[best] += 1
+            self._in_flight += 1
+            self._clock = max(self._clock, ticket.start)
+            ticket.granted = True
+            ticket.wake()
+
+    def _abandon(self, ticket: Ticket) -> bool:
+        """Take a queued ticket out of line; False if it was granted in the meantime"""
+        with self._lock:
+            if ticket.granted:
+                return False
+            self._queues[ticket.priority].remove(ticket)
+            return True
+
+    def release(self, ticket: Ticket):
+        with self._lock:
+            self._running[ticket.priority] -= 1
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _admitted(self, ticket: Ticket, waited: float):
+        queue_seconds.observe(waited, priority=ticket.priority)
+        scheduled.inc(priority=ticket.priority, outcome="admitted")
+        stats = self.stats[ticket.priority]
+        stats["admitted"] += 1
+        stats["wait_seconds"] += waited
+
+    def _shed(self, name: str, waited: float):
+        queue_seconds.observe(waited, priority=name)
+        scheduled.inc(priority=name, outcome="shed")
+        self.stats[name]["shed"] += 1
+        logger.info("Shed %s LLM call after %.1fs in queue", name, waited)
+        raise SchedulerShed(name, waited)
+
+    @staticmethod
+    def _cost(plan: Optional[Plan]) -> float:
+        return plan.input_tokens + plan.output_tokens if plan is not None else 1.0
+
+    def acquire(self, plan: Optional[Plan] = None) -> Ticket:
+        """Block until the current priority class may make one upstream call"""
+        name = current_priority()
+        begun = time.monotonic()
+        if plan is not None:
+            try:
+                self.budgets[name].acquire(plan)
+            except TokenBudgetExceeded:
+                self._shed(name, time.monotonic() - begun)
+        granted = threading.Event()
+        ticket = Ticket(name, granted.set)
+        self._enqueue(ticket, self._cost(plan))
+        if not granted.wait(max(0.0, begun + self.max_queue[name] - time.monotonic())) and self._abandon(ticket):
+            self._shed(name, time.monotonic() - begun)
+        self._admitted(ticket, time.monotonic() - begun)
+        return ticket
+
+    async def aacquire(self, plan: Optional[Plan] = None) -> Ticket:
+        """Async variant of acquire; a cancelled caller gives up its place or its slot"""
+        name = current_priority()
+        begun = time.monotonic()
+        if plan is not None:
+            try:
+                await self.budgets[name].aacquire(plan)
+            except TokenBudgetExceeded:
+                self._shed(name, time.monotonic() - begun)
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        # Slots may be freed, and this ticket granted, from worker threads
+        ticket = Ticket(name, lambda: loop.call_soon_threadsafe(_resolve, granted))
+        self._enqueue(ticket, self._cost(plan))
+        if not ticket.granted:
+            try:
+                await asyncio.wait_for(granted, max(0.0, begun + self.max_queue[name] - time.monotonic()))
+            except asyncio.TimeoutError:
+                if self._abandon(ticket):
+                    self._shed(name, time.monotonic() - begun)
+            except asyncio.CancelledError:
+                if not self._abandon(ticket):
+                    self.release(ticket)
+                raise
+        self._admitted(ticket, time.monotonic() - begun)
+        return ticket
+
+    @contextmanager
+    def slot(self, plan: Optional[Plan] = None) -> Iterator[Ticket]:
+        ticket = self.acquire(plan)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, plan: Optional[Plan] = None) -> AsyncIterator[Ticket]:
+        ticket = await self.aacquire(plan)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def settle(self, ticket: Ticket, plan: Plan, input_tokens: int, output_tokens: int):
+        """Charge or refund the class budget for the difference between plan and usage"""
+        self.budgets[ticket.priority].settle(plan, input_tokens, output_tokens)
+
+    def depths(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: {"queued": len(self._queues[name]), "running": self._running[name]} for name in PRIORITIES}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        depths = self.depths()
+        snapshot = {}
+        for name in PRIORITIES:
+            stats = self.stats.get(name, {})
+            admitted = stats.get("admitted", 0)
+            wait = stats.get("wait_seconds", 0.0)
+            snapshot[name] = {
+                **depths[name],
+                "admitted": int(admitted),
+                "shed": int(stats.get("shed", 0)),
+                "mean_wait_ms": round(wait / admitted * 1e3, 1) if admitted else None,
+                "weight": self.weights[name],
+                "concurrency": int(self.concurrency[name]),
+            }
+            if self.budgets[name].per_minute:
+                snapshot[name]["budget"] = self.budgets[name].snapshot()
+        return snapshot
+
+
+scheduler = PriorityScheduler()
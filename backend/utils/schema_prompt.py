@@ -0,0 +1,66 @@
+import typing
+from functools import lru_cache
+from typing import List, Literal, Tuple, Union
+
+from pydantic import BaseModel
+
+
+# Output format instructions for the question generators, written as TypeScript
+# interfaces instead of a JSON Schema dump. Descriptions are kept for scalar
+# fields, where they carry allowed values and units; list and nested-model
+# fields are described by their names and element types. `descriptions` may
+# also name the fields whose descriptions to keep.
+
+_SCALARS = {str: "string", int: "integer", float: "number", bool: "boolean", type(None): "null"}
+
+
+@lru_cache(maxsize=None)
+def format_instructions(model: type, descriptions: Union[bool, Tuple[str, ...]] = True) -> str:
+    """Tell the model to answer with one JSON object of `model`, generated once per model"""
+    return (f"Respond with only a JSON object of type {model.__name__}, no other text or code fences.\n\n"
+            + compact_schema(model, descriptions))
+
+
+def compact_schema(model: type, descriptions: Union[bool, Tuple[str, ...]] = True) -> str:
+    """`model` and every model nested in it as TypeScript interfaces, outermost first"""
+    blocks: List[str] = []
+    seen = set()
+
+    def visit(cls):
+        if cls in seen:
+            return
+        seen.add(cls)
+        nested: List[type] = []
+        lines = [f"interface {cls.__name__} {{"]
+        for name, field in cls.model_fields.items():
+            line = f"  {name}: {_type_name(field.annotation, nested)};"
+            described = descriptions is True or (descriptions and name in descriptions)
+            if described and field.description and field.annotation in _SCALARS:
+                line += f" // {field.description}"
+            lines.append(line)
+        lines.append("}")
+        blocks.append("\n".join(lines))
+        for child in nested:
+            visit(child)
+
+    visit(model)
+    return "\n".join(blocks)
+
+
+def _type_name(annotation, nested: List[type]) -> str:
+    if annotation in _SCALARS:
+        return _SCALARS[annotation]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        nested.append(annotation)
+        return annotation.__name__
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin in (list, List):
+        item = _type_name(args[0], nested)
+        return f"({item})[]" if " " in item else f"{item}[]"
+    if origin is Literal:
+        return " | ".join(f'"{arg}"' if isinstance(arg, str) else str(arg).lower() for arg in args)
+    if origin is Union:
+        return " | ".join(_type_name(arg, nested) for arg in args)
+    if origin is typing.Annotated:
+        return _type_name(args[0], nested)
+    return "any"
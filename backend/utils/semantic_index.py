@@ -0,0 +1,155 @@
+import os
+import re
+import threading
+import zlib
+from itertools import combinations
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+
+load_dotenv() # Load environment variables from .env file
+
+# Empty (the default) -> semantic lookups disabled; e.g. 0.75 to opt in
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '') or 'inf')
+SEMANTIC_DIM = int(os.getenv('SEMANTIC_DIM', '256'))
+SEMANTIC_MAX_ENTRIES = int(os.getenv('SEMANTIC_MAX_ENTRIES', '100000'))
+
+# Longest topic (in key terms) whose more general cached topics are looked up
+_MAX_SUBSET_TERMS = 8
+
+# Words that change how a topic is phrased but not what it is about
+_FILLER = {"a", "an", "the", "in", "of", "on", "for", "and", "to", "about", "intro", "introduction", "basics"}
+
+
+def tokenize(text: str) -> List[str]:
+    words = [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in _FILLER]
+    # Crude plural folding so "parabolas" lands on "parabola"
+    return [w[:-1] if len(w) > 3 and w.endswith('s') and not w.endswith('ss') else w for w in words]
+
+
+def key_terms(text: str) -> frozenset:
+    """
+    The words a topic is about, symbols included ("c++", "c#"). Two topics may
+    only share a cached answer when one's key terms contain the other's: n-gram
+    overlap alone puts "Organic" next to "Inorganic" and "World War I" next to "II".
+    """
+    terms = set()
+    for word in re.findall(r"[a-z0-9]+[+#]*", text.lower()):
+        terms.update(tokenize(word) if word.isalnum() else [word])
+    return frozenset(terms)
+
+
+def embed(text: str, dim: int = SEMANTIC_DIM) -> np.ndarray:
+    """
+    Hashed character n-gram embedding (3- to 5-grams per word plus whole words),
+    L2 normalized. crc32 keeps it stable across processes.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in tokenize(text):
+        padded = f"<{word}>"
+        grams = [padded[i:i + n] for n in (3, 4, 5) for i in range(len(padded) - n + 1)]
+        for gram in grams + [padded, padded]:
+            h = zlib.crc32(gram.encode())
+            vector[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticIndex:
+    """
+    Cosine index per namespace over previously generated topic keys. Only topics
+    whose key terms nest with the query's are scored: those containing all of
+    its terms come from intersecting per-term postings, those whose terms are a
+    subset of it from a map keyed on the exact term set.
+    """
+
+    def __init__(self, dim: int = SEMANTIC_DIM, max_entries: int = SEMANTIC_MAX_ENTRIES):
+        self.dim = dim
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._spaces: Dict[str, dict] = {}
+
+    def add(self, namespace: str, text: str, value: str):
+        vector, terms = embed(text, self.dim), key_terms(text)
+        with self._lock:
+            space = self._spaces.get(namespace)
+            if space is None:
+                space = self._spaces[namespace] = {
+                    "vectors": np.zeros((16, self.dim), dtype=np.float32), "values": [], "terms": [],
+                    "postings": {}, "exact": {}, "next": 0
+                }
+            slot = space["next"] % self.max_entries
+            if slot >= len(space["vectors"]):
+                # Grow geometrically up to max_entries, then overwrite the oldest slot
+                grown = np.zeros((min(self.max_entries, 2 * len(space["vectors"])), self.dim), dtype=np.float32)
+                grown[:len(space["vectors"])] = space["vectors"]
+                space["vectors"] = grown
+            space["vectors"][slot] = vector
+            if slot < len(space["values"]):
+                self._unlink(space, slot)
+                space["values"][slot] = value
+                space["terms"][slot] = terms
+            else:
+                space["values"].append(value)
+                space["terms"].append(terms)
+            for term in terms:
+                space["postings"].setdefault(term, set()).add(slot)
+            space["exact"].setdefault(terms, set()).add(slot)
+            space["next"] += 1
+
+    @staticmethod
+    def _unlink(space: dict, slot: int):
+        """Drop an overwritten slot from the term lookups; the lock is held"""
+        terms = space["terms"][slot]
+        for term in terms:
+            space["postings"][term].discard(slot)
+            if not space["postings"][term]:
+                del space["postings"][term]
+        space["exact"][terms].discard(slot)
+        if not space["exact"][terms]:
+            del space["exact"][terms]
+
+    @staticmethod
+    def _candidates(space: dict, terms: frozenset) -> Set[int]:
+        """Slots whose key terms contain, or are contained in, terms; the lock is held"""
+        postings = sorted((space["postings"].get(term, set()) for term in terms), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        if len(terms) <= _MAX_SUBSET_TERMS:
+            for size in range(1, len(terms)):
+                for subset in combinations(terms, size):
+                    candidates |= space["exact"].get(frozenset(subset), set())
+        return candidates
+
+    def lookup(self, namespace: str, text: str, threshold: float = SEMANTIC_CACHE_THRESHOLD) -> Optional[Tuple[str, float]]:
+        """
+        Most similar stored value whose key terms nest with the query's, and its
+        cosine score, if it reaches threshold
+        """
+        if threshold == float('inf'):
+            return None
+        terms = key_terms(text)
+        if not terms:
+            return None
+        vector = embed(text, self.dim)
+        with self._lock:
+            space = self._spaces.get(namespace)
+            if space is None:
+                return None
+            slots = np.fromiter(self._candidates(space, terms), dtype=np.int64)
+            if not len(slots):
+                return None
+            scores = space["vectors"][slots] @ vector
+            above = np.flatnonzero(scores >= threshold)
+            for i in above[np.argsort(-scores[above])]:
+                # A number or letter marks a different subject ("Python 2", "World War I"), not a qualifier
+                if all(term.isalpha() and len(term) > 2 for term in terms ^ space["terms"][slots[i]]):
+                    return space["values"][slots[i]], float(scores[i])
+        return None
+
+    def __len__(self):
+        return sum(len(space["values"]) for space in self._spaces.values())
+
+
+semantic_index = SemanticIndex()
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    """An in-flight sync generation that other threads can wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical generations: the first caller for a key runs
+    the work, every concurrent caller with the same key waits for its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[tuple, asyncio.Task] = {}
+        self.stats = defaultdict(lambda: {"executed": 0, "deduplicated": 0})
+
+    def do(self, group: str, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn once per key across threads"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.stats[group]["executed"] += 1
+            else:
+                self.stats[group]["deduplicated"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def ado(self, group: str, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run coro_fn once per key on the current event loop. The work runs as its
+        own task so a cancelled caller does not cancel it for the other waiters.
+        """
+        task_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = asyncio.ensure_future(coro_fn())
+                self._tasks[task_key] = task
+                task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+                self.stats[group]["executed"] += 1
+            else:
+                self.stats[group]["deduplicated"] += 1
+        return await asyncio.shield(task)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {group: dict(counts) for group, counts in self.stats.items()}
+
+
+single_flight = SingleFlight()
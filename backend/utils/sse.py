@@ -0,0 +1,9 @@
+from utils.fast_json import dumps
+
+
+def format_sse(event: str, data) -> str:
+    """Encode one server-sent event; data may contain pydantic models"""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
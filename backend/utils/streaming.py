@@ -0,0 +1,49 @@
+import re
+
+
+_OPEN_TAG = re.compile(r"<think>", re.IGNORECASE)
+_CLOSE_TAG = re.compile(r"</think>", re.IGNORECASE)
+
+
+class ThinkStripper:
+    """
+    Drop <think>...</think> blocks from a token stream, even when a tag is split
+    across chunks. Every character is scanned once, so long think blocks cost
+    linear time.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = False
+
+    def feed(self, text: str) -> str:
+        buffer = self._buffer + text
+        pos = 0
+        out = []
+        while True:
+            tag = _CLOSE_TAG if self._inside else _OPEN_TAG
+            match = tag.search(buffer, pos)
+            if match is None:
+                # Hold back a trailing partial tag until the next chunk arrives
+                end = max(pos, len(buffer) - _partial_tag_length(buffer, tag.pattern))
+                if not self._inside:
+                    out.append(buffer[pos:end])
+                self._buffer = buffer[end:]
+                return "".join(out)
+            if not self._inside:
+                out.append(buffer[pos:match.start()])
+            pos = match.end()
+            self._inside = not self._inside
+
+    def flush(self) -> str:
+        rest = "" if self._inside else self._buffer
+        self._buffer = ""
+        return rest
+
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    tail = text[-(len(tag) - 1):].lower()
+    for k in range(min(len(tag) - 1, len(tail)), 0, -1):
+        if tail.endswith(tag[:k]):
+            return k
+    return 0
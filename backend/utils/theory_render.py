@@ -0,0 +1,234 @@
+import asyncio
+import os
+import re
+import threading
+from typing import List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+from utils.metrics import span
+
+
+load_dotenv() # Load environment variables from .env file
+
+# Documents longer than this are rendered in a worker thread instead of on the event loop
+THEORY_RENDER_OFFLOAD_CHARS = int(os.getenv('THEORY_RENDER_OFFLOAD_CHARS', '8000'))
+
+
+class RenderedTheory(NamedTuple):
+    html: str
+    key_concepts: List[str]
+    examples: List[str]
+
+
+class _Unsupported(Exception):
+    """Markdown the fast renderer does not reproduce exactly; python-markdown renders it instead"""
+
+
+# <think> blocks, escaped LaTeX parentheses and doubled backslashes, in one scan
+_CLEANUP = re.compile(r"<think>.*?</think>|\\\\|\\[()]", re.DOTALL)
+
+# Block structure, matched per line
+_HEADING = re.compile(r"(#{1,6})((?:\\.|[^\\])*?)#*$")
+_ITEM = re.compile(r"(?:[*+-]|\d+\.) +(.*)")
+_UNSUPPORTED_LINE = re.compile(
+    r"[ \t>]"                 # indented code, nested lists, blockquotes
+    r"|<|```|~~~"             # raw HTML blocks, fences
+    r"|[=-]+ *$"              # setext underlines
+    r"|(?:[-*_] *){3,}$"      # horizontal rules
+    r"|\[[^\]]*\]:"           # reference definitions
+)
+_NESTED_BLOCK = re.compile(r"#|(?:[*+-]|\d+\.) ")
+
+# Inline markup, mirroring python-markdown's patterns for the supported subset
+_CODE = re.compile(r"(?<!\\)(`+)(.+?)(?<!`)\1(?!`)", re.DOTALL)
+_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+_ESCAPED_CHARS = frozenset("\\`*_{}[]()>#+-.!")
+_STARS = re.compile(r"\*+")
+_UNSUPPORTED_INLINE = re.compile(r"<(?!\s)|\]\(|(?<!\w)_")
+_AMP = re.compile(r"&(?!(?:\#[0-9]+|\#x[0-9a-f]+|[0-9a-z]+);)", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"\x02(\d+)\x03")
+_TAG = re.compile(r"<[^>]+>")
+
+_SECTIONS = {"key concepts": "concepts", "examples": "examples"}
+
+
+def render(content: str) -> RenderedTheory:
+    """Strip think blocks, fix LaTeX escapes, render HTML and extract key concepts and examples"""
+    with span("clean_latex_and_format", endpoint="theory"):
+        text = _CLEANUP.sub(_cleanup_replacement, content)
+        try:
+            return _render_fast(text)
+        except _Unsupported:
+            html = _markdown().convert(text)
+            return RenderedTheory(html, *_extract_from_html(html))
+
+
+async def arender(content: str) -> RenderedTheory:
+    """render(), in a worker thread when the document is large enough to stall the event loop"""
+    if len(content) > THEORY_RENDER_OFFLOAD_CHARS:
+        return await asyncio.to_thread(render, content)
+    return render(content)
+
+
+def _cleanup_replacement(match: re.Match) -> str:
+    text = match.group()
+    return "" if text[0] == "<" else text[1]
+
+
+def _render_fast(text: str) -> RenderedTheory:
+    """
+    Render headings, paragraphs and flat tight lists with code, strong and
+    emphasis spans in one pass over the lines, byte-for-byte as python-markdown
+    would, collecting the list items under "## Key Concepts" and "## Examples"
+    on the way. Anything else raises _Unsupported.
+    """
+    if "\t" in text or "\x02" in text or "\x03" in text:
+        raise _Unsupported  # tabs are expanded, \x02 and \x03 are python-markdown's placeholders
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    if lines[0] and not lines[0].strip():
+        raise _Unsupported
+    out: List[str] = []
+    concepts: List[str] = []
+    examples: List[str] = []
+    section: Optional[str] = None
+    block: List[str] = []
+    last_tag = None
+
+    def flush():
+        nonlocal last_tag
+        if not block:
+            return
+        if _ITEM.match(block[0]):
+            if last_tag == "list":
+                raise _Unsupported  # python-markdown would merge it into a loose list
+            items = []
+            for line in block:
+                match = _ITEM.match(line)
+                if match is None:
+                    items[-1] += "\n" + line
+                    continue
+                if _NESTED_BLOCK.match(match.group(1)) or _UNSUPPORTED_LINE.match(match.group(1)):
+                    raise _Unsupported
+                items.append(match.group(1))
+            tag = "ul" if block[0][0] in "*+-" else "ol"
+            out.append(f"<{tag}>")
+            for item in items:
+                html = f"<li>{_inline(item.lstrip())}</li>"
+                out.append(html)
+                if section is not None and html.startswith("<li><strong>"):
+                    entry = _TAG.sub("", html.split("\n", 1)[0]).strip()
+                    (concepts if section == "concepts" else examples).append(entry)
+            out.append(f"</{tag}>")
+            last_tag = "list"
+        else:
+            paragraph = "\n".join(block)
+            out.append(f"<p>{_inline(paragraph)}</p>")
+            last_tag = "p"
+        block.clear()
+
+    for line in lines:
+        if not line.strip():
+            flush()
+            continue
+        if _UNSUPPORTED_LINE.match(line):
+            raise _Unsupported
+        heading = _HEADING.match(line)
+        if heading is None:
+            block.append(line)
+            continue
+        flush()
+        level = len(heading.group(1))
+        html = _inline(heading.group(2).strip())
+        out.append(f"<h{level}>{html}</h{level}>")
+        last_tag = "h"
+        if level == 2:
+            section = _SECTIONS.get(html.lower())
+    flush()
+    return RenderedTheory("\n".join(out), concepts, examples)
+
+
+def _inline(text: str) -> str:
+    stash: List[str] = []
+
+    def put(html: str) -> str:
+        stash.append(html)
+        return f"\x02{len(stash) - 1}\x03"
+
+    if "`" in text:
+        if "\\`" in text:
+            raise _Unsupported  # escaped backticks and backslash runs before a code span
+        text = _CODE.sub(lambda m: put(f"<code>{_code_escape(m.group(2).strip())}</code>"), text)
+    if _UNSUPPORTED_INLINE.search(text):
+        raise _Unsupported
+    if "\\" in text:
+        text = _ESCAPE.sub(lambda m: put(_escape(m.group(1))) if m.group(1) in _ESCAPED_CHARS else m.group(), text)
+    if "  \n" in text:
+        text = text.replace("  \n", put("<br />\n"))
+    if "*" in text:
+        text = _emphasis(text, put)
+    text = _escape(text)
+    return _PLACEHOLDER.sub(lambda m: stash[int(m.group(1))], text) if stash else text
+
+
+def _emphasis(text: str, put) -> str:
+    """**strong** and *em* pairs; runs surrounded by whitespace stay literal"""
+    runs = []
+    for run in _STARS.finditer(text):
+        start, end = run.span()
+        if (end - start <= 3 and (start == 0 or text[start - 1].isspace())
+                and (end == len(text) or text[end].isspace())):
+            continue
+        runs.append(run)
+    if len(runs) % 2:
+        raise _Unsupported
+    parts = []
+    pos = 0
+    for opening, closing in zip(runs[::2], runs[1::2]):
+        width = opening.end() - opening.start()
+        if width > 2 or closing.end() - closing.start() != width or closing.start() == opening.end():
+            raise _Unsupported
+        tag = "strong" if width == 2 else "em"
+        parts += [text[pos:opening.start()], put(f"<{tag}>"), text[opening.end():closing.start()], put(f"</{tag}>")]
+        pos = closing.end()
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def _escape(text: str) -> str:
+    if "&" in text:
+        text = _AMP.sub("&amp;", text)
+    return text.replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _code_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+_local = threading.local()
+
+
+def _markdown():
+    """A python-markdown instance per thread, reset between documents"""
+    md = getattr(_local, "markdown", None)
+    if md is None:
+        import markdown
+
+        md = _local.markdown = markdown.Markdown()
+    return md.reset()
+
+
+def _extract_from_html(html: str):
+    """Key concepts and examples from rendered HTML, for documents outside the fast renderer's subset"""
+    key_concepts = []
+    examples = []
+    section = None
+    for line in html.split("\n"):
+        line = line.strip()
+        if line.startswith("<h2>"):
+            lowered = line.lower()
+            section = next((name for title, name in _SECTIONS.items() if lowered.startswith(f"<h2>{title}</h2>")), None)
+            continue
+        if section is not None and line.startswith("<li><strong>"):
+            (key_concepts if section == "concepts" else examples).append(_TAG.sub("", line).strip())
+    return key_concepts, examples
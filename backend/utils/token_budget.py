@@ -0,0 +1,191 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+from utils.metrics import Counter, Histogram, metrics
+
+
+load_dotenv() # Load environment variables from .env file
+
+# max_tokens is the estimate times this factor, rounded up to TOKEN_PLAN_STEP
+TOKEN_PLAN_HEADROOM = float(os.getenv('TOKEN_PLAN_HEADROOM', '1.5'))
+TOKEN_PLAN_STEP = int(os.getenv('TOKEN_PLAN_STEP', '256'))
+TOKEN_PLAN_MIN = int(os.getenv('TOKEN_PLAN_MIN', '256'))
+TOKEN_PLAN_MAX = int(os.getenv('TOKEN_PLAN_MAX', '8192'))
+# Weight of the newest observation in the learned tokens-per-unit estimate
+TOKEN_PLAN_ALPHA = float(os.getenv('TOKEN_PLAN_ALPHA', '0.2'))
+# Added to every max_tokens: reasoning models spend output tokens on a <think> block before the answer
+TOKEN_PLAN_THINK_TOKENS = int(os.getenv('TOKEN_PLAN_THINK_TOKENS', '1024'))
+# Upstream tokens (prompt + planned output) admitted per minute; 0 disables admission control
+TOKEN_BUDGET_PER_MINUTE = float(os.getenv('TOKEN_BUDGET_PER_MINUTE', '0'))
+# Longest a call waits for budget before it is rejected with 429
+TOKEN_BUDGET_MAX_WAIT = float(os.getenv('TOKEN_BUDGET_MAX_WAIT', '10'))
+
+CHARS_PER_TOKEN = 4
+# Prior output tokens per field of a generated question object
+TOKENS_PER_FIELD = 30
+
+plan_ratio = Histogram("coursify_llm_plan_ratio", "Actual output tokens divided by the planned estimate",
+                       buckets=(0.25, 0.5, 0.75, 0.9, 1.0, 1.1, 1.25, 1.5, 2.0, 3.0))
+planned_tokens = Counter("coursify_llm_planned_tokens_total", "Output tokens estimated by the planner")
+metrics += [plan_ratio, planned_tokens]
+
+
+class TokenBudgetExceeded(Exception):
+    """No upstream token budget within TOKEN_BUDGET_MAX_WAIT"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"token budget exhausted, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class Plan(NamedTuple):
+    endpoint: str
+    units: float
+    input_tokens: int
+    output_tokens: int
+    max_tokens: int
+
+
+def schema_tokens(model) -> int:
+    """Prior output tokens for one generated object of a pydantic model"""
+    return TOKENS_PER_FIELD * len(model.model_fields)
+
+
+class TokenPlanner:
+    """
+    Output-token estimates per endpoint, as a fixed overhead plus tokens per unit
+    (requested word, requested question). The per-unit rate starts at a prior
+    and follows the provider's usage data as calls complete. max_tokens adds
+    headroom and a reasoning allowance to the estimate.
+    """
+
+    def __init__(self, headroom: float = TOKEN_PLAN_HEADROOM, alpha: float = TOKEN_PLAN_ALPHA,
+                 think_tokens: int = TOKEN_PLAN_THINK_TOKENS):
+        self.headroom = headroom
+        self.alpha = alpha
+        self.think_tokens = think_tokens
+        self._rates: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: defaultdict(float))
+
+    def register(self, endpoint: str, overhead: float, per_unit: float):
+        """Prior for endpoint; a later call keeps what has been learned"""
+        with self._lock:
+            self._rates.setdefault(endpoint, (overhead, per_unit))
+
+    def plan(self, endpoint: str, units: float, prompt: Any = None) -> Plan:
+        overhead, per_unit = self._rates[endpoint]
+        estimate = overhead + per_unit * units
+        max_tokens = math.ceil((estimate * self.headroom + self.think_tokens) / TOKEN_PLAN_STEP) * TOKEN_PLAN_STEP
+        input_tokens = len(str(prompt)) // CHARS_PER_TOKEN if prompt is not None else 0
+        return Plan(endpoint, units, input_tokens, round(estimate),
+                    max(TOKEN_PLAN_MIN, min(TOKEN_PLAN_MAX, max_tokens)))
+
+    def observe(self, plan: Plan, output_tokens: int, truncated: bool = False):
+        """Fold the actual output size of a planned call into its endpoint's rate"""
+        planned_tokens.inc(plan.output_tokens, endpoint=plan.endpoint)
+        plan_ratio.observe(output_tokens / max(1, plan.output_tokens), endpoint=plan.endpoint)
+        with self._lock:
+            overhead, per_unit = self._rates[plan.endpoint]
+            sample = max(0.0, output_tokens - overhead) / max(plan.units, 1e-9)
+            if truncated:
+                # The real length is unknown but larger: jump by the headroom instead of averaging,
+                # since every truncated call already cost an answer
+                per_unit = max(sample, per_unit) * self.headroom
+            else:
+                per_unit = (1 - self.alpha) * per_unit + self.alpha * sample
+            self._rates[plan.endpoint] = (overhead, per_unit)
+            stats = self.stats[plan.endpoint]
+            stats["calls"] += 1
+            stats["planned_tokens"] += plan.output_tokens
+            stats["actual_tokens"] += output_tokens
+            stats["abs_error_tokens"] += abs(output_tokens - plan.output_tokens)
+            stats["truncated"] += truncated
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            snapshot = {}
+            for endpoint, (overhead, per_unit) in self._rates.items():
+                stats = dict(self.stats.get(endpoint, {}))
+                calls = stats.get("calls", 0)
+                stats["mean_abs_error_tokens"] = round(stats.pop("abs_error_tokens", 0) / calls, 1) if calls else None
+                stats["tokens_per_unit"] = round(per_unit, 3)
+                snapshot[endpoint] = stats
+            return snapshot
+
+
+class TokenBudget:
+    """
+    Token bucket over upstream tokens per minute, shared by every endpoint. Calls
+    reserve their prompt plus planned output up front and settle the difference
+    once the provider reports actual usage.
+    """
+
+    def __init__(self, per_minute: float = TOKEN_BUDGET_PER_MINUTE, max_wait: float = TOKEN_BUDGET_MAX_WAIT):
+        self.per_minute = per_minute
+        self.max_wait = max_wait
+        self.available = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats = defaultdict(int)
+
+    def _take(self, tokens: float) -> float:
+        """Reserve tokens and return 0, or return the seconds until they will be available"""
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.per_minute, self.available + (now - self.updated) * self.per_minute / 60)
+            self.updated = now
+            # A single call larger than the whole budget is admitted once the bucket is full
+            tokens = min(tokens, self.per_minute)
+            if self.available >= tokens:
+                self.available -= tokens
+                return 0.0
+            return (tokens - self.available) * 60 / self.per_minute
+
+    def _reserve(self, plan: Plan, waited: float) -> Optional[float]:
+        wait = self._take(plan.input_tokens + plan.output_tokens)
+        if wait == 0:
+            self.stats["admitted"] += 1
+            self.stats["waited"] += waited > 0
+            return None
+        if waited + wait > self.max_wait:
+            self.stats["rejected"] += 1
+            raise TokenBudgetExceeded(wait)
+        return wait
+
+    def acquire(self, plan: Plan):
+        if not self.per_minute:
+            return
+        waited = 0.0
+        while (wait := self._reserve(plan, waited)) is not None:
+            time.sleep(wait)
+            waited += wait
+
+    async def aacquire(self, plan: Plan):
+        if not self.per_minute:
+            return
+        waited = 0.0
+        while (wait := self._reserve(plan, waited)) is not None:
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def settle(self, plan: Plan, input_tokens: int, output_tokens: int):
+        """Charge or refund the difference between the reservation and actual usage"""
+        if not self.per_minute:
+            return
+        with self._lock:
+            self.available -= (input_tokens + output_tokens) - (plan.input_tokens + plan.output_tokens)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "per_minute": self.per_minute, "available": round(self.available)}
+
+
+token_planner = TokenPlanner()
+token_budget = TokenBudget()
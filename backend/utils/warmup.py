@@ -0,0 +1,28 @@
+import os
+
+from dotenv import load_dotenv
+
+
+load_dotenv() # Load environment variables from .env file
+
+# Build LLM clients, prompt templates and parsers during startup instead of on the first request
+WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'false').lower() in ('1', 'true', 'yes')
+
+
+def warm_up():
+    """Import the heavy dependencies and build every lazily created client and template"""
+    import markdown  # noqa: F401
+    from utils import get_book_links, get_mcq, get_theory, get_theory_question
+    from utils.llm_pool import get_llm
+    from utils.token_budget import token_planner
+
+    # Clients on every backend for the planned budgets of default-sized requests
+    get_mcq._get_prompt()
+    get_llm(temperature=0.3, max_tokens=token_planner.plan("mcq", 3).max_tokens).warm_up()
+    get_theory._get_prompt_template()
+    get_theory._get_llm(token_planner.plan("theory", 1000)).warm_up()
+    get_theory_question._get_prompt()
+    for approach in get_theory_question.approaches:
+        get_llm(max_tokens=token_planner.plan("theory_questions", 3).max_tokens, **approach).warm_up()
+    get_book_links._get_prompt()
+    get_llm(temperature=0.2, max_tokens=300).warm_up()